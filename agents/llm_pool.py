@@ -0,0 +1,110 @@
+import threading
+from typing import TYPE_CHECKING, Any, Dict, Hashable, Optional, Tuple
+import httpx
+from llama_index.core.callbacks import CallbackManager
+from llama_index.core.llms import LLM
+
+if TYPE_CHECKING:
+    from ollama import AsyncClient, Client
+
+REQUEST_TIMEOUT = 120.0
+CONTEXT_WINDOW = 4096
+OLLAMA_BASE_URL = "http://localhost:11434"
+
+
+class LLMPool:
+    """
+    A process wide pool of LLM clients, shared by all the sessions & tool calls.
+
+    The LLMs are keyed by (service, model, generation params), so every distinct
+    configuration is built once. All the LLMs of a service share one keep-alive HTTP
+    connection pool, so the connections & TLS handshakes are reused across models too.
+    Nothing here touches the global `llama_index.core.Settings`. The LLM packages are
+    imported on the first `get` of their service, so importing the pool is cheap.
+
+    Example:
+        >>> llm = llm_pool.get("groq", "llama-3.1-70b-versatile", temperature=0.1, max_tokens=1024)
+        >>> llm is llm_pool.get("groq", "llama-3.1-70b-versatile", temperature=0.1, max_tokens=1024)
+        True
+    """
+
+    def __init__(self):
+        self._llms: Dict[Tuple[Hashable, ...], LLM] = {}
+        self._lock = threading.Lock()
+        self._http_client: Optional[httpx.Client] = None
+        self._async_http_client: Optional[httpx.AsyncClient] = None
+        self._ollama_clients: Optional[Tuple["Client", "AsyncClient"]] = None
+
+    def get(
+        self,
+        service: str,
+        model: str,
+        callback_manager: Optional[CallbackManager] = None,
+        **generation_kwargs: Any,
+    ) -> LLM:
+        """
+        Get the pooled LLM for the configuration.
+
+        With a `callback_manager`, a shallow copy bound to it is returned instead. The
+        copy still shares the pooled connections, while the callbacks of one session
+        never leak into another.
+        """
+        key = (service, model, tuple(sorted(generation_kwargs.items())))
+        llm = self._llms.get(key)
+        if llm is None:
+            with self._lock:
+                llm = self._llms.get(key)
+                if llm is None:
+                    llm = self._llms[key] = self._build(service, model, **generation_kwargs)
+        if callback_manager is not None:
+            return llm.model_copy(update={"callback_manager": callback_manager})
+        return llm
+
+    def _build(
+        self,
+        service: str,
+        model: str,
+        temperature: Optional[float] = None,
+        max_tokens: Optional[int] = None,
+    ) -> LLM:
+        if service == "groq":
+            from llama_index.llms.groq import Groq
+
+            if self._http_client is None:
+                self._http_client = httpx.Client(timeout=REQUEST_TIMEOUT)
+                self._async_http_client = httpx.AsyncClient(timeout=REQUEST_TIMEOUT)
+            kwargs = {} if temperature is None else {"temperature": temperature}
+            return Groq(
+                model=model,
+                max_tokens=max_tokens,
+                context_window=CONTEXT_WINDOW,
+                request_timeout=REQUEST_TIMEOUT,
+                http_client=self._http_client,
+                async_http_client=self._async_http_client,
+                **kwargs,
+            )
+        elif service == "ollama":
+            from ollama import AsyncClient, Client
+            from llama_index.llms.ollama import Ollama
+
+            if self._ollama_clients is None:
+                self._ollama_clients = (
+                    Client(host=OLLAMA_BASE_URL, timeout=REQUEST_TIMEOUT),
+                    AsyncClient(host=OLLAMA_BASE_URL, timeout=REQUEST_TIMEOUT),
+                )
+            client, async_client = self._ollama_clients
+            kwargs = {} if temperature is None else {"temperature": temperature}
+            return Ollama(
+                model=model,
+                base_url=OLLAMA_BASE_URL,
+                context_window=CONTEXT_WINDOW,
+                request_timeout=REQUEST_TIMEOUT,
+                additional_kwargs={"num_predict": max_tokens} if max_tokens else {},
+                client=client,
+                async_client=async_client,
+                **kwargs,
+            )
+        raise NotImplementedError(f"The model_service {service} is not implemented.")
+
+
+llm_pool = LLMPool()
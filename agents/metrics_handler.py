@@ -0,0 +1,124 @@
+import threading
+from time import perf_counter
+from typing import Any, Dict, List, Optional, Tuple
+import regex as re
+from llama_index.core.callbacks import CBEventType, EventPayload
+from llama_index.core.callbacks.base_handler import BaseCallbackHandler
+from tools.metrics import metrics
+from utils import calculate_token_count_of_message
+
+# tool outputs that are errors, the tools return these instead of raising
+TOOL_ERROR_PATTERN = re.compile(r"^\s*(Error|Encountered error|An error occurred)", re.IGNORECASE)
+
+
+def _usage_value(usage: Any, *names: str) -> Optional[int]:
+    for name in names:
+        value = usage.get(name) if isinstance(usage, dict) else getattr(usage, name, None)
+        if value is not None:
+            return int(value)
+    return None
+
+
+def token_counts(response: Any, messages: List[Any]) -> Tuple[int, int]:
+    """
+    The (prompt, completion) token counts of an LLM response.
+
+    The counts reported by the provider are used when present (OpenAI style `usage`,
+    groq's `x_groq.usage` on the last streamed chunk, ollama's eval counts), else
+    they are estimated from the text.
+    """
+    raw = getattr(response, "raw", None) or {}
+    for usage in [
+        raw.get("usage") if isinstance(raw, dict) else getattr(raw, "usage", None),
+        getattr(getattr(raw, "x_groq", None), "usage", None),
+        raw,
+    ]:
+        if usage is None:
+            continue
+        prompt = _usage_value(usage, "prompt_tokens", "prompt_eval_count")
+        completion = _usage_value(usage, "completion_tokens", "eval_count")
+        if prompt is not None and completion is not None:
+            return prompt, completion
+
+    prompt = sum(calculate_token_count_of_message(str(message.content or "")) for message in messages)
+    message = getattr(response, "message", None)
+    completion = calculate_token_count_of_message(str(getattr(message, "content", None) or ""))
+    return prompt, completion
+
+
+class MetricsCallbackHandler(BaseCallbackHandler):
+    """
+    Record the LLM & tool call latencies, token counts & errors into `metrics`.
+
+    Add it to the agent's `CallbackManager`, next to the other handlers.
+
+    Example:
+        >>> callback_manager = CallbackManager(handlers=[MetricsCallbackHandler()])
+        >>> agent = create_agent(model_name, callback_manager=callback_manager)
+    """
+
+    def __init__(self):
+        super().__init__(event_starts_to_ignore=[], event_ends_to_ignore=[])
+        # event id -> (start time, labels)
+        self._events: Dict[str, Tuple[float, Dict[str, str]]] = {}
+        self._lock = threading.Lock()
+
+    def on_event_start(
+        self,
+        event_type: CBEventType,
+        payload: Optional[Dict[str, Any]] = None,
+        event_id: str = "",
+        parent_id: str = "",
+        **kwargs: Any,
+    ) -> str:
+        payload = payload or {}
+        if event_type == CBEventType.LLM:
+            serialized = payload.get(EventPayload.SERIALIZED) or {}
+            labels = {"model": serialized.get("model", "unknown")}
+        elif event_type == CBEventType.FUNCTION_CALL:
+            tool = payload.get(EventPayload.TOOL)
+            labels = {"tool": getattr(tool, "name", None) or "unknown"}
+        else:
+            return event_id
+        with self._lock:
+            self._events[event_id] = (perf_counter(), labels)
+        return event_id
+
+    def on_event_end(
+        self,
+        event_type: CBEventType,
+        payload: Optional[Dict[str, Any]] = None,
+        event_id: str = "",
+        **kwargs: Any,
+    ) -> None:
+        with self._lock:
+            event = self._events.pop(event_id, None)
+        if event is None:
+            return
+        start, labels = event
+        seconds = perf_counter() - start
+        payload = payload or {}
+
+        if event_type == CBEventType.LLM:
+            error = EventPayload.EXCEPTION in payload
+            metrics.observe("llm_request", seconds, error=error, **labels)
+            if not error and payload.get(EventPayload.RESPONSE) is not None:
+                prompt, completion = token_counts(
+                    payload[EventPayload.RESPONSE], payload.get(EventPayload.MESSAGES) or []
+                )
+                metrics.inc("llm_tokens", prompt, type="prompt", **labels)
+                metrics.inc("llm_tokens", completion, type="completion", **labels)
+        elif event_type == CBEventType.FUNCTION_CALL:
+            output = str(payload.get(EventPayload.FUNCTION_OUTPUT, ""))
+            error = EventPayload.EXCEPTION in payload or bool(TOOL_ERROR_PATTERN.match(output))
+            metrics.observe("tool_call", seconds, error=error, **labels)
+
+    def start_trace(self, trace_id: Optional[str] = None) -> None:
+        pass
+
+    def end_trace(
+        self,
+        trace_id: Optional[str] = None,
+        trace_map: Optional[Dict[str, List[str]]] = None,
+    ) -> None:
+        pass
@@ -1,10 +1,9 @@
 from typing import Optional, Any, Literal
-from llama_index.llms.groq import Groq
-from llama_index.llms.ollama import Ollama
 from llama_index.core.agent import FunctionCallingAgent, AgentRunner
-from llama_index.core import Settings
+from agents.llm_pool import llm_pool
 from llama_index.core.prompts import ChatMessage
-from tools.tools import stock_analyser, duckduckgo_search_tool
+from agents.streaming_worker import StreamingFunctionCallingAgentWorker
+from tools.tools import stock_analyser, batch_analyser, stock_screener, technical_analyser, peer_comparer, trend_analyser, duckduckgo_search_tool
 from typing import List
 from dotenv import load_dotenv
 from prompts.functioncalling_prompts import ANALYSIS_PROMPT
@@ -16,34 +15,38 @@ load_dotenv("./secrets/local.env")
 
 def create_agent(model_name: str = "llama-3.1-70b-versatile", callback_manager: Optional[Any] = None, model_service: Literal["groq", "ollama", "huggingface"] = "groq", generation_kwargs: dict[str, Any] = None) -> AgentRunner:
     """Create and return a new agent instance."""
+    generation_kwargs = generation_kwargs or {}
     try:
-        if model_service == "groq":
-            llm = Groq(model=model_name, request_timeout=120.0)
-        elif model_service == "ollama":
-            llm = Ollama(model=model_name, request_timeout=120.0)
-        else:
-            raise NotImplementedError(f"The model_service {model_service} is not implemented.")
+        # the pooled client is shared, this session only gets its own callback manager
+        llm = llm_pool.get(
+            model_service,
+            model_name,
+            callback_manager=callback_manager,
+            temperature=generation_kwargs.get("temperature", 0.1),
+            max_tokens=int(generation_kwargs.get("max_tokens", 1024)),
+        )
     except Exception as e:
         raise ValueError(f"Error loading model from {model_service} please check the model_name / model_service passed. Found={model_name}: {e}")
 
-    # set the llm & the generation args
-    Settings.llm = llm
-    Settings.context_window = 4096  # default
-    Settings.output_tokens = generation_kwargs.get("max_tokens", 1024)
-    Settings.temperature = generation_kwargs.get("temperature", 0.1)
-
     system_prompt = ANALYSIS_PROMPT
     print(colored(f"[AGENT CREATION]: Using system_prompt as {generation_kwargs.get('system_prompt')}", color="light_magenta"))
     prefix_messages = [ChatMessage(role="system", content=system_prompt)]
 
-    return FunctionCallingAgent.from_tools(
+    # the streaming worker lets the app stream the answer as it is generated
+    agent_worker = StreamingFunctionCallingAgentWorker.from_tools(
+        tools=[stock_analyser, batch_analyser, stock_screener, technical_analyser, peer_comparer, trend_analyser, duckduckgo_search_tool],
         llm=llm,
-        tools=[stock_analyser, duckduckgo_search_tool],
         prefix_messages=prefix_messages,
         max_function_calls=3,
         callback_manager=callback_manager,
         verbose=True,
     )
+    return FunctionCallingAgent(
+        agent_worker=agent_worker,
+        llm=llm,
+        callback_manager=callback_manager,
+        verbose=True,
+    )
 
 
 def analyze_stock(query: str, chat_history: List[str]) -> str:
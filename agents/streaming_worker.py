@@ -0,0 +1,212 @@
+import asyncio
+import uuid
+from functools import partial
+from typing import Any, List, Optional, Tuple
+from llama_index.core.agent import FunctionCallingAgentWorker
+from llama_index.core.agent.types import Task, TaskStep, TaskStepOutput
+from llama_index.core.agent.utils import add_user_step_to_memory
+from llama_index.core.base.llms.types import (
+    ChatMessage,
+    ChatResponse,
+    ChatResponseAsyncGen,
+    MessageRole,
+)
+from llama_index.core.chat_engine.types import (
+    AgentChatResponse,
+    StreamingAgentChatResponse,
+    is_function,
+)
+from llama_index.core.tools import ToolOutput
+
+
+class StreamingFunctionCallingAgentWorker(FunctionCallingAgentWorker):
+    """
+    A function calling agent worker that streams the final answer as the LLM generates it.
+
+    Every step streams the LLM response and peeks at it until it is clear whether it is
+    a tool call or text. Tool calls are collected & run like in the regular worker, a
+    text answer is handed to the caller as a live `StreamingAgentChatResponse`. A tool
+    call following some text is still run, within the same stream.
+
+    Example:
+        >>> worker = StreamingFunctionCallingAgentWorker.from_tools(tools, llm=llm)
+        >>> agent = FunctionCallingAgent(agent_worker=worker, llm=llm)
+        >>> response = await agent.astream_chat("How is Reliance performing?")
+        >>> async for token in response.async_response_gen():
+        ...     print(token, end="")
+    """
+
+    async def astream_step(self, step: TaskStep, task: Task, **kwargs: Any) -> TaskStepOutput:
+        """Run step (async stream)."""
+        if step.input is not None:
+            add_user_step_to_memory(
+                step, task.extra_state["new_memory"], verbose=self._verbose
+            )
+        tools = self.get_tools(task.input)
+
+        chat_stream = await self._astream_llm(task, tools)
+        first = await self._peek(chat_stream)
+        if first is None:
+            return self._text_step(step, "")
+
+        if is_function(first.message):
+            # a tool call, the full call is only known at the end of the stream
+            return await self._run_tool_calls(step, task, tools, await self._drain(first, chat_stream))
+
+        # a text answer, stream it straight to the caller
+        response = StreamingAgentChatResponse(
+            achat_stream=self._stream_answer(task, tools, first, chat_stream),
+            sources=task.extra_state["sources"],
+        )
+        # writes the answer to memory once the stream ends
+        asyncio.create_task(
+            response.awrite_response_to_history(
+                task.extra_state["new_memory"],
+                on_stream_end_fn=partial(self.finalize_task, task),
+            )
+        )
+        response._ensure_async_setup()
+        return self._last_step(step, response)
+
+    async def _astream_llm(self, task: Task, tools: List[Any]) -> ChatResponseAsyncGen:
+        return await self._llm.astream_chat_with_tools(
+            tools=tools,
+            user_msg=None,
+            chat_history=self.get_all_messages(task),
+            verbose=self._verbose,
+            allow_parallel_tool_calls=self.allow_parallel_tool_calls,
+        )
+
+    @staticmethod
+    async def _peek(chat_stream: ChatResponseAsyncGen) -> Optional[ChatResponse]:
+        """The first chunk with either a tool call or some text, the first ones can be empty (only the role)."""
+        async for chunk in chat_stream:
+            if is_function(chunk.message) or chunk.delta:
+                return chunk
+        return None
+
+    @staticmethod
+    async def _drain(last: ChatResponse, chat_stream: ChatResponseAsyncGen) -> ChatResponse:
+        """The last chunk of the stream, it holds the full message."""
+        async for last in chat_stream:
+            pass
+        return last
+
+    async def _stream_answer(
+        self, task: Task, tools: List[Any], first: ChatResponse, chat_stream: ChatResponseAsyncGen
+    ) -> ChatResponseAsyncGen:
+        """
+        Stream the text of the answer as it is generated.
+
+        Some models write a few words before calling a tool. That text is already with
+        the caller when the call shows up, so the tools are run within the same stream
+        and the answer after them is streamed on, until the LLM answers without a call.
+        """
+        streamed = False
+        while True:
+            last = None
+            async for last in _prepend(first, chat_stream):
+                if is_function(last.message):
+                    break
+                if last.delta:
+                    streamed = True
+                yield last
+            if last is None or not is_function(last.message):
+                return
+
+            response = await self._drain(last, chat_stream)
+            # the streamed text ends up in the final answer, the call is kept without it
+            call = response.message.model_copy(update={"content": None})
+            called = await self._call_tools(task, tools, response, message=call)
+            if called is None:
+                # the function call limit, the text so far is the answer
+                return
+            tool_outputs, return_direct = called
+            separator = "\n\n" if streamed else ""
+            if return_direct:
+                content = separator + str(tool_outputs[-1].content)
+                yield ChatResponse(message=ChatMessage(role=MessageRole.ASSISTANT, content=content), delta=content)
+                return
+
+            chat_stream = await self._astream_llm(task, tools)
+            first = await self._peek(chat_stream)
+            if first is None:
+                return
+            if separator and not is_function(first.message):
+                yield ChatResponse(message=ChatMessage(role=MessageRole.ASSISTANT, content=separator), delta=separator)
+                streamed = False
+
+    async def _call_tools(
+        self, task: Task, tools: List[Any], response: ChatResponse, message: Optional[ChatMessage] = None
+    ) -> Optional[Tuple[List[ToolOutput], bool]]:
+        """
+        Call the tools of the response, same as `arun_step` does after the LLM call.
+
+        Returns:
+            tuple: The tool outputs & whether a tool returns directly, None when the
+                function call limit is hit.
+        """
+        tool_calls = self._llm.get_tool_calls_from_response(
+            response, error_on_no_tool_call=False
+        )
+        task.extra_state["new_memory"].put(message or response.message)
+        if task.extra_state["n_function_calls"] >= self._max_function_calls:
+            return None
+        if not self.allow_parallel_tool_calls and len(tool_calls) > 1:
+            raise ValueError(
+                "Parallel tool calls not supported for synchronous function calling agent"
+            )
+
+        tool_outputs: List[ToolOutput] = []
+        return_directs = await asyncio.gather(
+            *[
+                self._acall_function(
+                    tools,
+                    tool_call,
+                    task.extra_state["new_memory"],
+                    tool_outputs,
+                    verbose=self._verbose,
+                )
+                for tool_call in tool_calls
+            ]
+        )
+        task.extra_state["sources"].extend(tool_outputs)
+        task.extra_state["n_function_calls"] += len(tool_calls)
+        # a tool returning directly only counts when it is the only call
+        return tool_outputs, len(return_directs) == 1 and bool(return_directs[0])
+
+    async def _run_tool_calls(self, step: TaskStep, task: Task, tools: List[Any], response: ChatResponse) -> TaskStepOutput:
+        called = await self._call_tools(task, tools, response)
+        if called is None:
+            return self._text_step(step, str(response.message.content or ""))
+        tool_outputs, return_direct = called
+        if return_direct:
+            return self._text_step(step, str(tool_outputs[-1].content), sources=tool_outputs)
+
+        return TaskStepOutput(
+            output=AgentChatResponse(response="", sources=tool_outputs),
+            task_step=step,
+            is_last=False,
+            next_steps=[step.get_next_step(step_id=str(uuid.uuid4()), input=None)],
+        )
+
+    @classmethod
+    def _text_step(cls, step: TaskStep, text: str, sources: Optional[List[ToolOutput]] = None) -> TaskStepOutput:
+        """
+        A last step answered without streaming the LLM (a tool returned directly, the
+        function call limit, an empty answer). `astream_chat` only accepts a plain
+        response marked as a dummy stream.
+        """
+        return cls._last_step(
+            step, AgentChatResponse(response=text, sources=sources or [], is_dummy_stream=True)
+        )
+
+    @staticmethod
+    def _last_step(step: TaskStep, output: Any) -> TaskStepOutput:
+        return TaskStepOutput(output=output, task_step=step, is_last=True, next_steps=[])
+
+
+async def _prepend(first: ChatResponse, chat_stream: ChatResponseAsyncGen) -> ChatResponseAsyncGen:
+    yield first
+    async for chunk in chat_stream:
+        yield chunk
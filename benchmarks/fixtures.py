@@ -0,0 +1,183 @@
+"""
+Fixtures for the offline benchmarks.
+
+A recording of the live providers can be made on a machine with network access:
+    python -m benchmarks.fixtures RELIANCE TCS HDFCBANK INFY SBIN
+
+Without a recording, deterministic synthetic fixtures of the same shape are used.
+"""
+import argparse
+import os
+import pickle
+from typing import Any, Dict, List, Optional
+import numpy as np
+import pandas as pd
+
+RECORDED_FIXTURES = os.path.join(os.path.dirname(__file__), "fixtures", "recorded.pkl")
+
+# The companies of the synthetic fixtures, as (symbol, name, sector)
+SYNTHETIC_COMPANIES = [
+    ("RELIANCE", "Reliance Industries Limited", "Energy"),
+    ("TCS", "Tata Consultancy Services Limited", "Technology"),
+    ("HDFCBANK", "HDFC Bank Limited", "Financial Services"),
+    ("INFY", "Infosys Limited", "Technology"),
+    ("SBIN", "State Bank of India", "Financial Services"),
+    ("TATAMOTORS", "Tata Motors Limited", "Consumer Cyclical"),
+    ("BAJFINANCE", "Bajaj Finance Limited", "Financial Services"),
+    ("ITC", "ITC Limited", "Consumer Defensive"),
+]
+# Number of filler companies in the synthetic NSE list, about the size of EQUITY_L.csv
+SYNTHETIC_LISTINGS = 2000
+
+STATEMENT_ROWS = {
+    "financials": ["Total Revenue", "Gross Profit", "Operating Income", "EBITDA", "Net Income", "Basic EPS"],
+    "balance_sheet": [
+        "Total Assets", "Total Liabilities Net Minority Interest", "Stockholders Equity",
+        "Total Debt", "Cash And Cash Equivalents", "Current Assets", "Current Liabilities",
+    ],
+    "cashflow": ["Operating Cash Flow", "Capital Expenditure", "Free Cash Flow"],
+}
+
+ANSWER = (
+    "**Summary**: {name} has grown its revenue steadily over the last four years while keeping "
+    "its margins stable. **Pros**: strong balance sheet, consistent free cash flow, improving return "
+    "on equity. **Cons**: the valuation is above its five year average and the debt has risen. "
+    "**Additional notes**: the analysts are mostly positive, watch the next quarterly results."
+)
+
+
+def _statement(rng: np.random.Generator, rows: List[str], scale: float) -> pd.DataFrame:
+    columns = pd.to_datetime([f"{year}-03-31" for year in range(2024, 2020, -1)])
+    growth = rng.uniform(0.9, 1.2, size=(len(rows), len(columns))).cumprod(axis=1)
+    values = scale * rng.uniform(0.1, 1.0, size=(len(rows), 1)) / growth
+    return pd.DataFrame(values, index=rows, columns=columns)
+
+
+def _info(rng: np.random.Generator, symbol: str, name: str, sector: str) -> Dict[str, Any]:
+    return {
+        "symbol": f"{symbol}.NS",
+        "longName": name,
+        "sector": sector,
+        "industry": f"{sector} Services",
+        "currentPrice": float(rng.uniform(100, 5000)),
+        "marketCap": float(rng.uniform(1e11, 2e13)),
+        "enterpriseValue": float(rng.uniform(1e11, 2e13)),
+        "trailingPE": float(rng.uniform(8, 80)),
+        "forwardPE": float(rng.uniform(8, 60)),
+        "priceToBook": float(rng.uniform(1, 15)),
+        "priceToSalesTrailing12Months": float(rng.uniform(1, 12)),
+        "debtToEquity": float(rng.uniform(0, 150)),
+        "currentRatio": float(rng.uniform(0.8, 3)),
+        "quickRatio": float(rng.uniform(0.5, 2)),
+        "returnOnEquity": float(rng.uniform(0.05, 0.35)),
+        "returnOnAssets": float(rng.uniform(0.01, 0.15)),
+        "grossMargins": float(rng.uniform(0.2, 0.6)),
+        "operatingMargins": float(rng.uniform(0.1, 0.3)),
+        "profitMargins": float(rng.uniform(0.05, 0.25)),
+        "dividendYield": float(rng.uniform(0, 0.03)),
+        "payoutRatio": float(rng.uniform(0, 0.5)),
+        "enterpriseToEbitda": float(rng.uniform(5, 40)),
+        "enterpriseToRevenue": float(rng.uniform(1, 10)),
+        "forwardEps": float(rng.uniform(10, 200)),
+        "fiftyTwoWeekHigh": float(rng.uniform(200, 6000)),
+        "fiftyTwoWeekLow": float(rng.uniform(50, 3000)),
+        "longBusinessSummary": f"{name} is an Indian company in the {sector.lower()} sector. " * 8,
+    }
+
+
+def synthetic_fixtures(seed: int = 0) -> Dict[str, Any]:
+    """Deterministic fixtures with the shape of the recorded ones."""
+    rng = np.random.default_rng(seed)
+    listings = [(symbol, name) for symbol, name, _ in SYNTHETIC_COMPANIES]
+    words = ["Bharat", "India", "Shree", "Global", "Power", "Steel", "Pharma", "Finance", "Textiles", "Chemicals", "Infra", "Agro"]
+    for i in range(SYNTHETIC_LISTINGS):
+        name = " ".join(rng.choice(words, size=3, replace=False))
+        listings.append((f"SYN{i:04d}", f"{name} Limited"))
+    nse_csv = "SYMBOL,NAME OF COMPANY, SERIES\n" + "\n".join(
+        f'{symbol},"{name}",EQ' for symbol, name in listings
+    )
+
+    tickers, news = {}, {}
+    for symbol, name, sector in SYNTHETIC_COMPANIES:
+        data = {
+            attribute: _statement(rng, rows, scale=1e12)
+            for attribute, rows in STATEMENT_ROWS.items()
+        }
+        data["info"] = _info(rng, symbol, name, sector)
+        data["recommendations_summary"] = pd.DataFrame(
+            {
+                "period": ["0m", "-1m", "-2m", "-3m"],
+                **{
+                    column: rng.integers(0, 15, size=4)
+                    for column in ["strongBuy", "buy", "hold", "sell", "strongSell"]
+                },
+            }
+        )
+        tickers[f"{symbol}.NS"] = data
+        news[symbol] = [
+            {
+                "title": f"{name} news headline {i}",
+                "href": f"https://news.example.com/{symbol.lower()}/{i}",
+                "body": f"{name} reported its results, the shares moved {i}% on the day. " * 3,
+            }
+            for i in range(8)
+        ]
+    return {
+        "nse_csv": nse_csv,
+        "tickers": tickers,
+        "news": news,
+        "companies": {symbol: name for symbol, name, _ in SYNTHETIC_COMPANIES},
+        "answer": ANSWER,
+    }
+
+
+def load_fixtures(path: Optional[str] = RECORDED_FIXTURES) -> Dict[str, Any]:
+    """The recorded fixtures if there is a recording, the synthetic ones otherwise."""
+    if path and os.path.exists(path):
+        with open(path, "rb") as f:
+            return pickle.load(f)
+    return synthetic_fixtures()
+
+
+def record(symbols: List[str], path: str = RECORDED_FIXTURES) -> Dict[str, Any]:
+    """Record the live yahoo finance, DuckDuckGo & NSE responses for the symbols."""
+    import requests
+    import yfinance as yf
+    from llama_index.tools.duckduckgo import DuckDuckGoSearchToolSpec
+    from tools.utils import NSE_EQUITY_LIST_URL, NSE_HEADERS
+
+    response = requests.get(NSE_EQUITY_LIST_URL, headers=NSE_HEADERS, timeout=30)
+    response.raise_for_status()
+    search = DuckDuckGoSearchToolSpec()
+
+    tickers, news, companies = {}, {}, {}
+    for symbol in symbols:
+        ticker = yf.Ticker(f"{symbol}.NS")
+        data = {
+            attribute: getattr(ticker, attribute)
+            for attribute in ["info", "balance_sheet", "financials", "cashflow", "recommendations_summary"]
+        }
+        tickers[f"{symbol}.NS"] = data
+        companies[symbol] = data["info"].get("longName", symbol)
+        news[symbol] = search.duckduckgo_full_search(f"{symbol}.NS recent news", max_results=8)
+        print(f"Recorded {symbol}")
+
+    fixtures = {
+        "nse_csv": response.content.decode("utf-8"),
+        "tickers": tickers,
+        "news": news,
+        "companies": companies,
+        "answer": ANSWER,
+    }
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as f:
+        pickle.dump(fixtures, f, protocol=pickle.HIGHEST_PROTOCOL)
+    return fixtures
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Record the benchmark fixtures from the live providers.")
+    parser.add_argument("symbols", nargs="+", help="NSE symbols to record")
+    parser.add_argument("--path", default=RECORDED_FIXTURES)
+    args = parser.parse_args()
+    record(args.symbols, args.path)
@@ -0,0 +1,223 @@
+"""
+Offline stage-level benchmarks of the analysis pipeline.
+
+Every provider is stubbed with the fixtures (see `benchmarks.fixtures`), so this runs
+without network. The stages are timed separately and reported as latency percentiles,
+throughput and the peak memory allocated per call.
+
+Usage:
+    python -m benchmarks.run --iterations 50
+    python -m benchmarks.run --latency 0.2 --token-latency 0.02  # with simulated round-trips
+    python -m benchmarks.run --output bench.json                  # save the results
+    python -m benchmarks.run --baseline bench.json                # fail on a p50 regression
+"""
+import os
+import tempfile
+
+# keep the benchmark caches away from the app caches, before the tools read CACHE_DIR
+os.environ["STOCK_CACHE_DIR"] = tempfile.mkdtemp(prefix="stock-bench-")
+
+import argparse
+import asyncio
+import json
+import sys
+import tracemalloc
+from time import perf_counter
+from typing import Any, Callable, Dict, List
+import numpy as np
+from llama_index.core.agent import FunctionCallingAgent
+from agents.streaming_worker import StreamingFunctionCallingAgentWorker
+from benchmarks.fixtures import load_fixtures, RECORDED_FIXTURES
+from benchmarks.stubs import StubLLM, offline
+from tools import functions
+from tools.cache import TieredCache, YF_CACHE_TTLS, SEARCH_CACHE_TTLS
+from tools.ticker_data import TickerData
+from tools.tools import stock_analyser
+from utils import TokenBudgetHistory, chat_tokenizer
+
+# the chat history budget of the app, chainlit_app.MAX_CONTEXT_LENGTH
+HISTORY_TOKENS = 4000
+PERCENTILES = (50, 90, 99)
+
+
+def measure(fn: Callable[[int], Any], iterations: int, alloc_iterations: int) -> Dict[str, float]:
+    """Time `fn(i)` for every iteration, then trace the allocations of a few more calls."""
+    durations = []
+    for i in range(iterations):
+        start = perf_counter()
+        fn(i)
+        durations.append(perf_counter() - start)
+
+    peaks = []
+    tracemalloc.start()
+    for i in range(alloc_iterations):
+        tracemalloc.reset_peak()
+        baseline = tracemalloc.get_traced_memory()[0]
+        fn(i)
+        peaks.append(tracemalloc.get_traced_memory()[1] - baseline)
+    tracemalloc.stop()
+
+    durations_ms = np.array(durations) * 1000
+    result = {
+        "calls": iterations,
+        **{f"p{p}_ms": float(np.percentile(durations_ms, p)) for p in PERCENTILES},
+        "mean_ms": float(durations_ms.mean()),
+        "throughput_per_s": iterations / sum(durations) if sum(durations) else float("inf"),
+    }
+    if peaks:
+        result["peak_alloc_kib"] = float(np.median(peaks)) / 1024
+    return result
+
+
+def benchmark(fixtures: Dict[str, Any], iterations: int, alloc_iterations: int, latency: float, token_latency: float, rate_limits: bool = False) -> Dict[str, Dict[str, float]]:
+    companies = list(fixtures["companies"].items())
+    names = [name for _, name in companies]
+    results = {}
+
+    with offline(fixtures, latency=latency, rate_limits=rate_limits):
+        # the first resolve builds the NSE list & the resolver index
+        start = perf_counter()
+        functions._resolve_ticker(names[0])
+        results["resolver_startup"] = {"calls": 1, "p50_ms": (perf_counter() - start) * 1000}
+
+        def resolve(i: int):
+            functions._resolve_ticker(names[i % len(names)])
+
+        def fetch_cold(i: int):
+            symbol = companies[i % len(companies)][0]
+            functions.search.cache = TieredCache(None, ttls=SEARCH_CACHE_TTLS)
+            data = TickerData(symbol, cache=TieredCache(None, ttls=YF_CACHE_TTLS))
+            functions._fetch_company_data(symbol, data)
+
+        def fetch_warm(i: int):
+            symbol = companies[i % len(companies)][0]
+            functions._fetch_company_data(symbol, TickerData(symbol))
+
+        functions.search.cache = TieredCache(None, ttls=SEARCH_CACHE_TTLS)
+        fetched = [
+            (symbol, *functions._fetch_company_data(symbol, TickerData(symbol)))
+            for symbol, _ in companies
+        ]
+
+        def format_report(i: int):
+            symbol, data, errors = fetched[i % len(fetched)]
+            functions._company_report(symbol, data, errors).render(
+                max_tokens=functions.TOOL_OUTPUT_TOKEN_BUDGET
+            )
+
+        # a long running chat, every turn pushes the oldest ones out, counted like the app does
+        history = TokenBudgetHistory(HISTORY_TOKENS, tokenizer=chat_tokenizer())
+        answer = fixtures["answer"].format(name=names[0])
+
+        def trim(i: int):
+            history.append(f"Human: How is {names[i % len(names)]} performing?")
+            history.append(f"Assistant: {answer}")
+
+        def analyse_company(i: int):
+            functions.analyse_company_yf(names[i % len(names)])
+
+        first_tokens = []
+
+        async def chat(i: int):
+            name = names[i % len(names)]
+            llm = StubLLM(answer=fixtures["answer"].format(name=name), token_latency=token_latency)
+            worker = StreamingFunctionCallingAgentWorker.from_tools(tools=[stock_analyser], llm=llm, max_function_calls=3)
+            agent = FunctionCallingAgent(agent_worker=worker, llm=llm)
+            start = perf_counter()
+            response = await agent.astream_chat("\n".join(history.messages + [f"Analyse {name}"]))
+            async for i, _ in _aenumerate(response.async_response_gen()):
+                if i == 0:
+                    first_tokens.append(perf_counter() - start)
+
+        loop = asyncio.new_event_loop()
+
+        def generate(i: int):
+            loop.run_until_complete(chat(i))
+
+        stages = {
+            "resolve": resolve,
+            "fetch_cold": fetch_cold,
+            "fetch_warm": fetch_warm,
+            "format": format_report,
+            "trim": trim,
+            "analyse_company": analyse_company,
+            "generate": generate,
+        }
+        for name, fn in stages.items():
+            results[name] = measure(fn, iterations, alloc_iterations)
+        loop.close()
+
+        first_tokens_ms = np.array(first_tokens[:iterations]) * 1000
+        results["first_token"] = {
+            "calls": len(first_tokens_ms),
+            **{f"p{p}_ms": float(np.percentile(first_tokens_ms, p)) for p in PERCENTILES},
+            "mean_ms": float(first_tokens_ms.mean()),
+        }
+    return results
+
+
+async def _aenumerate(iterable):
+    i = 0
+    async for item in iterable:
+        yield i, item
+        i += 1
+
+
+def print_results(results: Dict[str, Dict[str, float]]):
+    columns = ["calls", "p50_ms", "p90_ms", "p99_ms", "mean_ms", "throughput_per_s", "peak_alloc_kib"]
+    print(f"{'stage':<18}" + "".join(f"{column:>18}" for column in columns))
+    for stage, result in results.items():
+        cells = [result.get(column) for column in columns]
+        print(
+            f"{stage:<18}"
+            + "".join(f"{'-':>18}" if cell is None else f"{cell:>18,.2f}" for cell in cells)
+        )
+
+
+def compare(results: Dict[str, Dict[str, float]], baseline: Dict[str, Dict[str, float]], tolerance: float) -> List[str]:
+    """The stages whose median latency is more than `tolerance` slower than the baseline."""
+    regressions = []
+    for stage, result in results.items():
+        before = baseline.get(stage, {}).get("p50_ms")
+        if before and result["p50_ms"] > before * (1 + tolerance):
+            regressions.append(f"{stage}: p50 {before:.2f}ms -> {result['p50_ms']:.2f}ms")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the analysis pipeline offline.")
+    parser.add_argument("--iterations", type=int, default=30)
+    parser.add_argument("--alloc-iterations", type=int, default=3, help="Calls traced for the allocations")
+    parser.add_argument("--latency", type=float, default=0.0, help="Simulated provider round-trip, in seconds")
+    parser.add_argument("--token-latency", type=float, default=0.0, help="Simulated LLM time per token, in seconds")
+    parser.add_argument("--rate-limits", action="store_true", help="Keep the provider rate limits")
+    parser.add_argument("--fixtures", default=RECORDED_FIXTURES, help="Recorded fixtures, the synthetic ones are used if missing")
+    parser.add_argument("--output", help="Save the results as JSON")
+    parser.add_argument("--baseline", help="Results JSON to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed p50 slowdown against the baseline")
+    args = parser.parse_args()
+
+    results = benchmark(
+        load_fixtures(args.fixtures),
+        iterations=args.iterations,
+        alloc_iterations=args.alloc_iterations,
+        latency=args.latency,
+        token_latency=args.token_latency,
+        rate_limits=args.rate_limits,
+    )
+    print_results(results)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        for regression in regressions:
+            print(f"[REGRESSION]: {regression}")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,165 @@
+"""
+Offline stand-ins for yahoo finance, DuckDuckGo, the NSE archives and the LLM.
+
+Each stub serves the fixtures after an optional `latency`, to mimic the round-trip
+of the provider it replaces.
+"""
+import asyncio
+import copy
+from contextlib import ExitStack, contextmanager
+from time import sleep
+from typing import Any, Dict, List
+from unittest import mock
+import regex as re
+from llama_index.core.base.llms.types import (
+    ChatMessage,
+    ChatResponse,
+    LLMMetadata,
+    MessageRole,
+)
+from llama_index.core.llms.callbacks import llm_chat_callback
+from llama_index.core.llms.function_calling import FunctionCallingLLM, ToolSelection
+
+
+class StubTicker:
+    """A `yf.Ticker` serving the fixture data."""
+
+    fixtures: Dict[str, Any] = {}
+    latency: float = 0.0
+
+    def __init__(self, symbol: str):
+        self.ticker = symbol
+        self._data = self.fixtures["tickers"].get(symbol, {})
+
+    def __getattr__(self, attribute: str):
+        if attribute.startswith("_"):
+            raise AttributeError(attribute)
+        sleep(self.latency)
+        # a copy, yfinance hands out a new object per request
+        value = self._data.get(attribute)
+        return copy.deepcopy(value) if value is not None else {} if attribute == "info" else None
+
+
+class StubResponse:
+    def __init__(self, content: bytes, status_code: int = 200):
+        self.content = content
+        self.status_code = status_code
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise RuntimeError(f"HTTP {self.status_code}")
+
+
+def stub_requests_get(fixtures: Dict[str, Any], latency: float = 0.0):
+    """`requests.get` serving the NSE equity list, every other URL is a 404."""
+
+    def get(url: str, *args, **kwargs) -> StubResponse:
+        sleep(latency)
+        if url.endswith("EQUITY_L.csv"):
+            return StubResponse(fixtures["nse_csv"].encode("utf-8"))
+        return StubResponse(b"", status_code=404)
+
+    return get
+
+
+def stub_search(fixtures: Dict[str, Any], latency: float = 0.0):
+    """A DuckDuckGo full search serving the fixture news of the symbol in the query."""
+
+    def search(query: str, max_results: int = 10, **kwargs) -> List[dict]:
+        sleep(latency)
+        symbol = query.split()[0].split(".")[0].upper()
+        return copy.deepcopy(fixtures["news"].get(symbol, [])[:max_results])
+
+    return search
+
+
+class StubLLM(FunctionCallingLLM):
+    """
+    A function calling LLM that calls `analyse_company` for the company in the
+    question, then streams the fixture answer word by word.
+    """
+
+    answer: str = ""
+    token_latency: float = 0.0
+
+    @property
+    def metadata(self) -> LLMMetadata:
+        return LLMMetadata(is_function_calling_model=True, model_name="stub")
+
+    def _prepare_chat_with_tools(self, tools, user_msg=None, chat_history=None, **kwargs):
+        messages = list(chat_history or [])
+        if user_msg:
+            messages.append(user_msg if isinstance(user_msg, ChatMessage) else ChatMessage(role="user", content=user_msg))
+        return {"messages": messages}
+
+    def get_tool_calls_from_response(self, response, error_on_no_tool_call=True, **kwargs):
+        return [
+            ToolSelection(tool_id=f"call_{i}", tool_name=call["name"], tool_kwargs=call["kwargs"])
+            for i, call in enumerate(response.message.additional_kwargs.get("tool_calls", []))
+        ]
+
+    @llm_chat_callback()
+    async def astream_chat(self, messages, **kwargs):
+        messages = list(messages)
+
+        async def gen():
+            yield ChatResponse(message=ChatMessage(role="assistant", content=""), delta="")
+            if messages[-1].role != MessageRole.TOOL:
+                company = re.sub(r"(?i)^(analyse|analyze|how is)\s+|\?$", "", messages[-1].content.splitlines()[-1]).strip()
+                call = {"name": "analyse_company", "kwargs": {"company_name": company}}
+                yield ChatResponse(
+                    message=ChatMessage(role="assistant", content="", additional_kwargs={"tool_calls": [call]}),
+                    delta="",
+                )
+                return
+            text = ""
+            for word in self.answer.split(" "):
+                await asyncio.sleep(self.token_latency)
+                delta = word if not text else f" {word}"
+                text += delta
+                yield ChatResponse(message=ChatMessage(role="assistant", content=text), delta=delta)
+
+        return gen()
+
+    def chat(self, *args, **kwargs):
+        raise NotImplementedError
+
+    def complete(self, *args, **kwargs):
+        raise NotImplementedError
+
+    def stream_chat(self, *args, **kwargs):
+        raise NotImplementedError
+
+    def stream_complete(self, *args, **kwargs):
+        raise NotImplementedError
+
+    async def achat(self, *args, **kwargs):
+        raise NotImplementedError
+
+    async def acomplete(self, *args, **kwargs):
+        raise NotImplementedError
+
+    async def astream_complete(self, *args, **kwargs):
+        raise NotImplementedError
+
+
+@contextmanager
+def offline(fixtures: Dict[str, Any], latency: float = 0.0, rate_limits: bool = False):
+    """
+    Swap yahoo finance, DuckDuckGo & the NSE archives for the stubs.
+
+    The provider rate limits are lifted unless `rate_limits`, so the stages are timed
+    without waiting on the limiter.
+    """
+    from tools import functions
+    from tools.rate_limit import DEFAULT_RATE_LIMITS, TokenBucket, rate_limiter
+
+    StubTicker.fixtures, StubTicker.latency = fixtures, latency
+    with ExitStack() as stack:
+        stack.enter_context(mock.patch("yfinance.Ticker", StubTicker))
+        stack.enter_context(mock.patch("requests.get", stub_requests_get(fixtures, latency)))
+        stack.enter_context(mock.patch.object(functions.search, "search_fn", stub_search(fixtures, latency)))
+        if not rate_limits:
+            unlimited = {provider: TokenBucket(1e9, 10**9) for provider in DEFAULT_RATE_LIMITS}
+            stack.enter_context(mock.patch.object(rate_limiter, "_buckets", unlimited))
+        yield
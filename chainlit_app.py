@@ -1,22 +1,39 @@
+from time import perf_counter
+
+APP_START = perf_counter()
+
+import asyncio
 import chainlit as cl
 from chainlit.input_widget import Select, Slider
 from agents.stock_analysis_function_calling import create_agent
-from utils import calculate_token_count_of_message
+from utils import TokenBudgetHistory, chat_tokenizer
+from chat_store import chat_store
+from tools.report_cache import report_cache
+from tools.warmup import start_warmup_scheduler
+from tools.metrics import start_metrics_server
+from tools.registry import tool_registry
+from tools.single_flight import single_flight
+from agents.metrics_handler import MetricsCallbackHandler
 from llama_index.core.callbacks import CallbackManager
+from llama_index.core.chat_engine.types import StreamingAgentChatResponse
 from termcolor import colored
-import asyncio
-import uuid
-import json
 import os
 
-MAX_CONTEXT_LENGTH = 4000  # Adjust this based on your model's context window
+# Adjust this based on your model's context window, the history is counted with
+# chat_tokenizer (cl100k) which is at or above the Llama / Qwen counts
+MAX_CONTEXT_LENGTH = 4000
+# Number of the last logged messages read back into the history of a resumed chat
+RESUME_LAST_MESSAGES = 200
+
+# Warm up the caches every weekday before the market opens, set WARMUP_AT=HH:MM (IST) to enable
+if os.getenv("WARMUP_AT"):
+    start_warmup_scheduler(at=os.getenv("WARMUP_AT"))
 
+# Tool, data source & LLM latencies and the cache hit ratios, on http://127.0.0.1:METRICS_PORT/metrics
+start_metrics_server()
 
-async def save_chat_history(messages, filename, dir: str = "./history"):
-    """Save the chat history"""
-    os.makedirs(dir, exist_ok=True)
-    with open(os.path.join(dir, filename), "w") as fp:
-        json.dump(messages, fp)
+# the tools are loaded on first use, the report shows what the startup paid for
+print(colored(tool_registry.report(startup_seconds=perf_counter() - APP_START), color="light_blue"))
 
 
 # @cl.oauth_callback
@@ -126,11 +143,11 @@ async def start():
         ]
     ).send()
     # set the message history
-    cl.user_session.set("message_history", [])
+    cl.user_session.set("message_history", TokenBudgetHistory(MAX_CONTEXT_LENGTH, tokenizer=chat_tokenizer()))
 
     await setup_agent(settings)
-    # set the session id
-    session_id = uuid.uuid1()
+    # set the session id, the chat thread id so a resumed chat finds its history log
+    session_id = cl.context.session.thread_id
     cl.user_session.set("session_id", session_id)
 
     # await cl.Message(
@@ -139,11 +156,29 @@ async def start():
     print(colored(f"[UI]: Session id: {session_id}", color="light_cyan"))
 
 
+@cl.on_chat_resume
+async def resume(thread):
+    print(colored(f"[UI]: Resuming chat {thread['id']}", color="light_cyan"))
+    await start()
+    # only the tail of the log is read, the history keeps what fits the budget anyway
+    messages = await asyncio.to_thread(chat_store.load, thread["id"], RESUME_LAST_MESSAGES)
+    cl.user_session.set(
+        "message_history",
+        TokenBudgetHistory(MAX_CONTEXT_LENGTH, tokenizer=chat_tokenizer(), messages=messages),
+    )
+
+
+@cl.on_chat_end
+async def end():
+    # write out whatever is still queued for the session
+    await chat_store.flush()
+
+
 @cl.on_settings_update
 async def setup_agent(settings):
     """Set up the agent based on the settings update"""
     # get the callback manager
-    callback_manager = CallbackManager(handlers=[cl.LlamaIndexCallbackHandler()])
+    callback_manager = CallbackManager(handlers=[cl.LlamaIndexCallbackHandler(), MetricsCallbackHandler()])
 
     try:
         # create the agent
@@ -156,10 +191,34 @@ async def setup_agent(settings):
 
         # add agent to the user session
         cl.user_session.set("agent", agent)
+        cl.user_session.set("model_name", settings["model_name"])
     except Exception as e:
         await cl.Message(author="System", content=f"An Error occurred while initializing the agent: {e}")
         raise e
 
+async def stream_agent_response(query: str, message_history: TokenBudgetHistory, out_message: cl.Message, thinking_msg: cl.Message):
+    """Run the agent and stream its answer into out_message."""
+    agent = cl.user_session.get("agent")
+
+    response = await agent.astream_chat("\n".join(message_history.messages + [query]))
+
+    if isinstance(response, StreamingAgentChatResponse):
+        # stream the tokens as the LLM generates them
+        async for token in response.async_response_gen():
+            if thinking_msg is not None:
+                # Remove the thinking message once the answer starts
+                await thinking_msg.remove()
+                thinking_msg = None
+            await out_message.stream_token(token)
+    else:
+        # a tool returned directly / the function call limit was hit
+        await out_message.stream_token(response.response)
+
+    if thinking_msg is not None:
+        await thinking_msg.remove()
+        thinking_msg = None
+    await out_message.send()
+
 
 @cl.on_message
 async def main(message: cl.Message):
@@ -176,44 +235,55 @@ async def main(message: cl.Message):
     await thinking_msg.send()
 
     try:
-        await asyncio.sleep(1)
-        # Perform the stock analysis
-        agent = cl.user_session.get("agent")
+        # repeated report questions are answered from the report cache
+        # the resolver & the report store are blocking, keep them off the event loop
+        report_key = await asyncio.to_thread(report_cache.match, query, cl.user_session.get("model_name"))
+        cached_report = await asyncio.to_thread(report_cache.get, report_key) if report_key else None
 
-        result = await cl.make_async(agent.chat)("\n".join(message_history + [query]))
+        out_message = cl.Message(author="Agent", content="")
+        streamed = False
+        if cached_report is None and report_key:
+            async def generate_report() -> str:
+                nonlocal streamed
+                streamed = True
+                await stream_agent_response(query, message_history, out_message, thinking_msg)
+                await asyncio.to_thread(report_cache.set, report_key, out_message.content)
+                return out_message.content
+
+            # sessions asking for the same report at the same time share one agent run,
+            # only the first one streams it live
+            report = await single_flight.ado(("llm",) + tuple(report_key), generate_report)
+            if not streamed:
+                print(colored(f"[REPORT CACHE]: Shared the in-flight {report_key}", color="light_cyan"))
+                cached_report = report
 
-        print(colored(f"[AGENT RESPONSE]: {result.response}", color="magenta"))
+        if streamed:
+            thinking_msg = None
+        elif cached_report is not None:
+            print(colored(f"[REPORT CACHE]: Serving {report_key}", color="light_cyan"))
+            await thinking_msg.remove()
+            thinking_msg = None
+            # the whole report in one message, no token by token replay
+            out_message.content = cached_report
+            await out_message.send()
+        else:
+            await stream_agent_response(query, message_history, out_message, thinking_msg)
+            thinking_msg = None
 
-        # Add the query and response to the message history
-        message_history.append(f"Human: {query}")
-        message_history.append(f"Assistant: {result.response}")
+        print(colored(f"[AGENT RESPONSE]: {out_message.content}", color="magenta"))
 
-        # Limit the context length
-        while (
-            calculate_token_count_of_message("\n".join(message_history))
-            > MAX_CONTEXT_LENGTH
-        ):
-            message_history.pop(0)
+        # Add the query and response to the message history, the oldest messages
+        # are dropped to keep it within the context length
+        turn = [f"Human: {query}", f"Assistant: {out_message.content}"]
+        for turn_message in turn:
+            message_history.append(turn_message)
 
         # Update the user session with the new message history
         cl.user_session.set("message_history", message_history)
 
-        out_message = cl.Message(author="Agent", content="")
-        # a facade for streaming
-        for char in result.response:
-            await out_message.stream_token(char)
-
-        # Remove the thinking message
-        await thinking_msg.remove()
-
-        # print("here")
-        # Send a new message with the result instead of updating
-        await out_message.send()
-        # save chat history
+        # save chat history, only the new messages are appended in the background
         id = cl.user_session.get("session_id")
-        await save_chat_history(
-            messages=message_history, filename=f"chat_history_{id}.json"
-        )
+        chat_store.append(str(id), turn)
 
     except Exception as e:
         print(colored(f"[EXCEPTION]: {e}", color="red"))
@@ -221,7 +291,8 @@ async def main(message: cl.Message):
         await cl.Message(content=f"An error occurred: {str(e)}").send()
 
         # remove the thinking message
-        await thinking_msg.remove()
+        if thinking_msg is not None:
+            await thinking_msg.remove()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,183 @@
+import asyncio
+import json
+import os
+from collections import defaultdict, deque
+from time import time
+from typing import Dict, List, Optional, Tuple
+
+# How often (in seconds) the queued messages are written to disk
+FLUSH_INTERVAL = 1.0
+# A session log is compacted to its last `COMPACT_KEEP_LAST` messages once it grows past
+# this, the older messages are moved to the session's archive log, nothing is deleted
+COMPACT_THRESHOLD = int(os.getenv("CHAT_COMPACT_THRESHOLD", 2000))
+COMPACT_KEEP_LAST = int(os.getenv("CHAT_COMPACT_KEEP_LAST", 500))
+
+
+class ChatHistoryStore:
+    """
+    Append-only chat history logs, one JSONL file per session, written in the background.
+
+    `append` only queues the messages. A background task wakes up every `flush_interval`
+    seconds, groups the queued messages by session and appends each group to its file
+    in one write on a worker thread, so the event loop never waits on the disk and the
+    cost of a turn does not grow with the length of the conversation. A long log is
+    compacted by moving its older messages to an archive log, so the full transcript is
+    kept. A resumed chat reads back only the tail with `load(session_id, last_n)`.
+
+    Example:
+        >>> store = ChatHistoryStore("./history")
+        >>> store.append(session_id, ["Human: Hi", "Assistant: Hello!"])
+        >>> await store.flush()
+        >>> store.load(session_id)
+        ['Human: Hi', 'Assistant: Hello!']
+    """
+
+    def __init__(
+        self,
+        dir: str = "./history",
+        flush_interval: float = FLUSH_INTERVAL,
+        compact_threshold: int = COMPACT_THRESHOLD,
+        compact_keep_last: int = COMPACT_KEEP_LAST,
+    ):
+        self.dir = dir
+        self.flush_interval = flush_interval
+        self.compact_threshold = compact_threshold
+        self.compact_keep_last = compact_keep_last
+        self._pending: List[Tuple[str, dict]] = []
+        self._line_counts: Dict[str, int] = {}
+        self._writer: Optional[asyncio.Task] = None
+        # the background writer & an explicit flush never write at the same time
+        self._write_lock = asyncio.Lock()
+
+    def path(self, session_id: str) -> str:
+        return os.path.join(self.dir, f"chat_history_{session_id}.jsonl")
+
+    def archive_path(self, session_id: str) -> str:
+        return os.path.join(self.dir, f"chat_history_{session_id}.archive.jsonl")
+
+    def append(self, session_id: str, messages: List[str]):
+        """Queue the messages to be appended to the session log, returns immediately."""
+        now = time()
+        self._pending.extend(
+            (session_id, {"ts": now, "message": message}) for message in messages
+        )
+        self._ensure_writer()
+
+    async def flush(self):
+        """Write all the queued messages now, the ones that fail to write stay queued."""
+        async with self._write_lock:
+            batch, self._pending = self._pending, []
+            if not batch:
+                return
+            failed, error = await asyncio.to_thread(self._write, batch)
+            if failed:
+                # ahead of the messages queued meanwhile, to keep the order
+                self._pending[:0] = failed
+                raise error
+
+    async def close(self):
+        """Stop the background writer after writing everything queued."""
+        if self._writer is not None:
+            self._writer.cancel()
+            self._writer = None
+        await self.flush()
+
+    def load(self, session_id: str, last_n: Optional[int] = None) -> List[str]:
+        """Read the messages of a session, only the last `last_n` if given."""
+        lines = _read_lines(self.path(session_id), last_n)
+        if not last_n or len(lines) < last_n:
+            # the older messages moved to the archive by a compaction
+            archived = _read_lines(self.archive_path(session_id), last_n and last_n - len(lines))
+            lines = archived + lines
+        messages = []
+        for line in lines:
+            try:
+                messages.append(json.loads(line)["message"])
+            except (json.JSONDecodeError, KeyError):
+                # a partially written last line
+                continue
+        return messages
+
+    def compact(self, session_id: str, keep_last: Optional[int] = None):
+        """
+        Rewrite the session log with only its last `keep_last` messages, the older ones
+        are appended to the archive log first, so `load` still returns all of them.
+        """
+        keep_last = keep_last or self.compact_keep_last
+        path = self.path(session_id)
+        if not os.path.exists(path):
+            return
+        with open(path) as fp:
+            lines = fp.readlines()
+        older, lines = lines[:-keep_last], lines[-keep_last:]
+        if not older:
+            return
+        # a crash between the two writes leaves a message in both logs, never in none
+        with open(self.archive_path(session_id), "a") as fp:
+            fp.writelines(older)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w") as fp:
+            fp.writelines(lines)
+        os.replace(tmp_path, path)
+        self._line_counts[session_id] = len(lines)
+
+    def _ensure_writer(self):
+        if self._writer is None or self._writer.done():
+            self._writer = asyncio.get_running_loop().create_task(self._run())
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                # a cancel (on close) lets the write in progress finish, holding the lock
+                await asyncio.shield(self.flush())
+            except Exception as e:
+                print(f"Error writing the chat history: {e}")
+
+    def _write(self, batch: List[Tuple[str, dict]]) -> Tuple[List[Tuple[str, dict]], Optional[Exception]]:
+        """Append the batch to the session logs, returns the records not written & the error."""
+        sessions = defaultdict(list)
+        for session_id, record in batch:
+            sessions[session_id].append(record)
+
+        failed, error = [], None
+        for session_id, records in sessions.items():
+            try:
+                os.makedirs(self.dir, exist_ok=True)
+                path = self.path(session_id)
+                if session_id not in self._line_counts:
+                    self._line_counts[session_id] = _count_lines(path)
+                with open(path, "a") as fp:
+                    fp.writelines(json.dumps(record) + "\n" for record in records)
+                self._line_counts[session_id] += len(records)
+            except Exception as e:
+                # the line count is recounted from the file on the next write
+                self._line_counts.pop(session_id, None)
+                failed.extend((session_id, record) for record in records)
+                error = e
+                continue
+            if self._line_counts[session_id] > self.compact_threshold:
+                try:
+                    self.compact(session_id)
+                except Exception as e:
+                    # the messages are written, the log is compacted on a later write
+                    print(f"Error compacting the chat history of {session_id}: {e}")
+        return failed, error
+
+
+def _read_lines(path: str, last_n: Optional[int] = None) -> List[str]:
+    if not os.path.exists(path):
+        return []
+    with open(path) as fp:
+        # a deque with a maxlen keeps only the tail without holding the whole file
+        return list(deque(fp, maxlen=last_n)) if last_n else fp.readlines()
+
+
+def _count_lines(path: str) -> int:
+    if not os.path.exists(path):
+        return 0
+    with open(path, "rb") as fp:
+        return sum(1 for _ in fp)
+
+
+chat_store = ChatHistoryStore()
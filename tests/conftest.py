@@ -0,0 +1,7 @@
+import os
+import sys
+import tempfile
+
+# keep the test caches away from the app caches, before the tools read CACHE_DIR
+os.environ["STOCK_CACHE_DIR"] = tempfile.mkdtemp(prefix="stock-tests-")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,67 @@
+import asyncio
+import pytest
+from chat_store import ChatHistoryStore
+
+
+def test_flushed_messages_are_loaded_back(tmp_path):
+    async def run():
+        store = ChatHistoryStore(str(tmp_path), flush_interval=60)
+        store.append("s1", ["Human: Hi", "Assistant: Hello!"])
+        store.append("s2", ["Human: Bye"])
+        await store.close()
+        return store
+
+    store = asyncio.run(run())
+    assert store.load("s1") == ["Human: Hi", "Assistant: Hello!"]
+    assert store.load("s1", last_n=1) == ["Assistant: Hello!"]
+    assert store.load("s2") == ["Human: Bye"]
+
+
+def test_a_failed_write_keeps_the_messages_queued(tmp_path):
+    blocker = tmp_path / "history"
+    blocker.write_text("not a directory")
+
+    async def run():
+        store = ChatHistoryStore(str(blocker), flush_interval=60)
+        store.append("s1", ["Human: Hi"])
+        with pytest.raises(OSError):
+            await store.flush()
+        assert [record["message"] for _, record in store._pending] == ["Human: Hi"]
+        # the next flush writes them once the disk is back
+        blocker.unlink()
+        await store.close()
+        return store
+
+    store = asyncio.run(run())
+    assert store.load("s1") == ["Human: Hi"]
+
+
+def test_concurrent_flushes_write_every_message_once(tmp_path):
+    async def run():
+        store = ChatHistoryStore(str(tmp_path), flush_interval=60)
+        for i in range(50):
+            store.append("s1", [f"message {i}"])
+            if i % 10 == 0:
+                await asyncio.gather(store.flush(), store.flush())
+        await store.close()
+        return store
+
+    store = asyncio.run(run())
+    assert store.load("s1") == [f"message {i}" for i in range(50)]
+    assert store._line_counts["s1"] == 50
+
+
+def test_compaction_archives_the_older_messages(tmp_path):
+    async def run():
+        store = ChatHistoryStore(str(tmp_path), flush_interval=60, compact_threshold=10, compact_keep_last=4)
+        for i in range(25):
+            store.append("s1", [f"message {i}"])
+            await store.flush()
+        await store.close()
+        return store
+
+    store = asyncio.run(run())
+    with open(store.path("s1")) as fp:
+        assert sum(1 for _ in fp) <= 10
+    assert store.load("s1") == [f"message {i}" for i in range(25)]
+    assert store.load("s1", last_n=12) == [f"message {i}" for i in range(13, 25)]
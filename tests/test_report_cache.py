@@ -0,0 +1,50 @@
+import pytest
+from tools.cache import TieredCache
+from tools.report_cache import ReportCache
+from tools.resolver import Match
+
+COMPANIES = {
+    "reliance": "RELIANCE",
+    "tcs": "TCS",
+    "infosys": "INFY",
+    "wipro": "WIPRO",
+}
+
+
+class StubResolver:
+    def resolve(self, company_name: str):
+        symbol = COMPANIES.get(company_name.lower().removesuffix("'s"))
+        return Match(symbol, company_name, 1.0) if symbol else None
+
+
+@pytest.fixture
+def report_cache():
+    return ReportCache(cache=TieredCache(None), data_cache=TieredCache(None), resolver=StubResolver())
+
+
+@pytest.mark.parametrize(
+    "query",
+    [
+        "How is Reliance performing? Create a detailed report.",
+        "Give me a report of Reliance",
+        "Analyse Reliance",
+    ],
+)
+def test_full_report_questions_are_matched(report_cache, query):
+    key = report_cache.match(query, "model")
+    assert key is not None and (key.symbol, key.intent) == ("RELIANCE", "report")
+
+
+@pytest.mark.parametrize(
+    "query",
+    [
+        "Compare the performance of Reliance and TCS",
+        "Is Reliance performing better than TCS?",
+        "Analyse the technical indicators of Infosys",
+        "Give me a report of Wipro's debt only",
+        "Create a report on Reliance and TCS",
+        "What is the price of Reliance?",
+    ],
+)
+def test_other_questions_are_not_matched(report_cache, query):
+    assert report_cache.match(query, "model") is None
@@ -0,0 +1,138 @@
+import asyncio
+from typing import Any, List
+from llama_index.core.agent import FunctionCallingAgent
+from llama_index.core.base.llms.types import ChatMessage, ChatResponse, LLMMetadata, MessageRole
+from llama_index.core.chat_engine.types import AgentChatResponse, StreamingAgentChatResponse
+from llama_index.core.llms.function_calling import FunctionCallingLLM
+from llama_index.core.llms.llm import ToolSelection
+from llama_index.core.tools import FunctionTool
+from agents.streaming_worker import StreamingFunctionCallingAgentWorker
+
+
+class ScriptedLLM(FunctionCallingLLM):
+    """Streams the scripted replies in order, a reply is a list of text deltas & tool calls (dicts)."""
+
+    replies: List[List[Any]] = []
+    calls: int = 0
+
+    @property
+    def metadata(self) -> LLMMetadata:
+        return LLMMetadata(is_function_calling_model=True, model_name="scripted")
+
+    def _prepare_chat_with_tools(self, tools, user_msg=None, chat_history=None, **kwargs):
+        return {"messages": list(chat_history or [])}
+
+    def get_tool_calls_from_response(self, response, error_on_no_tool_call=True, **kwargs):
+        return [
+            ToolSelection(tool_id=f"call_{i}", tool_name=call["name"], tool_kwargs=call["kwargs"])
+            for i, call in enumerate(response.message.additional_kwargs.get("tool_calls", []))
+        ]
+
+    async def astream_chat(self, messages, **kwargs):
+        reply = self.replies[min(self.calls, len(self.replies) - 1)]
+        self.calls += 1
+
+        async def gen():
+            yield ChatResponse(message=ChatMessage(role=MessageRole.ASSISTANT, content=""), delta="")
+            text, tool_calls = "", []
+            for part in reply:
+                if isinstance(part, dict):
+                    tool_calls.append(part)
+                    delta = ""
+                else:
+                    text += part
+                    delta = part
+                kwargs = {"tool_calls": list(tool_calls)} if tool_calls else {}
+                yield ChatResponse(
+                    message=ChatMessage(role=MessageRole.ASSISTANT, content=text, additional_kwargs=kwargs),
+                    delta=delta,
+                )
+
+        return gen()
+
+    def chat(self, *args, **kwargs):
+        raise NotImplementedError
+
+    def complete(self, *args, **kwargs):
+        raise NotImplementedError
+
+    def stream_chat(self, *args, **kwargs):
+        raise NotImplementedError
+
+    def stream_complete(self, *args, **kwargs):
+        raise NotImplementedError
+
+    async def achat(self, *args, **kwargs):
+        raise NotImplementedError
+
+    async def acomplete(self, *args, **kwargs):
+        raise NotImplementedError
+
+    async def astream_complete(self, *args, **kwargs):
+        raise NotImplementedError
+
+
+def get_price(symbol: str) -> str:
+    """Get the price of the stock."""
+    return f"{symbol}: 100"
+
+
+def get_report(symbol: str) -> str:
+    """Get the report of the stock."""
+    return f"The report of {symbol}"
+
+
+PRICE_CALL = {"name": "get_price", "kwargs": {"symbol": "TCS"}}
+
+
+def ask(replies: List[List[Any]], query: str = "What is the price of TCS?", max_function_calls: int = 3):
+    llm = ScriptedLLM(replies=replies)
+    tools = [
+        FunctionTool.from_defaults(get_price),
+        FunctionTool.from_defaults(get_report, return_direct=True),
+    ]
+    worker = StreamingFunctionCallingAgentWorker.from_tools(tools, llm=llm, max_function_calls=max_function_calls)
+    agent = FunctionCallingAgent(agent_worker=worker, llm=llm)
+
+    async def run():
+        response = await agent.astream_chat(query)
+        if isinstance(response, StreamingAgentChatResponse):
+            text = "".join([token async for token in response.async_response_gen()])
+        else:
+            text = response.response
+        return response, text
+
+    response, text = asyncio.run(run())
+    return response, text, llm
+
+
+def test_text_answer_is_streamed():
+    response, text, _ = ask([["The price ", "is 100."]])
+    assert isinstance(response, StreamingAgentChatResponse)
+    assert text == "The price is 100."
+
+
+def test_function_call_limit_ends_with_a_response():
+    response, _, llm = ask([[PRICE_CALL]], max_function_calls=1)
+    assert isinstance(response, AgentChatResponse) and response.is_dummy_stream
+    assert llm.calls == 2
+
+
+def test_return_direct_tool_answers():
+    response, text, _ = ask([[{"name": "get_report", "kwargs": {"symbol": "TCS"}}]])
+    assert isinstance(response, AgentChatResponse) and response.is_dummy_stream
+    assert text == "The report of TCS"
+
+
+def test_empty_answer_ends_with_a_response():
+    response, text, _ = ask([[]])
+    assert isinstance(response, AgentChatResponse) and response.is_dummy_stream
+    assert text == ""
+
+
+def test_tool_call_after_some_text_is_run():
+    response, text, llm = ask([["Let me check.", PRICE_CALL], ["TCS is at 100."]])
+    assert isinstance(response, StreamingAgentChatResponse)
+    assert text == "Let me check.\n\nTCS is at 100."
+    assert [source.tool_name for source in response.sources] == ["get_price"]
+    assert llm.calls == 2
@@ -0,0 +1,88 @@
+from time import time
+import numpy as np
+import pandas as pd
+import pytest
+import tools.functions as functions
+from tools.cache import TieredCache
+from tools.screener import Screener, SNAPSHOT_FIELDS
+from tools.statements import StatementEngine
+from tools.ticker_data import TickerData
+from tools.tools import tool_registry
+
+
+@pytest.fixture
+def snapshot_screener(monkeypatch, tmp_path):
+    snapshot = pd.DataFrame(
+        {column: np.nan for column in SNAPSHOT_FIELDS},
+        index=pd.Index(["AAA", "BBB", "CCC"], name="symbol"),
+    )
+    snapshot["name"] = ["Aaa Ltd", "Bbb Ltd", "Ccc Ltd"]
+    snapshot["sector"] = snapshot["industry"] = "Technology"
+    snapshot["pe"] = [10.0, 30.0, 20.0]
+    snapshot["roe"] = [0.2, 0.25, 0.1]
+    snapshot["market_cap"] = [1000.0, 3000.0, 2000.0]
+    screener = Screener(path=str(tmp_path / "snapshot.pkl"))
+    screener._snapshot, screener._built_at = snapshot, time()
+    monkeypatch.setattr(functions, "screener", screener)
+    return screener
+
+
+def test_screen_stocks_with_only_criteria(snapshot_screener):
+    output = tool_registry.get("screen_stocks").call(criteria="ROE > 15% sorted by market cap desc")
+    assert "Error" not in output.content
+    assert output.content.index("BBB") < output.content.index("AAA")
+    assert "CCC" not in output.content
+
+
+def test_screen_stocks_uses_the_order_in_the_criteria(snapshot_screener):
+    descending = tool_registry.get("screen_stocks").call(criteria="PE > 0 sorted by pe desc").content
+    assert descending.index("BBB") < descending.index("CCC") < descending.index("AAA")
+    ascending = tool_registry.get("screen_stocks").call(criteria="PE > 0 sorted by pe").content
+    assert ascending.index("AAA") < ascending.index("CCC") < ascending.index("BBB")
+
+
+STATEMENT_FRAMES = {
+    "financials": pd.DataFrame(
+        {"2024-03-31": [1.6e11, 1.6e10], "2023-03-31": [1.3e11, 1.3e10], "2022-03-31": [1e11, 1e10]},
+        index=["Total Revenue", "Net Income"],
+    ),
+    "balance_sheet": pd.DataFrame({"2024-03-31": [5e10], "2023-03-31": [4e10]}, index=["Stockholders Equity"]),
+    "cashflow": pd.DataFrame({"2024-03-31": [2e10], "2023-03-31": [1e10]}, index=["Free Cash Flow"]),
+    "quarterly_financials": pd.DataFrame(
+        {
+            "2024-06-30": [4.4e10, 4.4e9],
+            "2024-03-31": [4.3e10, 4.3e9],
+            "2023-12-31": [4.2e10, 4.2e9],
+            "2023-09-30": [4.1e10, 4.1e9],
+            "2023-06-30": [4e10, 4e9],
+        },
+        index=["Total Revenue", "Net Income"],
+    ),
+    "quarterly_balance_sheet": pd.DataFrame(),
+    "quarterly_cashflow": pd.DataFrame(),
+}
+
+
+@pytest.fixture
+def statement_engine(monkeypatch):
+    monkeypatch.setattr(
+        TickerData, "_fetch", lambda self, name, attribute: STATEMENT_FRAMES[name]
+    )
+    engine = StatementEngine(cache=TieredCache(None))
+    monkeypatch.setattr(functions, "statement_engine", engine)
+    return engine
+
+
+def test_financial_trends_without_line_items(statement_engine):
+    output = tool_registry.get("financial_trends").call(ticker="TEST").content
+    assert "Error" not in output
+    assert "## Growth summary" in output
+    # the revenue CAGR over the 2 years, 10,000 -> 16,000 Cr.
+    assert "|26.5|" in output
+    assert "Free Cash Flow" in output
+
+
+def test_financial_trends_with_line_items(statement_engine):
+    output = tool_registry.get("financial_trends").call(ticker="TEST", line_items="revenue").content
+    assert "Total Rev." in output
+    assert "Net Income" not in output
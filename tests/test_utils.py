@@ -0,0 +1,18 @@
+from utils import TokenBudgetHistory, calculate_token_count_of_message, chat_tokenizer
+
+
+def test_history_is_counted_with_the_tokenizer():
+    tokenizer = chat_tokenizer()
+    message = "Human: How is Reliance performing? Create a detailed report."
+    history = TokenBudgetHistory(max_tokens=100, tokenizer=tokenizer)
+    history.append(message)
+    assert history.total_tokens == len(tokenizer(message))
+    assert history.total_tokens != calculate_token_count_of_message(message)
+
+
+def test_history_drops_the_oldest_messages_over_the_budget():
+    history = TokenBudgetHistory(max_tokens=10, tokenizer=chat_tokenizer())
+    for i in range(10):
+        history.append(f"Assistant: answer {i}")
+    assert history.total_tokens <= 10
+    assert history.messages[-1] == "Assistant: answer 9"
@@ -0,0 +1,305 @@
+import os
+import pickle
+import sqlite3
+import threading
+from collections import OrderedDict, defaultdict
+from datetime import datetime
+from time import time
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+import pandas as pd
+from tools.metrics import metrics
+from tools.rate_limit import rate_limiter
+from tools.single_flight import single_flight
+from tools.utils import CACHE_DIR
+
+# Max number of entries held in memory by each cache
+MEMORY_CACHE_SIZE = int(os.getenv("MEMORY_CACHE_SIZE", 256))
+
+HOUR = 60 * 60
+DAY = 24 * HOUR
+
+# How long (in seconds) each kind of yahoo finance data stays fresh, the statements only
+# change every quarter while the quote driven info changes intraday
+YF_CACHE_TTLS = {
+    "info": 6 * HOUR,
+    "recommendations": DAY,
+    "balance_sheet": 7 * DAY,
+    "financials": 7 * DAY,
+    "cashflow": 7 * DAY,
+    "quarterly_balance_sheet": 7 * DAY,
+    "quarterly_financials": 7 * DAY,
+    "quarterly_cashflow": 7 * DAY,
+}
+
+# How long (in seconds) the search results are reused, on top of being keyed by the date
+SEARCH_CACHE_TTLS = {
+    "search": 12 * HOUR,
+    "news": 3 * HOUR,
+}
+
+
+def _is_empty(value: Any) -> bool:
+    """Empty responses are usually failed fetches, those are not worth caching."""
+    if value is None:
+        return True
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        return value.empty
+    if isinstance(value, (dict, list, tuple, str)):
+        return len(value) == 0
+    return False
+
+
+class TieredCache:
+    """
+    A two tier cache, an in-process LRU in front of a SQLite file on disk.
+
+    Entries are stored by (kind, key), every kind has its own TTL. A disk hit is promoted
+    to the memory tier, so the values shared across sessions and restarts are only
+    unpickled once per process. Hits and misses are counted per tier and per kind.
+
+    Example:
+        >>> cache = TieredCache("./cache/example.sqlite", ttls={"info": 3600})
+        >>> cache.get_or_fetch("info", "RELIANCE.NS", lambda: yf.Ticker("RELIANCE.NS").info)
+        >>> cache.stats()["info"]
+        {'memory_hits': 0, 'disk_hits': 0, 'misses': 1}
+    """
+
+    def __init__(
+        self,
+        path: Optional[str],
+        ttls: Optional[Dict[str, float]] = None,
+        default_ttl: float = HOUR,
+        max_size: int = MEMORY_CACHE_SIZE,
+    ):
+        self.path = path
+        self.ttls = ttls or {}
+        self.default_ttl = default_ttl
+        self.max_size = max_size
+        self._memory: "OrderedDict[Tuple[str, Hashable], Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.RLock()
+        self._stats = defaultdict(lambda: {"memory_hits": 0, "disk_hits": 0, "misses": 0})
+        self._evictions = 0
+        self._db: Optional[sqlite3.Connection] = None
+
+    @property
+    def db(self) -> Optional[sqlite3.Connection]:
+        if self._db is None and self.path:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            db = sqlite3.connect(self.path, check_same_thread=False)
+            # WAL lets several worker processes share the file
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS cache (kind TEXT, key TEXT, stored_at REAL, value BLOB, PRIMARY KEY (kind, key))"
+            )
+            db.execute("CREATE INDEX IF NOT EXISTS cache_key ON cache (key)")
+            db.commit()
+            self._db = db
+        return self._db
+
+    def ttl(self, kind: str) -> float:
+        return self.ttls.get(kind, self.default_ttl)
+
+    def get(self, kind: str, key: Hashable) -> Tuple[bool, Any]:
+        """Get a fresh entry, returns a (hit, value) pair."""
+        now = time()
+        with self._lock:
+            entry = self._memory.get((kind, key))
+            if entry is not None and now - entry[0] <= self.ttl(kind):
+                self._memory.move_to_end((kind, key))
+                self._stats[kind]["memory_hits"] += 1
+                return True, entry[1]
+
+            row = None
+            if self.db is not None:
+                row = self.db.execute(
+                    "SELECT stored_at, value FROM cache WHERE kind = ? AND key = ?",
+                    (kind, str(key)),
+                ).fetchone()
+            if row is not None and now - row[0] <= self.ttl(kind):
+                try:
+                    value = pickle.loads(row[1])
+                except Exception as e:
+                    print(f"Dropping unreadable cache entry {kind}/{key}: {e}")
+                else:
+                    self._remember(kind, key, row[0], value)
+                    self._stats[kind]["disk_hits"] += 1
+                    return True, value
+
+            self._stats[kind]["misses"] += 1
+            return False, None
+
+    def set(self, kind: str, key: Hashable, value: Any):
+        stored_at = time()
+        blob = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        with self._lock:
+            self._remember(kind, key, stored_at, value)
+            if self.db is not None:
+                self.db.execute(
+                    "INSERT OR REPLACE INTO cache (kind, key, stored_at, value) VALUES (?, ?, ?, ?)",
+                    (kind, str(key), stored_at, blob),
+                )
+                self.db.commit()
+
+    def get_or_fetch(self, kind: str, key: Hashable, fetch: Callable[[], Any]) -> Any:
+        """
+        Get the entry from the cache, or fetch it and cache it on a miss.
+
+        Concurrent misses of the same entry share a single fetch.
+        """
+        hit, value = self.get(kind, key)
+        if hit:
+            return value
+
+        def fetch_and_set() -> Any:
+            # a flight that just landed may have cached it after our miss
+            entry = self._memory.get((kind, key))
+            if entry is not None and time() - entry[0] <= self.ttl(kind):
+                return entry[1]
+            value = fetch()
+            if not _is_empty(value):
+                self.set(kind, key, value)
+            return value
+
+        return single_flight.do((self.path or id(self), kind, key), fetch_and_set)
+
+    def version(self, key: Hashable) -> Optional[float]:
+        """
+        When the data for the key was last stored, in any of the kinds.
+
+        It changes whenever the data for the key is refreshed, so anything derived from
+        the data can remember the version it was built from to know when it is stale.
+        """
+        with self._lock:
+            if self.db is not None:
+                # the disk tier also sees the refreshes done by the other processes
+                return self.db.execute(
+                    "SELECT MAX(stored_at) FROM cache WHERE key = ?", (str(key),)
+                ).fetchone()[0]
+            stored = [entry[0] for (_, k), entry in self._memory.items() if k == key]
+            return max(stored) if stored else None
+
+    def invalidate(self, key: Hashable, kind: Optional[str] = None):
+        """Drop the entries for the key, for a single kind or for all of them."""
+        with self._lock:
+            for cache_key in list(self._memory):
+                if cache_key[1] == key and kind in (None, cache_key[0]):
+                    del self._memory[cache_key]
+            if self.db is not None:
+                if kind is None:
+                    self.db.execute("DELETE FROM cache WHERE key = ?", (str(key),))
+                else:
+                    self.db.execute(
+                        "DELETE FROM cache WHERE kind = ? AND key = ?", (kind, str(key))
+                    )
+                self.db.commit()
+
+    def stats(self) -> Dict[str, Any]:
+        """The hit / miss counts per kind, plus the totals and the size of the memory tier."""
+        with self._lock:
+            per_kind = {kind: dict(counts) for kind, counts in self._stats.items()}
+            total = {"memory_hits": 0, "disk_hits": 0, "misses": 0}
+            for counts in per_kind.values():
+                for name, count in counts.items():
+                    total[name] += count
+            lookups = sum(total.values())
+            total["hit_ratio"] = (
+                round((total["memory_hits"] + total["disk_hits"]) / lookups, 3)
+                if lookups
+                else None
+            )
+            total["memory_size"] = len(self._memory)
+            total["evictions"] = self._evictions
+            return {**per_kind, "total": total}
+
+    def _remember(self, kind: str, key: Hashable, stored_at: float, value: Any):
+        self._memory[(kind, key)] = (stored_at, value)
+        self._memory.move_to_end((kind, key))
+        while len(self._memory) > self.max_size:
+            self._memory.popitem(last=False)
+            self._evictions += 1
+
+
+yf_cache = TieredCache(os.path.join(CACHE_DIR, "yfinance.sqlite"), ttls=YF_CACHE_TTLS)
+metrics.register_cache("yfinance", yf_cache)
+
+
+def normalise_query(query: str) -> str:
+    """Lowercase the query and collapse the whitespace, so trivially different queries share an entry."""
+    return " ".join(query.lower().split())
+
+
+def normalise_url(url: str) -> str:
+    """Strip the tracking params, fragment & trailing slash, so the same article has one url."""
+    parts = urlsplit(url.strip())
+    query = urlencode(
+        [(k, v) for k, v in parse_qsl(parts.query) if not k.lower().startswith("utm_")]
+    )
+    return urlunsplit(
+        (parts.scheme.lower(), parts.netloc.lower().removeprefix("www."), parts.path.rstrip("/"), query, "")
+    )
+
+
+def dedup_results(results: List[dict]) -> List[dict]:
+    """Drop the results pointing to an article already in the list."""
+    seen, unique = set(), []
+    for result in results:
+        url = normalise_url(result.get("href", ""))
+        if url and url in seen:
+            continue
+        seen.add(url)
+        unique.append(result)
+    return unique
+
+
+class CachedSearch:
+    """
+    A search function with its results cached & deduplicated.
+
+    The results are keyed on the normalised query, the search arguments and today's
+    date, so a popular query is searched once a day at most (less with a shorter TTL).
+
+    Example:
+        >>> search = CachedSearch(DuckDuckGoSearchToolSpec().duckduckgo_full_search)
+        >>> search("Reliance share price", region="in")  # searched
+        >>> search("reliance  share price", region="in")  # served from the cache
+    """
+
+    def __init__(self, search_fn: Callable[..., List[dict]], cache: Optional[TieredCache] = None):
+        self.search_fn = search_fn
+        self.cache = cache or search_cache
+
+    def __call__(self, query: str, **kwargs) -> List[dict]:
+        key = (normalise_query(query), tuple(sorted(kwargs.items())), _today())
+
+        def fetch() -> List[dict]:
+            with metrics.time("source_fetch", source="duckduckgo", kind="search"):
+                return dedup_results(rate_limiter.call("duckduckgo", self.search_fn, query, **kwargs))
+
+        return self.cache.get_or_fetch("search", key, fetch)
+
+    def news(self, ticker: str, max_results: int = 5) -> List[dict]:
+        """Get today's news for the ticker, cached per ticker per day."""
+        today = datetime.now()
+        key = (ticker.split(".")[0].upper(), today.strftime("%Y-%m-%d"), max_results)
+
+        def fetch() -> List[dict]:
+            # ask for a few more, as the duplicates are dropped
+            with metrics.time("source_fetch", source="duckduckgo", kind="news"):
+                results = rate_limiter.call(
+                    "duckduckgo",
+                    self.search_fn,
+                    f"{ticker} recent news on {today.strftime('%d %B %Y')}",
+                    max_results=max_results + 3,
+                )
+            return dedup_results(results)[:max_results]
+
+        return self.cache.get_or_fetch("news", key, fetch)
+
+
+def _today() -> str:
+    return datetime.now().strftime("%Y-%m-%d")
+
+
+search_cache = TieredCache(os.path.join(CACHE_DIR, "search.sqlite"), ttls=SEARCH_CACHE_TTLS)
+metrics.register_cache("search", search_cache)
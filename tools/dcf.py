@@ -0,0 +1,111 @@
+from typing import Dict, Optional, Sequence, Union
+import numpy as np
+
+ArrayLike = Union[float, Sequence[float], np.ndarray]
+
+# Long run growth used for the terminal value when the stage-1 growth is higher
+DEFAULT_TERMINAL_GROWTH = 0.03
+
+
+def dcf_grid(
+    fcf: ArrayLike,
+    wacc: ArrayLike,
+    growth: ArrayLike,
+    horizons: ArrayLike = 5,
+    terminal_growth: Optional[ArrayLike] = None,
+    fade_years: int = 0,
+) -> np.ndarray:
+    """
+    Discounted cash flow values over a full WACC x growth x horizon grid, in one pass.
+
+    The free cash flow grows at the stage-1 `growth` for `horizon` years, then fades
+    linearly to the `terminal_growth` over `fade_years`, and a Gordon growth terminal
+    value is added at the end of the explicit period. Without a `terminal_growth` the
+    stage-1 growth is used for the terminal value too (a single stage model).
+
+    Args:
+        fcf (array-like): The latest free cash flow, one per ticker, shape (T,).
+        wacc (array-like): The discount rates, shape (W,).
+        growth (array-like): The stage-1 growth rates, shape (G,).
+        horizons (array-like): The lengths of the stage-1 period in years, shape (H,).
+        terminal_growth (float, optional): The terminal growth rate.
+        fade_years (int): The years over which the growth fades to the terminal growth.
+
+    Returns:
+        np.ndarray: The values with shape (T, W, G, H), NaN where the WACC is not above
+            the terminal growth as the terminal value is unbounded there.
+
+    Example:
+        >>> dcf_grid(fcf=[100.0], wacc=[0.09, 0.1], growth=[0.05, 0.08], horizons=[5, 10]).shape
+        (1, 2, 2, 2)
+    """
+    fcf = np.atleast_1d(np.asarray(fcf, dtype=np.float64))
+    wacc = np.atleast_1d(np.asarray(wacc, dtype=np.float64))
+    growth = np.atleast_1d(np.asarray(growth, dtype=np.float64))
+    horizons = np.atleast_1d(np.asarray(horizons, dtype=np.int64))
+
+    # (G,) terminal growth, the stage-1 growth for a single stage model
+    if terminal_growth is None:
+        terminal = growth
+    else:
+        terminal = np.broadcast_to(np.asarray(terminal_growth, dtype=np.float64), growth.shape)
+
+    ends = horizons + fade_years  # (H,) the last year of the explicit period
+    years = np.arange(1, ends.max() + 1)  # (Y,)
+
+    # (G, H, Y) growth in every year, stage-1 growth then the linear fade to the terminal growth
+    into_fade = (years[None, :] - horizons[:, None]) / (fade_years + 1)  # (H, Y)
+    into_fade = np.clip(into_fade, 0, 1)
+    rates = growth[:, None, None] + (terminal - growth)[:, None, None] * into_fade[None]
+
+    # (T, G, H, Y) projected cash flows, and (H, Y) the years inside each explicit period
+    cash_flows = fcf[:, None, None, None] * np.cumprod(1 + rates, axis=-1)[None]
+    explicit = years[None, :] <= ends[:, None]
+
+    discount = (1 + wacc[:, None]) ** -years[None, :]  # (W, Y)
+    present_value = np.einsum("tghy,hy,wy->twgh", cash_flows, explicit, discount)
+
+    # terminal value on the last explicit cash flow, discounted back from the end of the period
+    last_cash_flow = cash_flows[..., np.arange(len(horizons)), ends - 1]  # (T, G, H)
+    spread = wacc[:, None] - terminal[None, :]  # (W, G)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        terminal_value = (
+            last_cash_flow[:, None]
+            * (1 + terminal)[None, None, :, None]
+            / spread[None, :, :, None]
+        )
+    terminal_value = terminal_value * discount[:, ends - 1][None, :, None, :]
+
+    values = present_value + terminal_value
+    # the perpetuity only converges when the WACC is above the terminal growth
+    return np.where(spread[None, :, :, None] > 0, values, np.nan)
+
+
+def sensitivity_table(
+    values: np.ndarray,
+    wacc: ArrayLike,
+    growth: ArrayLike,
+    horizons: ArrayLike,
+    scale: float = 1.0,
+    decimals: int = 2,
+) -> Dict[str, Dict[str, Dict[str, Optional[float]]]]:
+    """
+    Convert the (W, G, H) grid of a single ticker into a compact nested dict.
+
+    Returns:
+        dict: horizon -> WACC -> growth -> value, e.g. {"5y": {"WACC 10%": {"g 3%": 123.4}}}
+    """
+    table = {}
+    for h, horizon in enumerate(np.atleast_1d(horizons)):
+        table[f"{horizon}y"] = {
+            f"WACC {w * 100:g}%": {
+                f"g {g * 100:g}%": (
+                    None
+                    if np.isnan(values[i, j, h])
+                    else round(float(values[i, j, h]) * scale, decimals)
+                )
+                for j, g in enumerate(np.atleast_1d(growth))
+            }
+            for i, w in enumerate(np.atleast_1d(wacc))
+        }
+    return table
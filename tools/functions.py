@@ -1,21 +1,46 @@
 from datetime import datetime
-import json
-import yfinance as yf
 from pydantic import Field
+from typing import Annotated, Optional
 import regex as re
-from tools.utils import get_nse_tickers_scraping
+import numpy as np
+import pandas as pd
+from tools.utils import get_nse_tickers_scraping, run_stages
+from tools.ticker_data import TickerData, normalise_symbol
+from tools.cache import CachedSearch
+from tools.report import ToolResult
+from tools.resolver import company_resolver, RESOLVER_MIN_CONFIDENCE
+from tools.screener import screener, PERCENT_COLUMNS
+from tools.peers import peer_index
+from tools.statements import statement_engine
+from tools.dcf import dcf_grid, sensitivity_table, DEFAULT_TERMINAL_GROWTH
+from tools.price_store import price_store
+from tools.indicators import indicator_engine, RSI_PERIOD
+from tools.metrics import metrics
+from tools.rate_limit import rate_limiter
+from tools.single_flight import single_flight
 
 # imports for util models
-# from llama_index.llms.ollama import Ollama
-from llama_index.llms.groq import Groq
-from llama_index.tools.duckduckgo import DuckDuckGoSearchToolSpec
+from agents.llm_pool import llm_pool
 
 # from llama_index.core.program import FunctionCallingProgram
 from llama_index.core.prompts import PromptTemplate
 from agents.output_types import CompanyName, Ticker
 
-# Make the search tool
-search = DuckDuckGoSearchToolSpec().duckduckgo_full_search
+_duckduckgo = None
+
+
+def _duckduckgo_full_search(query: str, **kwargs) -> list[dict]:
+    """The DuckDuckGo search, the tool spec is imported & built on the first search."""
+    global _duckduckgo
+    if _duckduckgo is None:
+        from llama_index.tools.duckduckgo import DuckDuckGoSearchToolSpec
+
+        _duckduckgo = DuckDuckGoSearchToolSpec()
+    return _duckduckgo.duckduckgo_full_search(query, **kwargs)
+
+
+# Make the search tool, the results are cached per query per day
+search = CachedSearch(_duckduckgo_full_search)
 
 
 def duckduckgo_search(
@@ -78,9 +103,7 @@ def get_recent_news(
         Sources: https://www.apple.com/newsroom/2023/08/apple-reports-third-quarter-results/
         ...
     """
-    news_list = search(
-        f"{ticker} recent news on {datetime.now().strftime('%d %B %Y')}", max_results=5
-    )
+    news_list = search.news(ticker, max_results=5)
     news = f"\n## Recent news for {ticker}\n"
     for doc in news_list:
         news += f"Title: {doc['title']}\n"
@@ -102,19 +125,22 @@ def yf_get_financial_statements(
     Returns:
         str: A string containing the financial statement data in a formatted way.
     """
+    return _financial_statements(TickerData(ticker))
 
-    if "." in ticker:
-        ticker = ticker.split(".")[0]
 
-    ticker += ".NS"
-    company = yf.Ticker(ticker)
-    balance_sheet = company.balance_sheet
+def _balance_sheet(data: TickerData) -> pd.DataFrame:
+    """The last 3 years of the balance sheet in Cr."""
+    balance_sheet = data.balance_sheet
     if balance_sheet.shape[-1] > 3:
         balance_sheet = balance_sheet.iloc[:, :3]
 
     balance_sheet = balance_sheet.dropna(how="any")
     # Convert the sheet to Cr.
-    balance_sheet = balance_sheet.multiply(1e-7)
+    return balance_sheet.multiply(1e-7)
+
+
+def _financial_statements(data: TickerData) -> str:
+    balance_sheet = _balance_sheet(data)
     # rename the index
     balance_sheet.rename(
         index={name: f"{name} (in Crores.)" for name in balance_sheet.index},
@@ -139,20 +165,20 @@ def yf_get_stockinfo(
     Returns:
         str: A string containing the stock info and a summary of recommendations.
     """
+    return _stockinfo(TickerData(ticker))
 
-    if "." in ticker:
-        ticker = ticker.split(".")[0]
-
-    ticker += ".NS"
 
-    company = yf.Ticker(ticker)
-
-    stock_info = company.info
+def _recommendations(data: TickerData):
     try:
-        recommendations_summary = company.recommendations_summary
+        return data.recommendations
     except Exception as e:
         print(f"No recommendations {e}")
-        recommendations_summary = ""
+        return ""
+
+
+def _stockinfo_fields(data: TickerData) -> dict:
+    """The selected fields of the stock info, the percentages & amounts in readable units."""
+    stock_info = data.info
 
     # TODO: add units and convert to easily understandable units
 
@@ -188,23 +214,35 @@ def yf_get_stockinfo(
         "ebidtaMargins",
         "operatingMargins",
     ]
-    response = "## Stock info:\n"
-
+    fields = {}
     for key, val in stock_info.items():
         if key in include_info:
             if re.search("(Growth|Margin|Change)", key):
-                response += f"{key}: {round(float(val) * 100, 3)} %\n"
+                fields[key] = f"{round(float(val) * 100, 3)} %"
             elif "marketCap" in key:
-                response += f"{key}: {round(int(val) * 1e-7, 2)} Cr.\n"
+                fields[key] = f"{round(int(val) * 1e-7, 2)} Cr."
             else:
-                response += f"{key}: {val}\n"
+                fields[key] = val
+
+    return fields
+
+
+def _stockinfo(data: TickerData) -> str:
+    response = "## Stock info:\n"
+    for key, val in _stockinfo_fields(data).items():
+        response += f"{key}: {val}\n"
 
     response += "\n## Analyst Recommendations:\n"
-    response += f"\n{recommendations_summary}"
+    response += f"\n{_recommendations(data)}"
 
     return response
 
 
+# The discount rates & stage-1 horizons (in years) of the DCF sensitivity grid
+DCF_WACCS = [0.09, 0.1, 0.11, 0.12]
+DCF_HORIZONS = [5, 10]
+
+
 def yf_fundamental_analysis(
     ticker: str = Field(description="the ticker/trading symbol of the company"),
 ):
@@ -218,17 +256,17 @@ def yf_fundamental_analysis(
     Returns:
         dict: A dictionary with the detailed fundamental analysis results.
     """
-    try:
-        if "." in ticker:
-            ticker = ticker.split(".")[0]
+    return _fundamental_analysis(TickerData(ticker))
 
-        stock = yf.Ticker(ticker)
-        info = stock.info
+
+def _fundamental_analysis(data: TickerData):
+    try:
+        info = data.info
 
         # Data processing
-        financials = stock.financials.infer_objects(copy=False)
-        balance_sheet = stock.balance_sheet.infer_objects(copy=False)
-        cash_flow = stock.cashflow.infer_objects(copy=False)
+        financials = data.financials.infer_objects(copy=False)
+        balance_sheet = data.balance_sheet.infer_objects(copy=False)
+        cash_flow = data.cashflow.infer_objects(copy=False)
 
         # Fill missing values
         financials = financials.ffill()
@@ -288,29 +326,37 @@ def yf_fundamental_analysis(
             "Long-term Growth Rate": info.get("longTermPotentialGrowthRate"),
         }
 
-        # Simple DCF Valuation (very basic)
+        # DCF Valuation, a base case plus a WACC x growth x horizon sensitivity grid
         free_cash_flow = (
             cash_flow.loc["Free Cash Flow"].iloc[0]
             if "Free Cash Flow" in cash_flow.index
             else None
         )
-        wacc = 0.1  # Assumed Weighted Average Cost of Capital
-        growth_rate = info.get("longTermPotentialGrowthRate", 0.03)
-
-        def simple_dcf(fcf, growth_rate, wacc, years=5):
-            if fcf is None or growth_rate is None:
-                return None
-            terminal_value = fcf * (1 + growth_rate) / (wacc - growth_rate)
-            dcf_value = sum(
-                [
-                    fcf * (1 + growth_rate) ** i / (1 + wacc) ** i
-                    for i in range(1, years + 1)
-                ]
-            )
-            dcf_value += terminal_value / (1 + wacc) ** years
-            return dcf_value
-
-        dcf_value = simple_dcf(free_cash_flow, growth_rate, wacc)
+        growth_rate = info.get("longTermPotentialGrowthRate") or 0.03
+        dcf_value, dcf_sensitivity = None, None
+        if free_cash_flow is not None and not pd.isna(free_cash_flow):
+            growths = [growth_rate - 0.02, growth_rate, growth_rate + 0.02]
+            values = dcf_grid(
+                fcf=free_cash_flow,
+                wacc=DCF_WACCS,
+                growth=growths,
+                horizons=DCF_HORIZONS,
+                terminal_growth=min(growth_rate, DEFAULT_TERMINAL_GROWTH),
+            )[0]
+            base = values[DCF_WACCS.index(0.1), 1, DCF_HORIZONS.index(5)]
+            dcf_value = None if np.isnan(base) else float(base)
+            # per share values can be compared with the price, otherwise in Cr.
+            shares = info.get("sharesOutstanding")
+            dcf_sensitivity = {
+                "unit": "per share" if shares else "Cr.",
+                **sensitivity_table(
+                    values,
+                    DCF_WACCS,
+                    growths,
+                    DCF_HORIZONS,
+                    scale=1 / shares if shares else 1e-7,
+                ),
+            }
 
         # Prepare the results
         analysis = {
@@ -322,6 +368,7 @@ def yf_fundamental_analysis(
             "Valuation Metrics": valuation,
             "Future Estimates": estimates,
             "Simple DCF Valuation": dcf_value,
+            "DCF Sensitivity": dcf_sensitivity,
             "Last Updated": datetime.fromtimestamp(
                 info.get("lastFiscalYearEnd", 0)
             ).strftime("%Y-%m-%d"),
@@ -364,6 +411,87 @@ def yf_fundamental_analysis(
         return f"An error occurred during the analysis: {e}"
 
 
+def _search_ticker(company_name: str) -> Ticker:
+    """Find the ticker for the company through a web search and an LLM, slow but works for any name."""
+    # model = llm_pool.get("ollama", "qwen2.5:3b")
+    model = llm_pool.get("groq", "llama3-groq-8b-8192-tool-use-preview")
+
+    # get the ticker
+    search_result = search(
+        f"What is the NSE ticker symbol for {company_name}",
+        region="in",
+        max_results=5,
+    )
+    # use a function calling program
+    ticker_extraction_prompt = PromptTemplate(
+        """
+        Extract the ticker / company symbol from the input search result :
+        {search_result}
+        """
+    )
+    # the pooled model has no callback manager, so it is timed here
+    with metrics.time("llm_request", model=model.model, purpose="ticker_search"):
+        return rate_limiter.call(
+            "groq",
+            model.structured_predict,
+            output_cls=Ticker,
+            prompt=ticker_extraction_prompt,
+            search_result=search_result,
+        )
+
+
+# Max number of tokens of the analyse_company output, the least important data is left out first
+TOOL_OUTPUT_TOKEN_BUDGET = 1500
+
+
+def _company_report(symbol: str, results: dict, errors: dict) -> ToolResult:
+    """Arrange the fetched data into sections, by how much the analysis needs them."""
+    report = ToolResult(f"Analysis data for {symbol}")
+    fundamentals = results.get("fundamental_analysis")
+    dcf_sensitivity = None
+    if isinstance(fundamentals, dict):
+        fundamentals = dict(fundamentals)
+        dcf_sensitivity = fundamentals.pop("DCF Sensitivity", None)
+    report.add("Fundamentals", fundamentals, priority=5)
+    report.add("Stock info", results.get("info"), priority=4)
+    report.add("Balance sheet (Cr.)", results.get("balance_sheet"), priority=3)
+    report.add("Analyst recommendations", results.get("recommendations"), priority=2)
+    report.add("Recent news", results.get("news"), priority=2)
+    report.add("DCF sensitivity", dcf_sensitivity, priority=1)
+    report.add("Unavailable data", errors, priority=6)
+    return report
+
+
+def _fetch_company_data(symbol: str, data: TickerData):
+    """
+    Get the fundamental analysis, financials, info & recent news of the company.
+
+    These are independent so they are fetched at the same time and a failing source is
+    left out. The yahoo finance stages share one bundle, so every property is fetched once.
+    """
+    return run_stages(
+        {
+            "fundamental_analysis": lambda: _fundamental_analysis(data),
+            "info": lambda: _stockinfo_fields(data),
+            "recommendations": lambda: _recommendations(data),
+            "balance_sheet": lambda: _balance_sheet(data),
+            "news": lambda: search.news(symbol, max_results=5),
+        }
+    )
+
+
+def _resolve_ticker(company_name: str) -> Ticker:
+    """Resolve the ticker locally from the NSE list, search only when unsure."""
+    match = company_resolver.resolve(company_name)
+    if match and match.confidence >= RESOLVER_MIN_CONFIDENCE:
+        return Ticker(company_symbol=match.symbol)
+    # sessions asking about the same unknown company share one search
+    return single_flight.do(
+        ("groq", company_name.strip().lower(), "ticker"),
+        lambda: _search_ticker(company_name),
+    )
+
+
 def analyse_company_yf(
     company_name: str = Field(
         description="The name of the company", pattern=r"""^\w[\w.\-#&\s]*$"""
@@ -381,29 +509,8 @@ def analyse_company_yf(
              of the specified company."""
 
     try:
-        # model = Ollama(model="qwen2.5:3b", request_timeout=120.0)
-        # Check if the company is on the NSE
-        model = Groq(model="llama3-groq-8b-8192-tool-use-preview")
-
         company = CompanyName(company_name=company_name)
-        # get the ticker
-        search_result = search(
-            f"What is the NSE ticker symbol for {company.company_name}",
-            region="in",
-            max_results=5,
-        )
-        # use a function calling program
-        ticker_extraction_prompt = PromptTemplate(
-            """
-            Extract the ticker / company symbol from the input search result :
-            {search_result}
-            """
-        )
-        ticker = model.structured_predict(
-            output_cls=Ticker,
-            prompt=ticker_extraction_prompt,
-            search_result=search_result,
-        )
+        ticker = _resolve_ticker(company.company_name)
         print(ticker)
 
         # check if the ticker is present in the nse list
@@ -411,15 +518,377 @@ def analyse_company_yf(
         if nse_list and ticker.company_symbol.split(".")[0] not in nse_list:
             return "The ticker is not a part of NSE India"
 
-        # get fundamental analysis, financials & info
-        fundamental_analysis = yf_fundamental_analysis(ticker.company_symbol)
-        financials = yf_get_financial_statements(ticker.company_symbol)
-        info = yf_get_stockinfo(ticker.company_symbol)
+        data = TickerData(ticker.company_symbol)
+        results, errors = _fetch_company_data(ticker.company_symbol, data)
+        if not results:
+            return f"Error fetching data, Please try again: {errors}"
+
+        return _company_report(data.symbol, results, errors).render(
+            max_tokens=TOOL_OUTPUT_TOKEN_BUDGET
+        )
+
+    except Exception as e:
+        return f"Error fetching data, Please try again: {e}"
+
+
+# Max number of companies compared in one call
+MAX_BATCH_SIZE = 10
+
+# Columns of the comparison table -> the key in the yahoo finance info
+COMPARISON_FIELDS = {
+    "Name": "shortName",
+    "Industry": "industry",
+    "Market Cap (Cr.)": "marketCap",
+    "P/E": "trailingPE",
+    "P/B": "priceToBook",
+    "PEG": "pegRatio",
+    "ROE %": "returnOnEquity",
+    "D/E": "debtToEquity",
+    "Net Margin %": "profitMargins",
+    "Revenue Growth %": "revenueGrowth",
+    "Dividend Yield %": "dividendYield",
+}
 
-        # get recent news
-        news = get_recent_news(ticker.company_symbol)
+# Trailing returns, the look back in trading days
+RETURN_PERIODS = {"1M Return %": 21, "6M Return %": 126}
 
-        return "\n".join([json.dumps(fundamental_analysis), info, financials, news])
+
+def _price_returns(symbols: list[str]) -> pd.DataFrame:
+    """Get the last close & trailing returns for all the symbols with a single bulk download."""
+    import yfinance as yf
+
+    with metrics.time("source_fetch", source="yahoo", kind="history"):
+        prices = rate_limiter.call(
+            "yahoo", yf.download, symbols, period="1y", progress=False, threads=True
+        )
+    close = prices["Close"]
+    if isinstance(close, pd.Series):
+        close = close.to_frame(symbols[0])
+    close = close.ffill()
+
+    returns = pd.DataFrame({"Last Close": close.iloc[-1]})
+    for column, periods in RETURN_PERIODS.items():
+        if len(close) > periods:
+            returns[column] = close.pct_change(periods=periods).iloc[-1] * 100
+    returns["1Y Return %"] = (close.iloc[-1] / close.bfill().iloc[0] - 1) * 100
+    return returns
+
+
+def _comparison_row(info: dict) -> dict:
+    row = {column: info.get(key) for column, key in COMPARISON_FIELDS.items()}
+    if row["Market Cap (Cr.)"] is not None:
+        row["Market Cap (Cr.)"] = row["Market Cap (Cr.)"] * 1e-7
+    for column in ("ROE %", "Net Margin %", "Revenue Growth %", "Dividend Yield %"):
+        if row[column] is not None:
+            row[column] = row[column] * 100
+    return row
+
+
+def analyse_companies(
+    company_names: list[str] = Field(
+        description="The names of the companies to compare, at most 10"
+    ),
+) -> str:
+    """Compare several companies side by side in a single call.
+
+    Resolves the tickers of all the companies, fetches their key ratios & recent
+    price returns and returns a single comparison table. Use this instead of
+    calling analyse_company for each company when comparing companies.
+
+    Args:
+        company_names (list[str]): The names of the companies to compare.
+
+    Returns:
+        str: A table with one row per company, with its valuation, profitability,
+             leverage & growth ratios and its 1M, 6M & 1Y price returns.
+    """
+    try:
+        company_names = list(dict.fromkeys(company_names))[:MAX_BATCH_SIZE]
+        # resolve all the tickers at once, only the unsure ones go through the search
+        resolved, errors = run_stages(
+            {
+                name: (lambda name=name: _resolve_ticker(name).company_symbol)
+                for name in company_names
+            }
+        )
+        nse_list = get_nse_tickers_scraping()
+        symbols = {}
+        for name, symbol in resolved.items():
+            symbol = symbol.split(".")[0]
+            if nse_list and symbol not in nse_list:
+                errors[name] = f"{symbol} is not a part of NSE India"
+            else:
+                symbols[symbol] = name
+        if not symbols:
+            return f"Could not find any of the companies on NSE India: {errors}"
+
+        datas = {symbol: TickerData(symbol) for symbol in symbols}
+        stages = {
+            symbol: (lambda data=data: data.info) for symbol, data in datas.items()
+        }
+        price_symbols = sorted(data.symbol for data in datas.values())
+        stages["prices"] = lambda: single_flight.do(
+            ("yahoo", tuple(price_symbols), "returns"),
+            lambda: _price_returns(price_symbols),
+        )
+        results, fetch_errors = run_stages(stages)
+        errors.update(fetch_errors)
+
+        table = pd.DataFrame.from_dict(
+            {
+                symbol: _comparison_row(results[symbol])
+                for symbol in symbols
+                if symbol in results
+            },
+            orient="index",
+        )
+        if "prices" in results:
+            returns = results["prices"].rename(index=lambda symbol: symbol.split(".")[0])
+            table = table.join(returns, how="outer")
+        if table.empty:
+            return f"Error fetching data, Please try again: {errors}"
+        # keep the order the companies were asked in
+        table = table.reindex([symbol for symbol in symbols if symbol in table.index])
+
+        response = "## Company comparison:\n" + table.round(2).to_string()
+        if errors:
+            response += "\n\n## Unavailable data:\n" + "\n".join(
+                f"{name}: {error}" for name, error in errors.items()
+            )
+        return response
 
     except Exception as e:
         return f"Error fetching data, Please try again: {e}"
+
+
+def screen_stocks(
+    criteria: str = Field(
+        description="The filters on the ratios joined by 'and', optionally followed by 'sorted by <metric> [desc]'. Ex. 'ROE > 15% and D/E < 1 sorted by PEG'"
+    ),
+    sort_by: Annotated[Optional[str], Field(description="The metric to rank the companies on")] = None,
+    descending: Annotated[
+        Optional[bool],
+        Field(description="Rank the highest values first, by default the order in the criteria"),
+    ] = None,
+    limit: Annotated[int, Field(description="The max number of companies to return")] = 20,
+) -> str:
+    """Screen all the NSE listed companies on their fundamental ratios.
+
+    The available metrics are: market cap (in Cr.), P/E, forward P/E, P/B, P/S, PEG,
+    EV/EBITDA, ROE, ROA, D/E, current ratio, gross / operating / net margin, revenue
+    growth, earnings growth, dividend yield & beta. Percentages can be given as 15%.
+
+    Args:
+        criteria (str): The filters, e.g. "ROE > 15% and D/E < 1 sorted by PEG".
+        sort_by (str): The metric to rank the companies on.
+        descending (bool): Rank the highest values first, by default the order in the criteria.
+        limit (int): The max number of companies to return.
+
+    Returns:
+        str: A table of the matching companies with the filtered & ranked metrics.
+    """
+    try:
+        table = screener.screen(criteria, sort_by=sort_by, descending=descending, limit=limit)
+        if table.empty:
+            return f"No NSE companies match: {criteria}"
+
+        # show the percentages as percentages
+        for column in PERCENT_COLUMNS.intersection(table.columns):
+            table[column] = table[column] * 100
+        table = table.rename(
+            columns={column: f"{column} %" for column in PERCENT_COLUMNS}
+        )
+        return f"## Screener results for: {criteria}\n" + table.round(2).to_string()
+
+    except Exception as e:
+        return f"Error screening the stocks: {e}"
+
+
+def compare_with_peers(
+    symbol: str = Field(description="the ticker/trading symbol of the company"),
+) -> str:
+    """Compare the key ratios of a company with its NSE industry (or sector) peers.
+
+    Use this instead of the search tool to find the peers of a company or to see how it
+    stands against them. Covers market cap (in Cr.), P/E, forward P/E, P/B, EV/EBITDA,
+    ROE, ROA, D/E, the margins, growth & dividend yield.
+
+    Args:
+        symbol (str): The ticker symbol of the company.
+
+    Returns:
+        str: The company value, the peer median & the percentile rank of every ratio,
+            plus the largest peers.
+    """
+    try:
+        comparison = peer_index.compare(symbol)
+        table = comparison["table"]
+        # show the percentages as percentages
+        percent_rows = table.index.isin(list(PERCENT_COLUMNS))
+        table.loc[percent_rows, ["company", "median"]] *= 100
+        table = table.rename(
+            index={column: f"{column} %" for column in PERCENT_COLUMNS},
+            columns={"percentile": "percentile rank", "peers": "peers reporting"},
+        )
+
+        response = (
+            f"## {comparison['name'] or comparison['symbol']} vs its {comparison['peers']} "
+            f"{comparison['level']} peers ({comparison['group']}):\n"
+        )
+        response += table.round(2).to_string() + "\n"
+        response += "(percentile rank: the share of the peers with a lower value)\n"
+        response += "\n## Largest peers:\n" + "\n".join(
+            f"{peer}: {name}" for peer, name in comparison["top_peers"].items()
+        )
+        return response
+
+    except Exception as e:
+        return f"Error comparing with the peers: {e}"
+
+
+# The line items shown by financial_trends when none are asked for
+TREND_ITEMS = [
+    ("income", "Total Revenue"),
+    ("income", "Gross Profit"),
+    ("income", "EBITDA"),
+    ("income", "Operating Income"),
+    ("income", "Net Income"),
+    ("income", "Diluted EPS"),
+    ("cashflow", "Operating Cash Flow"),
+    ("cashflow", "Free Cash Flow"),
+    ("balance", "Total Debt"),
+    ("balance", "Stockholders Equity"),
+]
+MARGIN_ITEMS = [("income", "Gross Profit"), ("income", "EBITDA"), ("income", "Operating Income"), ("income", "Net Income")]
+
+
+def _trend_items(summary: pd.DataFrame, line_items: Optional[str]) -> list:
+    """The rows asked for, by a case-insensitive part of their name, else the key items."""
+    if not line_items:
+        return [item for item in TREND_ITEMS if item in summary.index]
+    parts = [part.strip().lower() for part in line_items.split(",") if part.strip()]
+    return [
+        item for item in summary.index
+        if any(part in item[1].lower() for part in parts)
+    ]
+
+
+def financial_trends(
+    ticker: str = Field(description="the ticker/trading symbol of the company"),
+    line_items: Annotated[
+        Optional[str],
+        Field(description="comma separated line items to show, e.g. 'revenue, free cash flow'. Leave empty for the key items"),
+    ] = None,
+) -> str:
+    """Get the growth & margin trends of a company from its annual & quarterly financial statements.
+
+    Use this for questions on how the revenue, profits, cash flows, debt or margins of
+    a company have grown over the years or the recent quarters. Covers the YoY & QoQ
+    growth, the CAGR, the trailing twelve months (TTM) and the margin trend of every
+    line item of the income, balance sheet & cash flow statements.
+
+    Args:
+        ticker (str): The ticker symbol of the company.
+        line_items (str, optional): Comma separated names (or parts of names) of the line items.
+
+    Returns:
+        str: A growth summary, the margins by year & the annual and quarterly values.
+    """
+    try:
+        trends = statement_engine.compute(ticker)
+        summary = trends["summary"]
+        items = _trend_items(summary, line_items)
+        if not items:
+            return f"No financial statements found for {ticker}" + (f" matching: {line_items}" if line_items else "")
+
+        growth = summary.loc[items].copy()
+        percent_columns = ["yoy", "cagr", "qoq", "quarterly_yoy", "margin", "margin_trend"]
+        percent_columns = [column for column in percent_columns if column in growth]
+        growth[percent_columns] = (growth[percent_columns] * 100).round(1)
+        growth["cagr_years"] = growth["cagr_years"].round(1)
+        growth = growth.droplevel("statement").rename(
+            columns={
+                "latest_fy": "Latest FY",
+                "yoy": "YoY %",
+                "cagr": "CAGR %",
+                "cagr_years": "CAGR yrs",
+                "ttm": "TTM",
+                "qoq": "QoQ %",
+                "quarterly_yoy": "Qtr YoY %",
+                "margin": "Margin %",
+                "margin_trend": "Margin trend (pp/yr)",
+            }
+        )
+
+        report = ToolResult(f"Financial trends for {normalise_symbol(ticker)}")
+        report.add("Growth summary", growth, priority=5)
+        margins = trends["annual_margins"]
+        if not margins.empty:
+            margin_items = [item for item in (items if line_items else MARGIN_ITEMS) if item in margins.index]
+            margin_table = (margins.loc[margin_items] * 100).round(1).droplevel("statement")
+            report.add("Margins by year (% of revenue)", margin_table, priority=4)
+        for name, title, priority in (("annual", "Annual values", 3), ("quarterly", "Quarterly values", 2)):
+            values = trends[name]
+            report.add(title, values.loc[[item for item in items if item in values.index]].droplevel("statement"), priority=priority)
+        return report.render(max_tokens=TOOL_OUTPUT_TOKEN_BUDGET)
+
+    except Exception as e:
+        return f"Error computing the financial trends: {e}"
+
+
+def technical_analysis(
+    ticker: str = Field(description="the ticker/trading symbol of the company"),
+) -> str:
+    """Get the technical indicators & price trend of a stock from its daily price history.
+
+    Use this to answer questions like "is X overbought?" or "what is the trend of X?".
+    Covers the moving averages (SMA 20/50/200, EMA 12/26), RSI, MACD, Bollinger bands,
+    ATR & drawdowns.
+
+    Args:
+        ticker (str): The ticker symbol of the company.
+
+    Returns:
+        str: The latest indicator values with a short reading of each.
+    """
+    try:
+        symbol = ticker.split(".")[0].upper()
+        # only downloads the days missing since the last stored bar
+        price_store.refresh([symbol])
+        indicators = indicator_engine.compute(symbol)
+        if len(indicators["close"]) < 2:
+            return f"No price history found for {symbol}"
+
+        latest = {name: float(values[-1]) for name, values in indicators.items() if name != "date"}
+        close, sma_50, sma_200 = latest["close"], latest["sma_50"], latest["sma_200"]
+        if close > sma_50 > sma_200:
+            trend = "Uptrend (price above the 50 & 200 day averages)"
+        elif close < sma_50 < sma_200:
+            trend = "Downtrend (price below the 50 & 200 day averages)"
+        else:
+            trend = "Sideways / mixed"
+
+        rsi = latest["rsi_14"]
+        rsi_reading = "Overbought" if rsi > 70 else "Oversold" if rsi < 30 else "Neutral"
+        macd_reading = "Bullish" if latest["macd"] > latest["macd_signal"] else "Bearish"
+        band_width = latest["bb_upper"] - latest["bb_lower"]
+        percent_b = (close - latest["bb_lower"]) / band_width if band_width else np.nan
+        last_year = indicators["drawdown"][-252:]
+
+        response = f"## Technical indicators for {symbol} as of {indicators['date'][-1]}:\n"
+        response += f"Close: {close:.2f}\n"
+        response += f"Trend: {trend}\n"
+        response += "".join(
+            f"{name.upper().replace('_', ' ')}: {latest[name]:.2f}\n"
+            for name in ("sma_20", "sma_50", "sma_200", "ema_12", "ema_26")
+        )
+        response += f"RSI ({RSI_PERIOD}): {rsi:.2f} - {rsi_reading}\n"
+        response += f"MACD: {latest['macd']:.2f}, Signal: {latest['macd_signal']:.2f} - {macd_reading}\n"
+        response += f"Bollinger bands: {latest['bb_lower']:.2f} - {latest['bb_upper']:.2f}, %B: {percent_b:.2f}\n"
+        response += f"ATR: {latest['atr_14']:.2f} ({latest['atr_14'] / close * 100:.2f} % of price)\n"
+        response += f"Drawdown from peak: {latest['drawdown'] * 100:.2f} %\n"
+        response += f"Max drawdown (1Y): {last_year.min() * 100:.2f} %\n"
+        return response
+
+    except Exception as e:
+        return f"Error computing the technical indicators: {e}"
@@ -0,0 +1,129 @@
+import threading
+from typing import Dict, Optional
+import numpy as np
+import pandas as pd
+from tools.price_store import PriceStore, price_store
+from tools.ticker_data import normalise_symbol
+
+SMA_WINDOWS = (20, 50, 200)
+EMA_SPANS = (12, 26)
+MACD_SIGNAL_SPAN = 9
+RSI_PERIOD = 14
+ATR_PERIOD = 14
+BOLLINGER_WINDOW = 20
+BOLLINGER_STD = 2.0
+
+
+def _ewm(values: np.ndarray, alpha: float, previous: Optional[float] = None) -> np.ndarray:
+    """
+    The recursive exponential average `y[t] = y[t - 1] + alpha * (x[t] - y[t - 1])`.
+
+    With a `previous` value the recursion continues from it, so averaging only the new
+    values gives the same result as averaging the whole series again.
+    """
+    if previous is None or np.isnan(previous):
+        return pd.Series(values).ewm(alpha=alpha, adjust=False).mean().to_numpy()
+    seeded = np.concatenate(([previous], values))
+    return pd.Series(seeded).ewm(alpha=alpha, adjust=False).mean().to_numpy()[1:]
+
+
+def _rolling(values: np.ndarray, window: int):
+    """The rolling mean & (population) std of every full window, NaN before that."""
+    rolling = pd.Series(values).rolling(window)
+    return rolling.mean().to_numpy(), rolling.std(ddof=0).to_numpy()
+
+
+class IndicatorEngine:
+    """
+    Technical indicators over the locally stored daily bars.
+
+    The indicators of a symbol are computed once over its whole history with
+    vectorized kernels and cached. When new bars are appended to the store only those
+    bars are computed, continuing the recursive averages (EMA, RSI, ATR, MACD) from
+    their last values and the rolling ones (SMA, Bollinger bands) from the last window.
+
+    Example:
+        >>> engine = IndicatorEngine()
+        >>> indicators = engine.compute("RELIANCE")
+        >>> indicators["rsi_14"][-1]
+    """
+
+    def __init__(self, store: PriceStore = price_store):
+        self.store = store
+        self._cache: Dict[str, Dict[str, np.ndarray]] = {}
+        self._lock = threading.Lock()
+
+    def compute(self, symbol: str) -> Dict[str, np.ndarray]:
+        """Get all the indicators of the symbol, aligned with its stored bars."""
+        symbol = normalise_symbol(symbol, "")
+        bars = self.store.bars(symbol)
+        with self._lock:
+            cached = self._cache.get(symbol)
+            n = 0 if cached is None else len(cached["date"])
+            # recompute from scratch if the stored history changed under the cache
+            if cached is not None and (n > len(bars) or bars["date"][n - 1] != cached["date"][-1]):
+                cached, n = None, 0
+            if n == len(bars) and cached is not None:
+                return cached
+
+            update = self._indicators(bars, start=n, previous=cached)
+            if cached is None:
+                cached = update
+            else:
+                cached = {name: np.concatenate((cached[name], update[name])) for name in cached}
+            self._cache[symbol] = cached
+            return cached
+
+    @staticmethod
+    def _indicators(bars: np.ndarray, start: int = 0, previous: Optional[Dict[str, np.ndarray]] = None) -> Dict[str, np.ndarray]:
+        """The indicators of `bars[start:]`, continuing from the `previous` ones."""
+
+        def last(name: str) -> Optional[float]:
+            return previous[name][-1] if previous is not None else None
+
+        # the rolling windows need the bars before the first new one as well
+        lookback = max(SMA_WINDOWS + (BOLLINGER_WINDOW,)) - 1
+        window = bars[max(start - lookback, 0) :]
+        offset = start - max(start - lookback, 0)
+        close = np.asarray(window["close"], dtype=np.float64)
+        high = np.asarray(window["high"], dtype=np.float64)
+        low = np.asarray(window["low"], dtype=np.float64)
+        new_close = close[offset:]
+
+        result = {"date": np.asarray(window["date"][offset:]), "close": new_close}
+
+        for n in SMA_WINDOWS:
+            result[f"sma_{n}"] = _rolling(close, n)[0][offset:]
+        for span in EMA_SPANS:
+            result[f"ema_{span}"] = _ewm(new_close, 2 / (span + 1), last(f"ema_{span}"))
+        result["macd"] = result["ema_12"] - result["ema_26"]
+        result["macd_signal"] = _ewm(result["macd"], 2 / (MACD_SIGNAL_SPAN + 1), last("macd_signal"))
+
+        mean, std = _rolling(close, BOLLINGER_WINDOW)
+        result["bb_upper"] = (mean + BOLLINGER_STD * std)[offset:]
+        result["bb_lower"] = (mean - BOLLINGER_STD * std)[offset:]
+
+        # the changes & true ranges of the new bars need the close before them
+        previous_close = np.concatenate(([np.nan], close[:-1]))[offset:]
+        change = new_close - previous_close
+        gain = _ewm(np.nan_to_num(np.clip(change, 0, None)), 1 / RSI_PERIOD, last("avg_gain"))
+        loss = _ewm(np.nan_to_num(np.clip(-change, 0, None)), 1 / RSI_PERIOD, last("avg_loss"))
+        result["avg_gain"], result["avg_loss"] = gain, loss
+        with np.errstate(divide="ignore", invalid="ignore"):
+            result["rsi_14"] = np.where(loss == 0, 100.0, 100 - 100 / (1 + gain / loss))
+
+        true_range = np.fmax(
+            high[offset:] - low[offset:],
+            np.fmax(np.abs(high[offset:] - previous_close), np.abs(low[offset:] - previous_close)),
+        )
+        result["atr_14"] = _ewm(true_range, 1 / ATR_PERIOD, last("atr_14"))
+
+        peak = np.maximum.accumulate(new_close)
+        if previous is not None:
+            peak = np.maximum(peak, last("peak"))
+        result["peak"] = peak
+        result["drawdown"] = new_close / peak - 1
+        return result
+
+
+indicator_engine = IndicatorEngine()
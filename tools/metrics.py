@@ -0,0 +1,238 @@
+import json
+import os
+import threading
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from time import perf_counter, time
+from typing import Any, Deque, Dict, Iterator, List, Optional, Tuple
+
+# Port of the local metrics endpoint, 0 disables it
+METRICS_PORT = int(os.getenv("METRICS_PORT", 9464))
+METRICS_HOST = os.getenv("METRICS_HOST", "127.0.0.1")
+# Prefix of the exported Prometheus metric names
+METRICS_PREFIX = "stock_assistant"
+# Upper bounds (seconds) of the latency histogram buckets
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+# Number of the latest samples kept per series, for the recent percentiles
+RECENT_SAMPLES = 500
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+def _labels(labels: Dict[str, Any]) -> Labels:
+    return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+
+def _format_labels(labels: Labels, **extra: str) -> str:
+    pairs = list(labels) + list(extra.items())
+    if not pairs:
+        return ""
+    escaped = (value.replace("\\", "\\\\").replace('"', '\\"') for _, value in pairs)
+    return "{" + ",".join(f'{key}="{value}"' for (key, _), value in zip(pairs, escaped)) + "}"
+
+
+class _Series:
+    """The latency histogram, error count & latest samples of one timed operation."""
+
+    __slots__ = ("count", "total", "errors", "buckets", "recent")
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.errors = 0
+        self.buckets = [0] * len(LATENCY_BUCKETS)
+        self.recent: Deque[Tuple[float, float]] = deque(maxlen=RECENT_SAMPLES)
+
+    def observe(self, seconds: float, error: bool):
+        self.count += 1
+        self.total += seconds
+        self.errors += error
+        for i, bound in enumerate(LATENCY_BUCKETS):
+            if seconds <= bound:
+                self.buckets[i] += 1
+        self.recent.append((time(), seconds))
+
+    def summary(self, window: float) -> Dict[str, Any]:
+        since = time() - window
+        recent = sorted(seconds for at, seconds in self.recent if at >= since)
+
+        def percentile(p: float) -> Optional[float]:
+            return recent[min(len(recent) - 1, int(p * len(recent)))] if recent else None
+
+        return {
+            "count": self.count,
+            "errors": self.errors,
+            "error_rate": self.errors / self.count if self.count else 0.0,
+            "total_seconds": self.total,
+            "avg_seconds": self.total / self.count if self.count else None,
+            "recent": {
+                "window_seconds": window,
+                "count": len(recent),
+                "p50_seconds": percentile(0.5),
+                "p95_seconds": percentile(0.95),
+            },
+        }
+
+
+class Metrics:
+    """
+    An in-process registry of latencies, counters & cache statistics.
+
+    Timed operations are kept as histograms (with an error count) per name & labels,
+    the registered caches are read when the metrics are exported.
+
+    Example:
+        >>> with metrics.time("source_fetch", source="yahoo", kind="info"):
+        ...     ticker.info
+        >>> metrics.inc("llm_tokens", 120, model="llama-3.1-70b-versatile", type="prompt")
+        >>> print(metrics.to_prometheus())
+    """
+
+    def __init__(self):
+        self._series: Dict[Tuple[str, Labels], _Series] = defaultdict(_Series)
+        self._counters: Dict[Tuple[str, Labels], float] = defaultdict(float)
+        self._caches: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, name: str, seconds: float, error: bool = False, **labels: Any):
+        with self._lock:
+            self._series[(name, _labels(labels))].observe(seconds, error)
+
+    def inc(self, name: str, value: float = 1, **labels: Any):
+        with self._lock:
+            self._counters[(name, _labels(labels))] += value
+
+    @contextmanager
+    def time(self, name: str, **labels: Any) -> Iterator[None]:
+        """Time the block, an exception is counted as an error and re-raised."""
+        start = perf_counter()
+        try:
+            yield
+        except BaseException:
+            self.observe(name, perf_counter() - start, error=True, **labels)
+            raise
+        self.observe(name, perf_counter() - start, **labels)
+
+    def register_cache(self, name: str, cache: Any):
+        """Export the hit ratios of a cache with a `stats()` method, like `TieredCache`."""
+        self._caches[name] = cache
+
+    def _cache_stats(self) -> Dict[str, Dict[str, Dict[str, float]]]:
+        stats = {}
+        for name, cache in list(self._caches.items()):
+            try:
+                kinds = cache.stats()
+            except Exception as e:
+                print(f"Error reading the {name} cache stats: {e}")
+                continue
+            stats[name] = {}
+            for kind, counts in kinds.items():
+                if kind == "total":
+                    continue
+                hits = counts.get("memory_hits", 0) + counts.get("disk_hits", 0)
+                lookups = hits + counts.get("misses", 0)
+                stats[name][kind] = {**counts, "hit_ratio": hits / lookups if lookups else 0.0}
+        return stats
+
+    def snapshot(self, window: float = 300) -> Dict[str, Any]:
+        """All the metrics as a dict, with the percentiles of the last `window` seconds."""
+        with self._lock:
+            series = {key: value.summary(window) for key, value in self._series.items()}
+            counters = dict(self._counters)
+
+        timings: Dict[str, List[dict]] = defaultdict(list)
+        for (name, labels), summary in sorted(series.items()):
+            timings[name].append({"labels": dict(labels), **summary})
+        totals: Dict[str, List[dict]] = defaultdict(list)
+        for (name, labels), value in sorted(counters.items()):
+            totals[name].append({"labels": dict(labels), "value": value})
+        return {"timings": timings, "counters": totals, "caches": self._cache_stats()}
+
+    def to_prometheus(self) -> str:
+        """All the metrics in the Prometheus text exposition format."""
+        with self._lock:
+            series = [(name, labels, s.count, s.total, s.errors, list(s.buckets)) for (name, labels), s in self._series.items()]
+            counters = list(self._counters.items())
+
+        lines = []
+        for name in sorted({name for name, *_ in series}):
+            metric = f"{METRICS_PREFIX}_{name}_seconds"
+            lines.append(f"# TYPE {metric} histogram")
+            for series_name, labels, count, total, _, buckets in series:
+                if series_name != name:
+                    continue
+                for bound, bucket in zip(LATENCY_BUCKETS, buckets):
+                    lines.append(f"{metric}_bucket{_format_labels(labels, le=str(bound))} {bucket}")
+                lines.append(f'{metric}_bucket{_format_labels(labels, le="+Inf")} {count}')
+                lines.append(f"{metric}_sum{_format_labels(labels)} {total}")
+                lines.append(f"{metric}_count{_format_labels(labels)} {count}")
+            lines.append(f"# TYPE {METRICS_PREFIX}_{name}_errors_total counter")
+            for series_name, labels, _, _, errors, _ in series:
+                if series_name == name:
+                    lines.append(f"{METRICS_PREFIX}_{name}_errors_total{_format_labels(labels)} {errors}")
+
+        for name in sorted({name for (name, _), _ in counters}):
+            metric = f"{METRICS_PREFIX}_{name}_total"
+            lines.append(f"# TYPE {metric} counter")
+            for (counter_name, labels), value in counters:
+                if counter_name == name:
+                    lines.append(f"{metric}{_format_labels(labels)} {value}")
+
+        cache_stats = self._cache_stats()
+        for field, kind_of_metric in [("memory_hits", "counter"), ("disk_hits", "counter"), ("misses", "counter"), ("hit_ratio", "gauge")]:
+            metric = f"{METRICS_PREFIX}_cache_{field}" + ("_total" if kind_of_metric == "counter" else "")
+            lines.append(f"# TYPE {metric} {kind_of_metric}")
+            for cache, kinds in cache_stats.items():
+                for kind, counts in kinds.items():
+                    lines.append(f"{metric}{_format_labels((('cache', cache), ('kind', kind)))} {counts.get(field, 0)}")
+        return "\n".join(lines) + "\n"
+
+
+metrics = Metrics()
+
+
+class _MetricsRequestHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.rstrip("/") == "/metrics":
+            body, content_type = metrics.to_prometheus(), "text/plain; version=0.0.4"
+        elif self.path.rstrip("/") == "/metrics.json":
+            body, content_type = json.dumps(metrics.snapshot(), default=str), "application/json"
+        else:
+            self.send_error(404)
+            return
+        data = body.encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        # scraped every few seconds, keep it out of the app logs
+        pass
+
+
+_server: Optional[ThreadingHTTPServer] = None
+_server_lock = threading.Lock()
+
+
+def start_metrics_server(port: int = METRICS_PORT, host: str = METRICS_HOST) -> Optional[ThreadingHTTPServer]:
+    """
+    Serve the metrics on `/metrics` (Prometheus text) and `/metrics.json`, on a daemon thread.
+
+    Only one server is started per process, later calls return the running one.
+    """
+    global _server
+    if not port:
+        return None
+    with _server_lock:
+        if _server is None:
+            try:
+                _server = ThreadingHTTPServer((host, port), _MetricsRequestHandler)
+            except OSError as e:
+                print(f"Could not start the metrics server on {host}:{port}: {e}")
+                return None
+            threading.Thread(target=_server.serve_forever, name="metrics-server", daemon=True).start()
+            print(f"Serving the metrics on http://{host}:{port}/metrics")
+    return _server
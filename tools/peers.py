@@ -0,0 +1,141 @@
+import threading
+import warnings
+from typing import Any, Dict, List, Optional, Tuple
+import numpy as np
+import pandas as pd
+from tools.screener import Screener, info_to_row, screener
+from tools.ticker_data import TickerData, normalise_symbol
+
+# An industry with fewer peers than this is too small to compare against, the sector is used
+MIN_PEER_GROUP = 5
+# The snapshot columns compared against the peers
+PEER_METRICS = [
+    "market_cap", "pe", "forward_pe", "pb", "ev_ebitda", "roe", "roa", "de",
+    "gross_margin", "operating_margin", "net_margin", "revenue_growth",
+    "earnings_growth", "dividend_yield",
+]
+# Number of the largest peers (by market cap) listed by name
+TOP_PEERS = 5
+
+
+class PeerIndex:
+    """
+    The NSE companies grouped by industry & sector, built from the screener snapshot.
+
+    The groups hold row positions into the snapshot, so the ratios of a peer group are
+    a single fancy-indexed slice of the snapshot columns. The index is rebuilt whenever
+    the screener swaps in a new snapshot.
+
+    Example:
+        >>> peer_index = PeerIndex()
+        >>> comparison = peer_index.compare("TCS")
+        >>> comparison["table"].loc["roe"]
+        company       0.52
+        median        0.18
+        percentile   92.31
+    """
+
+    def __init__(self, screener: Screener = screener, min_group: int = MIN_PEER_GROUP):
+        self.screener = screener
+        self.min_group = min_group
+        self._snapshot: Optional[pd.DataFrame] = None
+        self._groups: Dict[Tuple[str, str], np.ndarray] = {}
+        self._metrics: Optional[np.ndarray] = None
+        self._lock = threading.Lock()
+
+    def _index(self) -> Tuple[pd.DataFrame, Dict[Tuple[str, str], np.ndarray], np.ndarray]:
+        snapshot = self.screener.snapshot
+        if snapshot is None:
+            raise RuntimeError("The peer index is still being built, try again in a few minutes")
+        with self._lock:
+            if snapshot is not self._snapshot:
+                groups = {}
+                for level in ("industry", "sector"):
+                    for name, positions in snapshot.groupby(level, sort=False).indices.items():
+                        groups[(level, name)] = positions
+                self._groups = groups
+                self._metrics = snapshot[PEER_METRICS].to_numpy(dtype=np.float64)
+                self._snapshot = snapshot
+            return self._snapshot, self._groups, self._metrics
+
+    def peers(self, symbol: str, industry: Optional[str] = None, sector: Optional[str] = None) -> Tuple[str, str, List[str]]:
+        """
+        The peers of the company, from its industry or, for a small industry, its sector.
+
+        Returns:
+            tuple: The level (industry / sector), the group name & the peer symbols.
+        """
+        snapshot, groups, _ = self._index()
+        level, name, positions = self._peer_positions(symbol, industry, sector, snapshot, groups)
+        return level, name, snapshot.index[positions].tolist()
+
+    def _peer_positions(self, symbol, industry, sector, snapshot, groups) -> Tuple[str, str, np.ndarray]:
+        for level, name in (("industry", industry), ("sector", sector)):
+            positions = groups.get((level, name))
+            if positions is None:
+                continue
+            # the company itself is not its own peer
+            positions = positions[snapshot.index[positions] != symbol]
+            if len(positions) >= self.min_group or level == "sector":
+                return level, name, positions
+        raise ValueError(f"No peers found for {symbol} (industry: {industry}, sector: {sector})")
+
+    def compare(self, symbol: str) -> Dict[str, Any]:
+        """
+        Compare the key ratios of the company with the median of its peers.
+
+        The percentile is the share of the peers with a lower value, from the same
+        vectorized pass over every metric.
+
+        Returns:
+            dict: The level & name of the peer group, the number of peers, a table of
+                the company value, the peer median & the percentile per metric, and the
+                largest peers.
+        """
+        symbol = normalise_symbol(symbol, "")
+        snapshot, groups, metrics = self._index()
+        if symbol in snapshot.index:
+            row = snapshot.loc[symbol]
+        else:
+            # not in the snapshot yet, its (cached) info still places it in a group
+            row = pd.Series(info_to_row(TickerData(symbol).info))
+        level, name, positions = self._peer_positions(
+            symbol, row.get("industry"), row.get("sector"), snapshot, groups
+        )
+
+        company = row[PEER_METRICS].to_numpy(dtype=np.float64)
+        values = metrics[positions]
+        counts = (~np.isnan(values)).sum(axis=0)
+        # NaN compares False, so the peers missing a metric are left out of its rank
+        below = (values < company).sum(axis=0)
+        equal = (values == company).sum(axis=0)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            percentile = np.where(
+                (counts > 0) & ~np.isnan(company), (below + 0.5 * equal) / counts * 100, np.nan
+            )
+        with warnings.catch_warnings():
+            # a metric none of the peers report is a NaN median
+            warnings.simplefilter("ignore", category=RuntimeWarning)
+            median = np.nanmedian(values, axis=0)
+
+        table = pd.DataFrame(
+            {"company": company, "median": median, "percentile": percentile, "peers": counts},
+            index=PEER_METRICS,
+        )
+        largest = np.argsort(-np.nan_to_num(values[:, PEER_METRICS.index("market_cap")], nan=-np.inf))
+        top_peers = snapshot.iloc[positions[largest[:TOP_PEERS]]]
+        return {
+            "symbol": symbol,
+            "name": row.get("name"),
+            "level": level,
+            "group": name,
+            "peers": len(positions),
+            "table": table,
+            "top_peers": {
+                peer: peer_name if isinstance(peer_name, str) else peer
+                for peer, peer_name in top_peers["name"].items()
+            },
+        }
+
+
+peer_index = PeerIndex()
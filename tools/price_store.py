@@ -0,0 +1,195 @@
+import os
+import threading
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterable, List, Optional, Union
+import numpy as np
+import pandas as pd
+from tools.utils import CACHE_DIR, nse_master_list
+from tools.ticker_data import normalise_symbol
+from tools.metrics import metrics
+from tools.rate_limit import rate_limiter
+from tools.single_flight import single_flight
+
+# One daily bar, the files are a plain sequence of these records
+BAR_DTYPE = np.dtype(
+    [
+        ("date", "datetime64[D]"),
+        ("open", "f8"),
+        ("high", "f8"),
+        ("low", "f8"),
+        ("close", "f8"),
+        ("volume", "f8"),
+    ]
+)
+# How far back the history goes for a symbol that is not in the store yet
+HISTORY_START = os.getenv("PRICE_HISTORY_START", "2015-01-01")
+# Number of symbols per bulk download
+DOWNLOAD_BATCH_SIZE = 100
+
+IST = timezone(timedelta(hours=5, minutes=30))
+# NSE closes at 15:30 IST, a bar is final a little after that
+MARKET_CLOSE_IST = (16, 0)
+
+DateLike = Union[str, datetime, np.datetime64, None]
+
+
+def _last_complete_day() -> np.datetime64:
+    """The last date with a final daily bar, today's bar is partial while the market is open."""
+    now = datetime.now(IST)
+    day = now.date() if (now.hour, now.minute) >= MARKET_CLOSE_IST else now.date() - timedelta(days=1)
+    return np.datetime64(day, "D")
+
+
+class PriceStore:
+    """
+    A local store of the daily OHLCV bars of the NSE symbols.
+
+    Every symbol has an append-only file of `BAR_DTYPE` records sorted by date, read as
+    a memory-mapped array. Reads for a date range are slices of that map, so they copy
+    nothing, and a refresh only downloads & appends the days after the last stored bar.
+
+    Example:
+        >>> store = PriceStore()
+        >>> store.refresh(["RELIANCE", "TCS"])
+        {'RELIANCE': 2412, 'TCS': 2412}
+        >>> bars = store.read("RELIANCE", start="2024-01-01")
+        >>> bars["close"][-1]
+    """
+
+    def __init__(self, root: str = os.path.join(CACHE_DIR, "prices")):
+        self.root = root
+        self._maps: Dict[str, np.memmap] = {}
+        self._lock = threading.Lock()
+
+    def path(self, symbol: str) -> str:
+        return os.path.join(self.root, f"{normalise_symbol(symbol, '')}.bin")
+
+    def bars(self, symbol: str) -> np.ndarray:
+        """All the stored bars of the symbol, memory-mapped."""
+        path = self.path(symbol)
+        if not os.path.exists(path):
+            return np.empty(0, dtype=BAR_DTYPE)
+        # ignore a partially written last record
+        length = os.path.getsize(path) // BAR_DTYPE.itemsize
+        if length == 0:
+            return np.empty(0, dtype=BAR_DTYPE)
+
+        bars = self._maps.get(path)
+        if bars is None or len(bars) != length:
+            # the file grew since it was mapped
+            bars = np.memmap(path, dtype=BAR_DTYPE, mode="r", shape=(length,))
+            self._maps[path] = bars
+        return bars
+
+    def read(self, symbol: str, start: DateLike = None, end: DateLike = None) -> np.ndarray:
+        """
+        The bars of the symbol between start & end (both inclusive), without copying.
+
+        Returns:
+            np.ndarray: A structured array slice of the map, use `bars["close"]` etc. for the columns.
+        """
+        bars = self.bars(symbol)
+        dates = bars["date"]
+        i = 0 if start is None else np.searchsorted(dates, np.datetime64(start, "D"), side="left")
+        j = len(bars) if end is None else np.searchsorted(dates, np.datetime64(end, "D"), side="right")
+        return bars[i:j]
+
+    def to_frame(self, symbol: str, start: DateLike = None, end: DateLike = None) -> pd.DataFrame:
+        """The bars as a DataFrame indexed by date, this one is a copy."""
+        bars = self.read(symbol, start, end)
+        return pd.DataFrame(
+            {name: np.asarray(bars[name]) for name in BAR_DTYPE.names if name != "date"},
+            index=pd.DatetimeIndex(np.asarray(bars["date"]), name="date"),
+        )
+
+    def last_date(self, symbol: str) -> Optional[np.datetime64]:
+        bars = self.bars(symbol)
+        return bars["date"][-1] if len(bars) else None
+
+    def append(self, symbol: str, bars: np.ndarray) -> int:
+        """Append the bars after the last stored date, returns the number of bars written."""
+        with self._lock:
+            last = self.last_date(symbol)
+            bars = np.sort(bars, order="date")
+            if last is not None:
+                bars = bars[bars["date"] > last]
+            if len(bars) == 0:
+                return 0
+            os.makedirs(self.root, exist_ok=True)
+            with open(self.path(symbol), "ab") as fp:
+                fp.write(bars.astype(BAR_DTYPE).tobytes())
+            return len(bars)
+
+    def refresh(self, symbols: Optional[Iterable[str]] = None) -> Dict[str, int]:
+        """
+        Download & append the missing days for the symbols, all the NSE symbols by default.
+
+        The symbols are grouped by their last stored date, so every group is a single
+        bulk download of just the missing days.
+
+        Returns:
+            dict: symbol -> number of bars appended.
+        """
+        if symbols is None:
+            symbols = sorted(nse_master_list.symbols)
+        until = _last_complete_day()
+
+        starts: Dict[np.datetime64, List[str]] = {}
+        for symbol in symbols:
+            last = self.last_date(symbol)
+            start = np.datetime64(HISTORY_START, "D") if last is None else last + 1
+            # nothing to fetch when there is no weekday since the last bar
+            if start <= until and np.busday_count(start, until + 1) > 0:
+                starts.setdefault(start, []).append(normalise_symbol(symbol, ""))
+
+        appended = {}
+        for start, group in starts.items():
+            for i in range(0, len(group), DOWNLOAD_BATCH_SIZE):
+                batch = group[i : i + DOWNLOAD_BATCH_SIZE]
+                try:
+                    # concurrent refreshes of the same symbols share one download
+                    appended.update(
+                        single_flight.do(
+                            ("yahoo", tuple(batch), "history", start, until),
+                            lambda: self._download(batch, start, until),
+                        )
+                    )
+                except Exception as e:
+                    print(f"Error downloading the prices of {batch}: {e}")
+        return appended
+
+    def _download(self, symbols: List[str], start: np.datetime64, until: np.datetime64) -> Dict[str, int]:
+        import yfinance as yf
+
+        with metrics.time("source_fetch", source="yahoo", kind="history"):
+            prices = rate_limiter.call(
+                "yahoo",
+                yf.download,
+                [normalise_symbol(symbol) for symbol in symbols],
+                start=str(start),
+                end=str(until + 1),  # the end date is exclusive
+                group_by="ticker",
+                auto_adjust=False,
+                progress=False,
+                threads=True,
+            )
+        if not isinstance(prices.columns, pd.MultiIndex):
+            prices = pd.concat({normalise_symbol(symbols[0]): prices}, axis=1)
+
+        appended = {}
+        for symbol in symbols:
+            ticker = normalise_symbol(symbol)
+            if ticker not in prices.columns.get_level_values(0):
+                continue
+            frame = prices[ticker].dropna(subset=["Close"])
+            if frame.empty:
+                continue
+            bars = np.empty(len(frame), dtype=BAR_DTYPE)
+            bars["date"] = frame.index.values.astype("datetime64[D]")
+            for name in ("open", "high", "low", "close", "volume"):
+                bars[name] = frame[name.capitalize()].to_numpy(dtype=np.float64)
+            appended[symbol] = self.append(symbol, bars)
+        return appended
+
+
+price_store = PriceStore()
@@ -0,0 +1,161 @@
+import os
+import random
+import threading
+from time import monotonic, sleep
+from typing import Any, Callable, Dict, Optional, Tuple, TypeVar
+import regex as re
+from tools.metrics import metrics
+
+T = TypeVar("T")
+
+# Default (requests per second, burst) of every provider, override with
+# RATE_LIMIT_<PROVIDER>="<rate>/<burst>", e.g. RATE_LIMIT_YAHOO="2/5"
+DEFAULT_RATE_LIMITS: Dict[str, Tuple[float, int]] = {
+    "yahoo": (5.0, 10),
+    "nse": (1.0, 3),
+    "duckduckgo": (1.0, 3),
+    "groq": (0.5, 5),
+}
+# Retries of a throttled (429) or failed (5xx) request, with jittered exponential backoff
+MAX_RETRIES = int(os.getenv("RATE_LIMIT_MAX_RETRIES", 3))
+BACKOFF_BASE = 0.5
+BACKOFF_CAP = 30.0
+
+# errors without a status code that still mean throttled / server error
+RETRYABLE_MESSAGE_PATTERN = re.compile(r"\b(429|502|503|504)\b|too many requests|rate ?limit", re.IGNORECASE)
+
+
+def _rate_limit(provider: str) -> Tuple[float, int]:
+    setting = os.getenv(f"RATE_LIMIT_{provider.upper()}")
+    if not setting:
+        return DEFAULT_RATE_LIMITS.get(provider, (1.0, 1))
+    rate, _, burst = setting.partition("/")
+    return float(rate), int(burst or 1)
+
+
+def status_code(error: BaseException) -> Optional[int]:
+    """The HTTP status of a failed request, from the requests / curl_cffi / httpx errors."""
+    for source in (getattr(error, "response", None), error):
+        code = getattr(source, "status_code", None)
+        if isinstance(code, int):
+            return code
+    return None
+
+
+def is_retryable(error: BaseException) -> bool:
+    """Whether the error is a throttle (429) or a server error (5xx), worth retrying."""
+    code = status_code(error)
+    if code is not None:
+        return code == 429 or 500 <= code < 600
+    # yfinance & duckduckgo raise their own rate limit errors, without a response
+    if "ratelimit" in type(error).__name__.lower():
+        return True
+    return bool(RETRYABLE_MESSAGE_PATTERN.search(str(error)))
+
+
+def retry_after(error: BaseException) -> Optional[float]:
+    headers = getattr(getattr(error, "response", None), "headers", None) or {}
+    try:
+        return float(headers.get("Retry-After"))
+    except (TypeError, ValueError):
+        return None
+
+
+class TokenBucket:
+    """
+    A thread-safe token bucket, refilled at `rate` tokens a second up to `capacity`.
+
+    A caller takes a token even when the bucket is empty and then waits for its turn,
+    so the waiting callers are served in order at exactly `rate`.
+    """
+
+    def __init__(self, rate: float, capacity: int):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = float(capacity)
+        self._updated = monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float):
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def reserve(self) -> float:
+        """Take a token, returns how long to wait before using it."""
+        with self._lock:
+            self._refill(monotonic())
+            self._tokens -= 1
+            return max(0.0, -self._tokens / self.rate)
+
+    def acquire(self) -> float:
+        """Take a token, waiting for it if needed. Returns the time waited."""
+        wait = self.reserve()
+        if wait:
+            sleep(wait)
+        return wait
+
+    def pause(self, seconds: float):
+        """Hold back every caller for `seconds`, e.g. when the provider is throttling us."""
+        with self._lock:
+            self._refill(monotonic())
+            self._tokens = min(self._tokens, 0.0) - seconds * self.rate
+
+
+class RateLimiter:
+    """
+    Per provider token buckets, shared by every session & thread in the process.
+
+    A throttled (429) or failed (5xx) request is retried with jittered exponential
+    backoff, and a throttle also pauses the provider's bucket, so all the callers slow
+    down together instead of hammering the provider with retries.
+
+    Example:
+        >>> rate_limiter.call("yahoo", lambda: yf.Ticker("RELIANCE.NS").info)
+        >>> rate_limiter.call("nse", requests.get, url, headers=NSE_HEADERS, timeout=30)
+    """
+
+    def __init__(self, max_retries: int = MAX_RETRIES, backoff_base: float = BACKOFF_BASE, backoff_cap: float = BACKOFF_CAP):
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self._buckets: Dict[str, TokenBucket] = {}
+        self._lock = threading.Lock()
+
+    def bucket(self, provider: str) -> TokenBucket:
+        bucket = self._buckets.get(provider)
+        if bucket is None:
+            with self._lock:
+                bucket = self._buckets.get(provider)
+                if bucket is None:
+                    bucket = self._buckets[provider] = TokenBucket(*_rate_limit(provider))
+        return bucket
+
+    def backoff(self, attempt: int) -> float:
+        """Full jitter, a random wait up to the exponential backoff of the attempt."""
+        return random.uniform(0, min(self.backoff_cap, self.backoff_base * 2**attempt))
+
+    def call(self, provider: str, fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+        """Call `fn` within the provider's rate, retrying the throttled & 5xx failures."""
+        bucket = self.bucket(provider)
+        attempt = 0
+        while True:
+            waited = bucket.acquire()
+            if waited:
+                metrics.observe("rate_limit_wait", waited, provider=provider)
+            try:
+                return fn(*args, **kwargs)
+            except Exception as e:
+                if attempt >= self.max_retries or not is_retryable(e):
+                    raise
+                delay = retry_after(e) or self.backoff(attempt)
+                attempt += 1
+                metrics.inc("provider_retries", provider=provider)
+                print(f"Retrying {provider} in {delay:.1f}s ({attempt}/{self.max_retries}): {e}")
+                if status_code(e) in (None, 429):
+                    # throttled, every caller backs off & the next acquire waits it out
+                    bucket.pause(delay)
+                else:
+                    sleep(delay)
+
+
+rate_limiter = RateLimiter()
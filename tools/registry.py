@@ -0,0 +1,104 @@
+import importlib
+import threading
+from time import perf_counter
+from typing import Any, Dict, Iterator, List, Optional
+from llama_index.core.tools import FunctionTool
+from llama_index.core.tools.types import AsyncBaseTool, ToolMetadata, ToolOutput
+from tools.metrics import metrics
+
+
+class LazyFunctionTool(AsyncBaseTool):
+    """
+    A `FunctionTool` for a `module:function` target, built on first use.
+
+    The module is imported when the tool metadata is first read (the agent needs the
+    schema for its first LLM call), the providers the function uses are built by the
+    function itself on its first call.
+    """
+
+    def __init__(self, target: str, name: Optional[str] = None):
+        self.target = target
+        self.name = name or target.split(":")[-1]
+        self.load_seconds: Optional[float] = None
+        self._tool: Optional[FunctionTool] = None
+        self._lock = threading.Lock()
+
+    @property
+    def loaded(self) -> bool:
+        return self._tool is not None
+
+    @property
+    def tool(self) -> FunctionTool:
+        if self._tool is None:
+            with self._lock:
+                if self._tool is None:
+                    start = perf_counter()
+                    module_name, function_name = self.target.split(":")
+                    fn = getattr(importlib.import_module(module_name), function_name)
+                    self._tool = FunctionTool.from_defaults(fn=fn, name=self.name)
+                    self.load_seconds = perf_counter() - start
+                    metrics.observe("tool_load", self.load_seconds, tool=self.name)
+        return self._tool
+
+    @property
+    def metadata(self) -> ToolMetadata:
+        return self.tool.metadata
+
+    def call(self, *args: Any, **kwargs: Any) -> ToolOutput:
+        return self.tool.call(*args, **kwargs)
+
+    async def acall(self, *args: Any, **kwargs: Any) -> ToolOutput:
+        return await self.tool.acall(*args, **kwargs)
+
+    def __repr__(self) -> str:
+        return f"LazyFunctionTool(name={self.name!r}, target={self.target!r}, loaded={self.loaded})"
+
+
+class ToolRegistry:
+    """
+    The tools of the app by name, every tool is loaded lazily.
+
+    Registering a tool only records its target, so adding tools keeps the app import
+    & worker start cheap.
+
+    Example:
+        >>> stock_analyser = tool_registry.register("tools.functions:analyse_company_yf", name="analyse_company")
+        >>> tool_registry.get("analyse_company") is stock_analyser
+        True
+        >>> print(tool_registry.report())
+    """
+
+    def __init__(self):
+        self._tools: Dict[str, LazyFunctionTool] = {}
+
+    def register(self, target: str, name: Optional[str] = None) -> LazyFunctionTool:
+        tool = LazyFunctionTool(target, name=name)
+        if tool.name in self._tools:
+            raise ValueError(f"A tool named {tool.name} is already registered")
+        self._tools[tool.name] = tool
+        return tool
+
+    def get(self, name: str) -> LazyFunctionTool:
+        return self._tools[name]
+
+    def load_all(self) -> List[LazyFunctionTool]:
+        """Load every tool now, e.g. before a worker takes traffic."""
+        for tool in self._tools.values():
+            tool.tool
+        return list(self._tools.values())
+
+    def __iter__(self) -> Iterator[LazyFunctionTool]:
+        return iter(self._tools.values())
+
+    def report(self, startup_seconds: Optional[float] = None) -> str:
+        """The startup time of the app and the load time of every tool loaded so far."""
+        lines = []
+        if startup_seconds is not None:
+            lines.append(f"[STARTUP]: App imported in {startup_seconds:.2f}s")
+        for tool in self._tools.values():
+            status = f"loaded in {tool.load_seconds:.2f}s" if tool.loaded else "not loaded"
+            lines.append(f"[STARTUP]: Tool {tool.name} ({tool.target}) {status}")
+        return "\n".join(lines)
+
+
+tool_registry = ToolRegistry()
@@ -0,0 +1,189 @@
+import math
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+import pandas as pd
+import regex as re
+from utils import calculate_token_count_of_message
+
+# Words shortened in the keys, the LLM reads these just as well
+KEY_ABBREVIATIONS = {
+    "Ratio": "",
+    "Growth": "Gr.",
+    "Margin": "Mgn.",
+    "Revenue": "Rev.",
+    "Estimate": "Est.",
+    "Enterprise Value": "EV",
+    "Market Cap": "MCap",
+    "Dividend": "Div.",
+    "Operating": "Op.",
+    "Valuation": "Val.",
+    "Interpretations": "Notes",
+    "Next Year": "NY",
+    "Long-term": "LT",
+}
+# Values at or above this are amounts in INR and shown in crores
+CRORE = 1e7
+MAX_TEXT_CHARS = 300
+
+
+ABBREVIATION_PATTERN = re.compile(
+    r"\b(" + "|".join(re.escape(word) for word in KEY_ABBREVIATIONS) + r")\b"
+)
+
+
+def abbreviate(key: Any) -> str:
+    """Shorten the whole words in the key, `P/E Ratio` -> `P/E`, `Revenue Growth` -> `Rev. Gr.`"""
+    key = ABBREVIATION_PATTERN.sub(lambda match: KEY_ABBREVIATIONS[match.group(1)], str(key))
+    return " ".join(key.split())
+
+
+def is_missing(value: Any) -> bool:
+    if value is None:
+        return True
+    if isinstance(value, float) and math.isnan(value):
+        return True
+    if isinstance(value, (str, dict, list)) and len(value) == 0:
+        return True
+    return False
+
+
+def format_value(value: Any) -> str:
+    """Round the numbers to a few significant digits and show the big amounts in crores."""
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        if isinstance(value, pd.Timestamp):
+            return value.strftime("%Y-%m-%d")
+        return str(value)
+    if abs(value) >= CRORE:
+        return f"{value / CRORE:,.0f}Cr"
+    if isinstance(value, int) or float(value).is_integer():
+        return str(int(value))
+    if abs(value) >= 100:
+        return f"{value:.0f}"
+    return f"{value:.3g}"
+
+
+def render_dict(data: Dict[str, Any], prefix: str = "") -> List[str]:
+    """One `key: value` line per entry, a nested dict goes on one `key: k=v; k=v` line."""
+    lines = []
+    for key, value in data.items():
+        if is_missing(value):
+            continue
+        if isinstance(value, dict):
+            nested = [
+                f"{abbreviate(k)}={format_value(v)}"
+                for k, v in value.items()
+                if not is_missing(v) and not isinstance(v, dict)
+            ]
+            if nested:
+                lines.append(f"{prefix}{abbreviate(key)}: " + "; ".join(nested))
+            # deeper levels get their own lines
+            deeper = {k: v for k, v in value.items() if isinstance(v, dict)}
+            if deeper:
+                lines.extend(render_dict(deeper, prefix=f"{prefix}{abbreviate(key)} "))
+        else:
+            lines.append(f"{prefix}{abbreviate(key)}: {format_value(value)}")
+    return lines
+
+
+def render_frame(df: pd.DataFrame) -> List[str]:
+    """A dense `|` separated table, the empty rows & columns are dropped."""
+    df = df.dropna(how="all").dropna(axis=1, how="all")
+    if df.empty:
+        return []
+    header = ["", *(format_value(column) for column in df.columns)]
+    lines = ["|".join(header)]
+    for index, row in df.iterrows():
+        cells = ["" if is_missing(value) else format_value(value) for value in row]
+        lines.append("|".join([abbreviate(index), *cells]))
+    return lines
+
+
+def render_records(records: List[dict]) -> List[str]:
+    """One line per record, e.g. news articles, the long texts are cut short."""
+    lines = []
+    for record in records:
+        parts = [
+            str(value)[:MAX_TEXT_CHARS]
+            for value in record.values()
+            if not is_missing(value)
+        ]
+        lines.append("- " + " | ".join(parts))
+    return lines
+
+
+@dataclass
+class Section:
+    title: str
+    content: Any
+    # the sections with the lowest priority are dropped first to fit the budget
+    priority: int = 0
+
+    def render(self) -> str:
+        content = self.content
+        if isinstance(content, dict):
+            lines = render_dict(content)
+        elif isinstance(content, pd.DataFrame):
+            lines = render_frame(content)
+        elif isinstance(content, list):
+            lines = render_records(content)
+        else:
+            lines = [str(content).strip()] if not is_missing(content) else []
+        if not lines:
+            return ""
+        return f"## {self.title}\n" + "\n".join(lines)
+
+
+@dataclass
+class ToolResult:
+    """
+    A structured tool output, rendered compactly to fit a token budget.
+
+    The sections are rendered as dense text (no nulls, rounded numbers, short keys,
+    `|` tables), and when the whole does not fit the budget the lowest priority
+    sections are dropped first.
+
+    Example:
+        >>> result = ToolResult("RELIANCE")
+        >>> result.add("Key Ratios", {"P/E Ratio": 24.512, "PEG Ratio": None}, priority=5)
+        >>> result.add("Recent news", news, priority=1)
+        >>> result.render(max_tokens=1000)
+        '# RELIANCE\\n## Key Ratios\\nP/E: 24.5'
+    """
+
+    title: str
+    sections: List[Section] = field(default_factory=list)
+
+    def add(self, title: str, content: Any, priority: int = 0) -> "ToolResult":
+        self.sections.append(Section(title, content, priority))
+        return self
+
+    def render(self, max_tokens: Optional[int] = None) -> str:
+        rendered = [(section, section.render()) for section in self.sections]
+        rendered = [(section, text) for section, text in rendered if text]
+        header = f"# {self.title}"
+
+        def join(parts) -> str:
+            return "\n".join([header, *(text for _, text in parts)])
+
+        if max_tokens is None:
+            return join(rendered)
+
+        counts = [calculate_token_count_of_message(text) for _, text in rendered]
+        total = calculate_token_count_of_message(header) + sum(counts)
+        dropped = set()
+        # drop the lowest priority (and among those the last added) sections first
+        for i in sorted(range(len(rendered)), key=lambda i: (rendered[i][0].priority, -i)):
+            if total <= max_tokens or len(rendered) - len(dropped) == 1:
+                break
+            dropped.add(i)
+            total -= counts[i]
+
+        response = join(part for i, part in enumerate(rendered) if i not in dropped)
+        if dropped:
+            response += "\n(Left out to save space: " + ", ".join(
+                rendered[i][0].title for i in sorted(dropped)
+            ) + ")"
+        # a single section can still be too long, cut it to the budget
+        if calculate_token_count_of_message(response) > max_tokens:
+            response = response[: max_tokens * 4] + "..."
+        return response
@@ -0,0 +1,134 @@
+import os
+from datetime import datetime, timedelta, timezone
+from typing import NamedTuple, Optional, Set
+import regex as re
+from tools.cache import DAY, TieredCache, yf_cache
+from tools.metrics import metrics
+from tools.resolver import CompanyResolver, company_resolver
+from tools.ticker_data import normalise_symbol
+from tools.utils import CACHE_DIR
+
+IST = timezone(timedelta(hours=5, minutes=30))
+
+# The questions asking for a report / the performance of a company
+INTENT_PATTERNS = {
+    "report": re.compile(
+        r"\b(report|perform(ance|ing)?|analy[sz](e|is)|how is .+ doing|outlook)\b",
+        re.IGNORECASE,
+    ),
+}
+# Questions about a part of the report, or more than one company, are not the full report
+QUALIFIER_PATTERN = re.compile(
+    r"\b(vs|versus|compar(e|ed|ing|ison)|(better|worse) than|against|peers?|technicals?|"
+    r"indicators?|rsi|macd|moving averages?|only|just|specifically)\b",
+    re.IGNORECASE,
+)
+# Capitalised words that are part of the question rather than a company name
+QUESTION_WORDS = {
+    "how", "what", "is", "are", "the", "a", "an", "of", "for", "on", "create", "give",
+    "make", "write", "detailed", "report", "analysis", "analyse", "analyze", "please",
+    "can", "you", "me", "tell", "about", "performing", "performance", "stock", "share",
+    "doing", "outlook", "i", "and",
+}
+
+
+class ReportKey(NamedTuple):
+    symbol: str
+    intent: str
+    model: str
+    trading_date: str
+
+
+def trading_date(now: Optional[datetime] = None) -> str:
+    """The current NSE trading date, the weekends roll back to the Friday."""
+    day = (now or datetime.now(IST)).date()
+    while day.weekday() >= 5:
+        day -= timedelta(days=1)
+    return day.isoformat()
+
+
+class ReportCache:
+    """
+    Cache the generated reports for repeated analysis questions.
+
+    A question is matched to (symbol, intent, model, trading date) with the local
+    resolver, so close variants of the same question share one report. Only questions
+    asking for the full report of exactly one company are matched, comparisons and
+    questions on a part of the report (`vs`, `technical`, `only`, ...) are not. Every report
+    remembers the version of the underlying yahoo finance data it was built from and
+    is dropped once that data is refreshed.
+
+    Example:
+        >>> key = report_cache.match("How is Reliance performing? Create a detailed report.", model)
+        >>> report_cache.get(key)  # None on the first ask
+        >>> report_cache.set(key, response)
+        >>> report_cache.get(key)  # the same response until the data or the trading day changes
+    """
+
+    def __init__(
+        self,
+        cache: Optional[TieredCache] = None,
+        data_cache: TieredCache = yf_cache,
+        resolver: CompanyResolver = company_resolver,
+        min_confidence: float = 0.9,
+    ):
+        self.cache = cache or TieredCache(
+            os.path.join(CACHE_DIR, "reports.sqlite"), ttls={"report": DAY}
+        )
+        self.data_cache = data_cache
+        self.resolver = resolver
+        self.min_confidence = min_confidence
+
+    def match(self, query: str, model: str) -> Optional[ReportKey]:
+        """Get the report key for the question, None when it is not a cacheable one."""
+        intent = next(
+            (name for name, pattern in INTENT_PATTERNS.items() if pattern.search(query)),
+            None,
+        )
+        if intent is None or QUALIFIER_PATTERN.search(query):
+            return None
+        # only a question on exactly one company is answered by its report
+        symbols = self._find_companies(query)
+        if len(symbols) != 1:
+            return None
+        return ReportKey(symbols.pop(), intent, model, trading_date())
+
+    def get(self, key: ReportKey) -> Optional[str]:
+        hit, entry = self.cache.get("report", key)
+        if not hit:
+            return None
+        if entry["data_version"] != self.data_cache.version(normalise_symbol(key.symbol)):
+            # the data behind the report was refreshed since
+            self.cache.invalidate(key, kind="report")
+            return None
+        return entry["response"]
+
+    def set(self, key: ReportKey, response: str):
+        if not response.strip():
+            return
+        self.cache.set(
+            "report",
+            key,
+            {
+                "response": response,
+                "data_version": self.data_cache.version(normalise_symbol(key.symbol)),
+            },
+        )
+
+    def _find_companies(self, query: str) -> Set[str]:
+        """The symbols of all the companies named in the question."""
+        # the runs of capitalised words (and symbols like M&M) left after the question words
+        candidates = re.findall(r"[A-Z][\w&.\-]*(?:\s+[A-Z][\w&.\-]*)*", query)
+        symbols = set()
+        for candidate in candidates:
+            words = [w for w in candidate.split() if w.lower().strip(".") not in QUESTION_WORDS]
+            if not words:
+                continue
+            match = self.resolver.resolve(" ".join(words))
+            if match and match.confidence >= self.min_confidence:
+                symbols.add(match.symbol)
+        return symbols
+
+
+report_cache = ReportCache()
+metrics.register_cache("reports", report_cache.cache)
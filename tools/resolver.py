@@ -0,0 +1,147 @@
+import os
+import threading
+from collections import Counter, defaultdict
+from difflib import SequenceMatcher
+from typing import Dict, List, NamedTuple, Optional
+import regex as re
+from tools.utils import NSEMasterList, nse_master_list
+
+# Matches below this confidence fall back to the search + LLM ticker extraction
+RESOLVER_MIN_CONFIDENCE = float(os.getenv("RESOLVER_MIN_CONFIDENCE", 0.8))
+
+# words that don't help tell one company from another
+STOP_WORDS = {"the", "limited", "ltd", "pvt", "private", "co", "company", "corp", "corporation", "inc"}
+
+
+class Match(NamedTuple):
+    symbol: str
+    company_name: str
+    confidence: float
+
+
+def normalise_name(name: str) -> str:
+    """Lowercase the name and drop the punctuation and the words like `Limited`, `Ltd.` etc."""
+    name = name.lower().replace("&", " and ")
+    tokens = re.findall(r"[\p{L}\p{N}]+", name)
+    return " ".join(token for token in tokens if token not in STOP_WORDS)
+
+
+def trigrams(text: str) -> set:
+    """The character trigrams of the text, padded so that short words still get some."""
+    text = f"  {text} "
+    return {text[i : i + 3] for i in range(len(text) - 2)}
+
+
+def _dice(a: set, b: set) -> float:
+    return 2 * len(a & b) / (len(a) + len(b)) if a and b else 0.0
+
+
+class CompanyResolver:
+    """
+    Resolve a company name to its NSE symbol offline, using the NSE equity master list.
+
+    The names are indexed by their character trigrams, the candidates sharing the most
+    trigrams with the query are then scored on trigram overlap, word coverage and
+    edit similarity, for both the company name and the symbol.
+
+    Example:
+        >>> resolver = CompanyResolver()
+        >>> resolver.resolve("Reliance Industries")
+        Match(symbol='RELIANCE', company_name='Reliance Industries Limited', confidence=1.0)
+    """
+
+    def __init__(self, master_list: NSEMasterList = nse_master_list, max_candidates: int = 20):
+        self.master_list = master_list
+        self.max_candidates = max_candidates
+        self._source = None
+        self._lock = threading.Lock()
+        self._symbols: List[str] = []
+        self._names: List[str] = []
+        self._normalised: List[str] = []
+        self._grams: List[set] = []
+        self._index: Dict[str, List[int]] = {}
+        self._by_symbol: Dict[str, int] = {}
+
+    def _ensure_index(self) -> bool:
+        df = self.master_list.df
+        if df is None:
+            return False
+        # rebuild only when the master list was refreshed
+        if df is not self._source:
+            with self._lock:
+                if df is not self._source:
+                    self._build(df)
+        return True
+
+    def _build(self, df):
+        symbols = df["SYMBOL"].tolist()
+        names = df["NAME OF COMPANY"].astype(str).str.strip().tolist()
+        normalised = [normalise_name(name) for name in names]
+        grams = [trigrams(name) for name in normalised]
+        index = defaultdict(list)
+        for i, (name_grams, symbol) in enumerate(zip(grams, symbols)):
+            for gram in name_grams | trigrams(symbol.lower()):
+                index[gram].append(i)
+
+        self._symbols, self._names, self._normalised, self._grams = symbols, names, normalised, grams
+        self._index = dict(index)
+        self._by_symbol = {symbol: i for i, symbol in enumerate(symbols)}
+        self._source = df
+
+    def _score(self, query: str, query_grams: set, i: int) -> float:
+        name, symbol = self._normalised[i], self._symbols[i].lower()
+        if query in (name, symbol) or query.replace(" ", "") == symbol:
+            return 1.0
+
+        query_tokens, name_tokens = query.split(), set(name.split())
+        coverage = sum(token in name_tokens for token in query_tokens) / len(query_tokens)
+        name_score = (
+            0.5 * _dice(query_grams, self._grams[i])
+            + 0.3 * coverage
+            + 0.2 * SequenceMatcher(None, query, name).ratio()
+        )
+        symbol_score = SequenceMatcher(None, query.replace(" ", ""), symbol).ratio()
+        return max(name_score, 0.9 * symbol_score)
+
+    def search(self, company_name: str, limit: int = 5) -> List[Match]:
+        """Get the best matching companies for the name, best first."""
+        query = normalise_name(company_name)
+        if not query or not self._ensure_index():
+            return []
+
+        # an exact symbol, the normalised query loses symbols like `M&M`
+        exact = self._by_symbol.get(company_name.strip().upper())
+        if exact is not None:
+            return [Match(self._symbols[exact], self._names[exact], 1.0)]
+
+        query_grams = trigrams(query)
+        # shortlist the companies sharing the most trigrams, then score only those
+        counts = Counter(i for gram in query_grams for i in self._index.get(gram, ()))
+        shortlist = [i for i, _ in counts.most_common(self.max_candidates)]
+        scores = sorted(
+            ((self._score(query, query_grams, i), i) for i in shortlist), reverse=True
+        )
+        return [
+            Match(self._symbols[i], self._names[i], round(score, 3))
+            for score, i in scores[:limit]
+        ]
+
+    def resolve(self, company_name: str) -> Optional[Match]:
+        """
+        Get the single best match for the company name, or None.
+
+        The confidence is lowered when the runner-up scores almost the same, as the
+        name is then ambiguous (e.g. `Tata` or `Adani`).
+        """
+        matches = self.search(company_name, limit=2)
+        if not matches:
+            return None
+        best = matches[0]
+        if best.confidence < 1.0 and len(matches) > 1:
+            margin = best.confidence - matches[1].confidence
+            if margin < 0.1:
+                best = best._replace(confidence=round(best.confidence * (0.7 + 3 * margin), 3))
+        return best
+
+
+company_resolver = CompanyResolver()
@@ -0,0 +1,259 @@
+import os
+import operator
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from time import time
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+import pandas as pd
+import regex as re
+from tools.utils import CACHE_DIR, nse_master_list
+from tools.ticker_data import TickerData
+
+# How long (in seconds) the screener snapshot is used before it is rebuilt
+SNAPSHOT_TTL = float(os.getenv("SNAPSHOT_TTL", 24 * 60 * 60))
+# Number of concurrent yahoo finance fetches while building the snapshot
+SNAPSHOT_WORKERS = int(os.getenv("SNAPSHOT_WORKERS", 8))
+
+# Snapshot column -> (key in the yahoo finance info, scale), the percentages are kept as fractions
+SNAPSHOT_FIELDS = {
+    "market_cap": ("marketCap", 1e-7),  # in Cr.
+    "pe": ("trailingPE", 1),
+    "forward_pe": ("forwardPE", 1),
+    "pb": ("priceToBook", 1),
+    "ps": ("priceToSalesTrailing12Months", 1),
+    "peg": ("pegRatio", 1),
+    "ev_ebitda": ("enterpriseToEbitda", 1),
+    "roe": ("returnOnEquity", 1),
+    "roa": ("returnOnAssets", 1),
+    "de": ("debtToEquity", 0.01),  # yahoo reports it in %
+    "current_ratio": ("currentRatio", 1),
+    "gross_margin": ("grossMargins", 1),
+    "operating_margin": ("operatingMargins", 1),
+    "net_margin": ("profitMargins", 1),
+    "revenue_growth": ("revenueGrowth", 1),
+    "earnings_growth": ("earningsGrowth", 1),
+    "dividend_yield": ("dividendYield", 1),
+    "beta": ("beta", 1),
+}
+TEXT_FIELDS = {"name": "shortName", "sector": "sector", "industry": "industry"}
+PERCENT_COLUMNS = {
+    "roe", "roa", "gross_margin", "operating_margin", "net_margin",
+    "revenue_growth", "earnings_growth", "dividend_yield",
+}
+
+# The names users (and the LLM) use for the metrics -> snapshot column
+METRIC_ALIASES = {
+    "market cap": "market_cap", "mcap": "market_cap",
+    "p/e": "pe", "pe ratio": "pe", "p/e ratio": "pe", "forward p/e": "forward_pe",
+    "p/b": "pb", "price to book": "pb", "p/s": "ps", "price to sales": "ps",
+    "peg ratio": "peg", "ev/ebitda": "ev_ebitda",
+    "return on equity": "roe", "return on assets": "roa",
+    "d/e": "de", "debt to equity": "de", "debt/equity": "de",
+    "gross margin": "gross_margin", "operating margin": "operating_margin",
+    "net margin": "net_margin", "profit margin": "net_margin", "margin": "net_margin",
+    "revenue growth": "revenue_growth", "sales growth": "revenue_growth",
+    "earnings growth": "earnings_growth", "profit growth": "earnings_growth",
+    "dividend yield": "dividend_yield", "yield": "dividend_yield",
+}
+OPERATORS = {
+    ">": operator.gt, ">=": operator.ge, "<": operator.lt, "<=": operator.le,
+    "=": operator.eq, "==": operator.eq, "!=": operator.ne,
+}
+CLAUSE_PATTERN = re.compile(
+    r"^\s*(?P<metric>[a-z][a-z/ _]*?)\s*(?P<op>>=|<=|==|!=|>|<|=)\s*(?P<value>-?\d+(?:\.\d+)?)\s*(?P<unit>%|cr)?\s*$"
+)
+SORT_PATTERN = re.compile(
+    r"\s*(?:,\s*)?\b(?:sorted|sort|ranked|rank|order(?:ed)?)\s+by\s+(?P<metric>[a-z/ _]+?)(?:\s+(?P<order>asc|ascending|desc|descending))?\s*$"
+)
+
+
+def metric_column(metric: str) -> str:
+    """Map a metric name like `P/E`, `ROE` or `debt to equity` to its snapshot column."""
+    metric = " ".join(metric.lower().replace("_", " ").split())
+    column = METRIC_ALIASES.get(metric, metric.replace(" ", "_"))
+    if column not in SNAPSHOT_FIELDS:
+        raise ValueError(
+            f"Unknown metric '{metric}', use one of: {', '.join(SNAPSHOT_FIELDS)}"
+        )
+    return column
+
+
+def parse_criteria(criteria: str) -> Tuple[List[Tuple[str, str, float]], Optional[str], Optional[bool]]:
+    """
+    Parse a criteria like `ROE > 15% and D/E < 1 sorted by PEG`.
+
+    Percentage metrics take either `15%` or `0.15`, a bare value above 1 is read as a
+    percentage too, so `ROE > 15` means 15%.
+
+    Returns:
+        tuple: The (column, operator, value) filters, the sort column and whether to
+            sort descending, the last two are None when not given.
+    """
+    criteria = criteria.lower().strip()
+    sort_by, descending = None, None
+    sort_match = SORT_PATTERN.search(criteria)
+    if sort_match:
+        sort_by = metric_column(sort_match.group("metric"))
+        if sort_match.group("order"):
+            descending = sort_match.group("order").startswith("desc")
+        criteria = criteria[: sort_match.start()]
+
+    filters = []
+    for clause in re.split(r"\band\b|&|,", criteria):
+        if not clause.strip():
+            continue
+        match = CLAUSE_PATTERN.match(clause)
+        if not match:
+            raise ValueError(f"Could not understand the filter '{clause.strip()}'")
+        column = metric_column(match.group("metric"))
+        value = float(match.group("value"))
+        if column in PERCENT_COLUMNS and (match.group("unit") == "%" or abs(value) > 1):
+            value /= 100
+        filters.append((column, match.group("op"), value))
+    return filters, sort_by, descending
+
+
+def info_to_row(info: dict) -> dict:
+    """Pick the snapshot fields from the yahoo finance info of a company."""
+    row = {column: info.get(key) for column, key in TEXT_FIELDS.items()}
+    for column, (key, scale) in SNAPSHOT_FIELDS.items():
+        value = info.get(key)
+        row[column] = float(value) * scale if isinstance(value, (int, float)) else np.nan
+    return row
+
+
+class Screener:
+    """
+    Screen the whole NSE universe on its fundamental ratios.
+
+    The ratios of every NSE company are held in one columnar snapshot (a float64 column
+    per metric), built from the cached yahoo finance info and saved to the local cache.
+    A screen is then a handful of vectorized comparisons over those columns.
+
+    Example:
+        >>> screener = Screener()
+        >>> screener.screen("ROE > 15% and D/E < 1 sorted by PEG", limit=5)
+    """
+
+    def __init__(
+        self,
+        path: str = os.path.join(CACHE_DIR, "screener", "snapshot.pkl"),
+        ttl: float = SNAPSHOT_TTL,
+    ):
+        self.path = path
+        self.ttl = ttl
+        self._snapshot: Optional[pd.DataFrame] = None
+        self._built_at = 0.0
+        self._lock = threading.Lock()
+        self._building = threading.Event()
+
+    @property
+    def snapshot(self) -> Optional[pd.DataFrame]:
+        """The latest snapshot, a stale or missing one is rebuilt in the background."""
+        if self._snapshot is None and os.path.exists(self.path):
+            with self._lock:
+                if self._snapshot is None:
+                    self._snapshot = pd.read_pickle(self.path)
+                    self._built_at = os.path.getmtime(self.path)
+        if time() - self._built_at > self.ttl:
+            self.refresh(background=True)
+        return self._snapshot
+
+    def refresh(self, symbols: Optional[List[str]] = None, background: bool = False):
+        """Rebuild the snapshot, for all the NSE symbols by default."""
+        if background:
+            if self._building.is_set():
+                return
+            self._building.set()
+            threading.Thread(
+                target=self.refresh, args=(symbols,), name="screener-refresh", daemon=True
+            ).start()
+            return
+
+        self._building.set()
+        try:
+            snapshot = self.build(symbols)
+            if snapshot.empty:
+                return
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            tmp_path = f"{self.path}.tmp"
+            snapshot.to_pickle(tmp_path)
+            os.replace(tmp_path, self.path)
+            self._snapshot, self._built_at = snapshot, time()
+        except Exception as e:
+            print(f"Error building the screener snapshot: {e}")
+        finally:
+            self._building.clear()
+
+    @staticmethod
+    def build(symbols: Optional[List[str]] = None, max_workers: int = SNAPSHOT_WORKERS) -> pd.DataFrame:
+        """Build a snapshot from the (cached) yahoo finance info of the symbols."""
+        if symbols is None:
+            symbols = sorted(nse_master_list.symbols)
+
+        def fetch(symbol: str) -> Optional[dict]:
+            try:
+                return info_to_row(TickerData(symbol).info)
+            except Exception as e:
+                print(f"Skipping {symbol} in the snapshot: {e}")
+                return None
+
+        with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="snapshot") as executor:
+            rows = dict(zip(symbols, executor.map(fetch, symbols)))
+
+        snapshot = pd.DataFrame.from_dict(
+            {symbol: row for symbol, row in rows.items() if row}, orient="index"
+        )
+        if snapshot.empty:
+            return snapshot
+        return snapshot.astype({column: "float64" for column in SNAPSHOT_FIELDS})
+
+    def screen(
+        self,
+        criteria: str,
+        sort_by: Optional[str] = None,
+        descending: Optional[bool] = None,
+        limit: int = 20,
+    ) -> pd.DataFrame:
+        """
+        Filter & rank the snapshot.
+
+        Args:
+            criteria (str): The filters, e.g. `ROE > 15% and D/E < 1 sorted by PEG`.
+            sort_by (str): The metric to rank on, overrides the one in the criteria.
+            descending (bool): Rank the highest first, by default ascending.
+            limit (int): The max number of companies returned.
+
+        Returns:
+            pd.DataFrame: The matching companies with the filtered & ranked metrics.
+        """
+        snapshot = self.snapshot
+        if snapshot is None:
+            raise RuntimeError("The screener snapshot is still being built, try again in a few minutes")
+
+        filters, criteria_sort_by, criteria_descending = parse_criteria(criteria)
+        sort_by = metric_column(sort_by) if sort_by else criteria_sort_by
+        if descending is None:
+            descending = bool(criteria_descending)
+
+        # NaN fails every comparison, so companies missing a metric drop out
+        mask = np.ones(len(snapshot), dtype=bool)
+        with np.errstate(invalid="ignore"):
+            for column, op, value in filters:
+                mask &= OPERATORS[op](snapshot[column].to_numpy(), value)
+        matches = np.flatnonzero(mask)
+
+        if sort_by:
+            keys = snapshot[sort_by].to_numpy()[matches]
+            keys = -keys if descending else keys
+            # a stable sort keeps the NaNs at the end
+            matches = matches[np.argsort(keys, kind="stable")]
+
+        columns = ["name", "sector"] + list(
+            dict.fromkeys([column for column, _, _ in filters] + ([sort_by] if sort_by else []))
+        )
+        return snapshot.iloc[matches[:limit]][columns]
+
+
+screener = Screener()
@@ -0,0 +1,97 @@
+import asyncio
+import threading
+from concurrent.futures import Future
+from typing import Any, Awaitable, Callable, Dict, Hashable, TypeVar, Union
+from tools.metrics import metrics
+
+T = TypeVar("T")
+
+
+def _provider(key: Hashable) -> str:
+    return str(key[0]) if isinstance(key, tuple) and key else "unknown"
+
+
+class SingleFlight:
+    """
+    Coalesce concurrent calls for the same key into a single call.
+
+    The first caller of a key runs the call, every caller arriving while it is in flight
+    waits for it and gets the same result (or exception). A flight is a
+    `concurrent.futures.Future`, so threads block on it while asyncio tasks await it,
+    and both can share the same flight. Keys are `(provider, symbol, data type)` like
+    tuples, the first item is used as the provider in the metrics.
+
+    Example:
+        >>> info = single_flight.do(("yahoo", "RELIANCE.NS", "info"), lambda: ticker.info)
+        >>> report = await single_flight.ado(("llm", "RELIANCE", "report"), generate_report)
+    """
+
+    def __init__(self):
+        self._flights: Dict[Hashable, Future] = {}
+        self._lock = threading.Lock()
+
+    def _join(self, key: Hashable):
+        """Returns the flight of the key and whether this caller leads it."""
+        with self._lock:
+            flight = self._flights.get(key)
+            if flight is not None:
+                metrics.inc("coalesced_calls", provider=_provider(key))
+                return flight, False
+            flight = self._flights[key] = Future()
+            return flight, True
+
+    def _land(self, key: Hashable, flight: Future):
+        # the result is set before the flight is removed, so no caller misses both
+        with self._lock:
+            if self._flights.get(key) is flight:
+                del self._flights[key]
+
+    def in_flight(self, key: Hashable) -> bool:
+        return key in self._flights
+
+    def do(self, key: Hashable, fn: Callable[[], T]) -> T:
+        """Call `fn`, or wait for the call already in flight for the key."""
+        flight, leader = self._join(key)
+        if not leader:
+            return flight.result()
+        try:
+            result = fn()
+        except BaseException as e:
+            flight.set_exception(e)
+            raise
+        else:
+            flight.set_result(result)
+            return result
+        finally:
+            self._land(key, flight)
+
+    async def ado(self, key: Hashable, fn: Callable[[], Union[Awaitable[T], T]]) -> T:
+        """
+        Await `fn`, or the call already in flight for the key.
+
+        A coroutine function is awaited in the calling task, a regular function is run
+        on a thread so it does not block the event loop.
+        """
+        flight, leader = self._join(key)
+        if not leader:
+            return await asyncio.wrap_future(flight)
+        try:
+            if asyncio.iscoroutinefunction(fn):
+                result = await fn()
+            else:
+                result = await asyncio.to_thread(fn)
+        except asyncio.CancelledError:
+            # the waiters were not cancelled themselves, so they get a regular error
+            flight.set_exception(RuntimeError(f"The shared call for {key} was cancelled"))
+            raise
+        except BaseException as e:
+            flight.set_exception(e)
+            raise
+        else:
+            flight.set_result(result)
+            return result
+        finally:
+            self._land(key, flight)
+
+
+single_flight = SingleFlight()
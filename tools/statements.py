@@ -0,0 +1,268 @@
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, Optional, Tuple
+import numpy as np
+import regex as re
+import pandas as pd
+from tools.cache import TieredCache, yf_cache
+from tools.ticker_data import TickerData, normalise_symbol
+
+# The TickerData properties of each statement, (annual, quarterly)
+STATEMENTS = {
+    "income": ("financials", "quarterly_financials"),
+    "balance": ("balance_sheet", "quarterly_balance_sheet"),
+    "cashflow": ("cashflow", "quarterly_cashflow"),
+}
+# The flows over a period are summed over the last 4 quarters for the TTM, the balance
+# sheet items are a position at the period end, the latest quarter is the TTM
+FLOW_STATEMENTS = ("income", "cashflow")
+# The margins are the income items over the first of these found
+REVENUE_ITEMS = ("Total Revenue", "Operating Revenue")
+# The income items that are not amounts (per share, counts, rates) have no margin
+NON_AMOUNT_PATTERN = re.compile(r"\bEPS\b|\bShares\b|\bRate\b")
+# The last 4 quarters are a TTM only if they span about a year, not with a missing quarter
+MAX_TTM_SPAN_DAYS = 300
+# Number of symbols whose trends are kept in memory
+TRENDS_CACHE_SIZE = 256
+DAYS_PER_YEAR = 365.25
+
+
+@dataclass
+class Statements:
+    """The line items of all the statements as rows of one array, the periods ascending."""
+
+    items: pd.MultiIndex
+    periods: pd.DatetimeIndex
+    values: np.ndarray
+
+    @classmethod
+    def align(cls, frames: Dict[str, pd.DataFrame]) -> "Statements":
+        """
+        Stack the yahoo finance statements (items x periods, newest first) into one
+        `(statement, item)` x periods array over the union of their periods.
+        """
+        frames = {
+            name: frame
+            for name, frame in frames.items()
+            if isinstance(frame, pd.DataFrame) and not frame.empty
+        }
+        if not frames:
+            return cls(pd.MultiIndex.from_tuples([], names=["statement", "item"]), pd.DatetimeIndex([]), np.empty((0, 0)))
+        stacked = pd.concat(frames, names=["statement", "item"])
+        stacked.columns = pd.to_datetime(stacked.columns)
+        stacked = stacked.loc[~stacked.index.duplicated(), ~stacked.columns.duplicated()].sort_index(axis=1)
+        values = stacked.apply(pd.to_numeric, errors="coerce").to_numpy(dtype=np.float64)
+        return cls(stacked.index, stacked.columns, values)
+
+    def frame(self, values: np.ndarray) -> pd.DataFrame:
+        return pd.DataFrame(values, index=self.items, columns=self.periods)
+
+    def flows(self) -> np.ndarray:
+        """Mask of the rows that are flows over a period."""
+        return self.items.get_level_values("statement").isin(FLOW_STATEMENTS)
+
+    def revenue(self) -> Optional[np.ndarray]:
+        for item in REVENUE_ITEMS:
+            if ("income", item) in self.items:
+                return self.values[self.items.get_loc(("income", item))]
+        return None
+
+
+def growth(values: np.ndarray, lag: int = 1) -> np.ndarray:
+    """
+    The growth of every item over `lag` periods, NaN for the first `lag` periods.
+
+    The change is over the absolute previous value, so a loss shrinking into a profit
+    is positive growth. A zero previous value has no growth.
+    """
+    result = np.full(values.shape, np.nan)
+    if values.shape[1] <= lag:
+        return result
+    previous = values[:, :-lag]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        result[:, lag:] = np.where(previous != 0, (values[:, lag:] - previous) / np.abs(previous), np.nan)
+    return result
+
+
+def _first_last(values: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """The positions of the first & last reported value of every row, and if it has any."""
+    valid = ~np.isnan(values)
+    first = valid.argmax(axis=1)
+    last = values.shape[1] - 1 - valid[:, ::-1].argmax(axis=1)
+    return first, last, valid.any(axis=1)
+
+
+def cagr(values: np.ndarray, periods: pd.DatetimeIndex) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    The compound annual growth of every item from its first to its last reported value.
+
+    Returns:
+        tuple: The CAGR & the years it is over, NaN when either end is not positive.
+    """
+    if values.shape[1] == 0:
+        return np.full(len(values), np.nan), np.full(len(values), np.nan)
+    first, last, reported = _first_last(values)
+    rows = np.arange(len(values))
+    start, end = values[rows, first], values[rows, last]
+    days = (periods.values[last] - periods.values[first]).astype("timedelta64[D]").astype(np.float64)
+    years = days / DAYS_PER_YEAR
+    with np.errstate(divide="ignore", invalid="ignore"):
+        result = np.where(
+            reported & (start > 0) & (end > 0) & (years > 0), (end / start) ** (1 / years) - 1, np.nan
+        )
+    return result, np.where(reported, years, np.nan)
+
+
+def ttm(statements: Statements) -> np.ndarray:
+    """
+    The trailing twelve months of every item from the quarterly statements: the sum of
+    the last 4 quarters for the flows, the latest quarter for the balance sheet.
+    """
+    values, periods = statements.values, statements.periods
+    if values.shape[1] < 4 or (periods[-1] - periods[-4]).days > MAX_TTM_SPAN_DAYS:
+        last_four = np.full(len(values), np.nan)
+    else:
+        # NaN unless all 4 quarters are reported
+        last_four = values[:, -4:].sum(axis=1)
+    latest = values[:, -1] if values.shape[1] else np.full(len(values), np.nan)
+    return np.where(statements.flows(), last_four, latest)
+
+
+def margins(statements: Statements) -> Optional[np.ndarray]:
+    """The income items over the revenue of the same period."""
+    revenue = statements.revenue()
+    if revenue is None:
+        return None
+    income = (statements.items.get_level_values("statement") == "income") & ~np.array(
+        [bool(NON_AMOUNT_PATTERN.search(item)) for item in statements.items.get_level_values("item")],
+        dtype=bool,
+    )
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(income[:, None] & (revenue > 0), statements.values / revenue, np.nan)
+
+
+def trend(values: np.ndarray, periods: pd.DatetimeIndex) -> np.ndarray:
+    """The least squares slope per year of every row, over its reported periods."""
+    valid = ~np.isnan(values)
+    if values.shape[1] == 0:
+        return np.full(len(values), np.nan)
+    years = (periods.values - periods.values[0]).astype("timedelta64[D]").astype(np.float64) / DAYS_PER_YEAR
+    years = np.where(valid, years, 0.0)
+    y = np.where(valid, values, 0.0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        n = valid.sum(axis=1)
+        mean_years = years.sum(axis=1) / n
+        mean_y = y.sum(axis=1) / n
+        dx = np.where(valid, years - mean_years[:, None], 0.0)
+        dy = np.where(valid, y - mean_y[:, None], 0.0)
+        variance = (dx * dx).sum(axis=1)
+        return np.where((n >= 2) & (variance > 0), (dx * dy).sum(axis=1) / variance, np.nan)
+
+
+class StatementEngine:
+    """
+    Growth & margin trends of every line item of the income, balance sheet & cash flow
+    statements, annual and quarterly.
+
+    The statements are stacked into aligned `(statement, item)` x periods arrays, so
+    the YoY / QoQ growth, CAGR, TTM & margin trends of all the items come out of a few
+    array operations. The trends are cached per symbol and recomputed only when the
+    statements (or the other data of the symbol) are refreshed in the yahoo finance cache.
+
+    Example:
+        >>> engine = StatementEngine()
+        >>> trends = engine.compute("RELIANCE")
+        >>> trends["annual_yoy"].loc[("income", "Total Revenue")]
+        >>> trends["summary"].loc[("cashflow", "Free Cash Flow"), "cagr"]
+    """
+
+    def __init__(self, cache: Optional[TieredCache] = yf_cache, max_symbols: int = TRENDS_CACHE_SIZE):
+        self.cache = cache
+        self.max_symbols = max_symbols
+        self._trends: "OrderedDict[str, Tuple[Optional[float], Dict[str, pd.DataFrame]]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def load(self, symbol: str) -> Tuple[Statements, Statements]:
+        """The annual & quarterly statements of the symbol."""
+        data = TickerData(symbol, cache=self.cache)
+        annual, quarterly = {}, {}
+        for statement, (annual_property, quarterly_property) in STATEMENTS.items():
+            for frames, name in ((annual, annual_property), (quarterly, quarterly_property)):
+                try:
+                    frames[statement] = getattr(data, name)
+                except Exception as e:
+                    print(f"No {name} for {data.symbol}: {e}")
+        return Statements.align(annual), Statements.align(quarterly)
+
+    def compute(self, symbol: str) -> Dict[str, pd.DataFrame]:
+        """
+        Get the trends of every line item of the symbol.
+
+        Returns:
+            dict: The `annual` & `quarterly` values, the `annual_yoy`, `quarterly_qoq` &
+                `quarterly_yoy` growth, the `annual_margins` & `quarterly_margins`, all
+                items x periods, and a `summary` per item of the latest values &
+                growth, CAGR, TTM & the margin trend.
+        """
+        symbol = normalise_symbol(symbol)
+        version = self.cache.version(symbol) if self.cache is not None else None
+        with self._lock:
+            cached = self._trends.get(symbol)
+            if cached is not None and version is not None and cached[0] == version:
+                self._trends.move_to_end(symbol)
+                return cached[1]
+
+        trends = self._trends_of(*self.load(symbol))
+        # the version before the load, a refresh during it is picked up next time
+        with self._lock:
+            self._trends[symbol] = (version, trends)
+            self._trends.move_to_end(symbol)
+            while len(self._trends) > self.max_symbols:
+                self._trends.popitem(last=False)
+        return trends
+
+    @staticmethod
+    def _trends_of(annual: Statements, quarterly: Statements) -> Dict[str, pd.DataFrame]:
+        annual_yoy = growth(annual.values)
+        quarterly_qoq = growth(quarterly.values)
+        quarterly_yoy = growth(quarterly.values, lag=4)
+        annual_cagr, cagr_years = cagr(annual.values, annual.periods)
+        annual_margins = margins(annual)
+        quarterly_margins = margins(quarterly)
+
+        items = annual.items.union(quarterly.items, sort=False)
+        summary = pd.DataFrame(index=items)
+        summary["latest_fy"] = pd.Series(_last_reported(annual.values), index=annual.items)
+        summary["yoy"] = pd.Series(_last_reported(annual_yoy), index=annual.items)
+        summary["cagr"] = pd.Series(annual_cagr, index=annual.items)
+        summary["cagr_years"] = pd.Series(cagr_years, index=annual.items)
+        summary["ttm"] = pd.Series(ttm(quarterly), index=quarterly.items)
+        summary["qoq"] = pd.Series(_last_reported(quarterly_qoq), index=quarterly.items)
+        summary["quarterly_yoy"] = pd.Series(_last_reported(quarterly_yoy), index=quarterly.items)
+        if annual_margins is not None:
+            summary["margin"] = pd.Series(_last_reported(annual_margins), index=annual.items)
+            # the change of the margin a year
+            summary["margin_trend"] = pd.Series(trend(annual_margins, annual.periods), index=annual.items)
+
+        return {
+            "annual": annual.frame(annual.values),
+            "quarterly": quarterly.frame(quarterly.values),
+            "annual_yoy": annual.frame(annual_yoy),
+            "quarterly_qoq": quarterly.frame(quarterly_qoq),
+            "quarterly_yoy": quarterly.frame(quarterly_yoy),
+            "annual_margins": annual.frame(annual_margins) if annual_margins is not None else pd.DataFrame(),
+            "quarterly_margins": quarterly.frame(quarterly_margins) if quarterly_margins is not None else pd.DataFrame(),
+            "summary": summary,
+        }
+
+
+def _last_reported(values: np.ndarray) -> np.ndarray:
+    """The last non NaN value of every row."""
+    if values.shape[1] == 0:
+        return np.full(len(values), np.nan)
+    _, last, reported = _first_last(values)
+    return np.where(reported, values[np.arange(len(values)), last], np.nan)
+
+
+statement_engine = StatementEngine()
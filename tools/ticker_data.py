@@ -0,0 +1,93 @@
+import threading
+from typing import Optional
+from tools.cache import TieredCache, yf_cache
+from tools.metrics import metrics
+from tools.rate_limit import rate_limiter
+
+
+def normalise_symbol(ticker: str, exchange_suffix: str = ".NS") -> str:
+    """Convert a ticker like `RELIANCE`, `reliance.ns` or `RELIANCE.BO` to the yahoo NSE symbol `RELIANCE.NS`."""
+    return ticker.strip().split(".")[0].upper() + exchange_suffix
+
+
+class _LazyProperty:
+    """A property that is fetched from the underlying `yf.Ticker` on first access only."""
+
+    def __init__(self, attribute: str):
+        self.attribute = attribute
+
+    def __set_name__(self, owner, name):
+        self.name = name
+
+    def __get__(self, instance, owner=None):
+        if instance is None:
+            return self
+        # fast path, already fetched
+        if self.name in instance.__dict__:
+            return instance.__dict__[self.name]
+        # one lock per property, so concurrent readers of the same property wait for
+        # a single fetch while different properties can still be fetched in parallel
+        with instance._locks[self.name]:
+            if self.name not in instance.__dict__:
+                instance.__dict__[self.name] = instance._load(self.name, self.attribute)
+        return instance.__dict__[self.name]
+
+
+class TickerData:
+    """
+    A fetched-once bundle of the yahoo finance data for a single ticker.
+
+    Every property is loaded lazily on first access and then reused, so all the
+    functions working on the same company within a request share one set of
+    round-trips to yahoo finance. The loads go through the `cache`, so a property
+    that is still fresh there needs no round-trip at all.
+
+    Example:
+        >>> data = TickerData("RELIANCE")
+        >>> data.symbol
+        'RELIANCE.NS'
+        >>> data.info["longName"]  # fetched here
+        >>> data.info["sector"]  # served from the bundle
+    """
+
+    info = _LazyProperty("info")
+    balance_sheet = _LazyProperty("balance_sheet")
+    financials = _LazyProperty("financials")
+    cashflow = _LazyProperty("cashflow")
+    quarterly_balance_sheet = _LazyProperty("quarterly_balance_sheet")
+    quarterly_financials = _LazyProperty("quarterly_financials")
+    quarterly_cashflow = _LazyProperty("quarterly_cashflow")
+    recommendations = _LazyProperty("recommendations_summary")
+
+    def __init__(self, ticker: str, cache: Optional[TieredCache] = yf_cache):
+        self.symbol = normalise_symbol(ticker)
+        self._ticker = None
+        self.cache = cache
+        self._locks = {
+            name: threading.Lock()
+            for name, value in vars(type(self)).items()
+            if isinstance(value, _LazyProperty)
+        }
+
+    @property
+    def ticker(self):
+        """The underlying `yf.Ticker`, yfinance is imported on the first fetch."""
+        if self._ticker is None:
+            import yfinance as yf
+
+            self._ticker = yf.Ticker(self.symbol)
+        return self._ticker
+
+    def _load(self, name: str, attribute: str):
+        if self.cache is None:
+            return self._fetch(name, attribute)
+        return self.cache.get_or_fetch(
+            name, self.symbol, lambda: self._fetch(name, attribute)
+        )
+
+    def _fetch(self, name: str, attribute: str):
+        with metrics.time("source_fetch", source="yahoo", kind=name):
+            return rate_limiter.call("yahoo", getattr, self.ticker, attribute)
+
+    def __repr__(self) -> str:
+        return f"TickerData(symbol={self.symbol!r})"
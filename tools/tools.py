@@ -1,11 +1,15 @@
-from llama_index.core.tools import FunctionTool
 # from llama_index.tools.brave_search import BraveSearchToolSpec
-from tools.functions import analyse_company_yf, yf_fundamental_analysis, get_recent_news, duckduckgo_search
+from tools.registry import tool_registry
 
-# init tools
-stock_analyser = FunctionTool.from_defaults(fn=analyse_company_yf, name="analyse_company")
-fundamental_analyser = FunctionTool.from_defaults(fn=yf_fundamental_analysis)
-news_fetcher = FunctionTool.from_defaults(fn=get_recent_news)
+# init tools, they are only imported & built on first use
+stock_analyser = tool_registry.register("tools.functions:analyse_company_yf", name="analyse_company")
+batch_analyser = tool_registry.register("tools.functions:analyse_companies", name="analyse_companies")
+stock_screener = tool_registry.register("tools.functions:screen_stocks")
+technical_analyser = tool_registry.register("tools.functions:technical_analysis")
+peer_comparer = tool_registry.register("tools.functions:compare_with_peers")
+trend_analyser = tool_registry.register("tools.functions:financial_trends")
+fundamental_analyser = tool_registry.register("tools.functions:yf_fundamental_analysis")
+news_fetcher = tool_registry.register("tools.functions:get_recent_news")
 
-duckduckgo_search_tool = FunctionTool.from_defaults(fn=duckduckgo_search)
+duckduckgo_search_tool = tool_registry.register("tools.functions:duckduckgo_search")
 # brave_search = BraveSearchToolSpec().to_tool_list()[0]
@@ -1,23 +1,218 @@
+import os
+import threading
 import requests
 import pandas as pd
 from io import StringIO
-from time import sleep
+from time import monotonic, time
+from typing import Any, Callable, Dict, Optional, Tuple, Union
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from tools.metrics import metrics
+from tools.rate_limit import rate_limiter
 
+# Local directory for all the cached data
+CACHE_DIR = os.getenv("STOCK_CACHE_DIR", "./cache")
+# How long (in seconds) the NSE equity master list is used before it is refreshed
+NSE_MASTER_TTL = float(os.getenv("NSE_MASTER_TTL", 24 * 60 * 60))
 
-def get_nse_tickers_scraping():
-    url = "https://nsearchives.nseindia.com/content/equities/EQUITY_L.csv"
-    headers = {
-        "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36",
-        "Accept-Language": "en-US,en;q=0.9",
-        "Accept-Encoding": "gzip, deflate, br",
-    }
-    try:
-        sleep(1)
-        response = requests.get(url, headers=headers)
-        response.raise_for_status()
-        data_str = response.content.decode("utf-8")
-        df = pd.read_csv(StringIO(data_str))
-        return df["SYMBOL"].tolist()
-    except Exception as e:
-        print(f"Error scraping NSE website: {e}")
+NSE_EQUITY_LIST_URL = "https://nsearchives.nseindia.com/content/equities/EQUITY_L.csv"
+NSE_HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36",
+    "Accept-Language": "en-US,en;q=0.9",
+    "Accept-Encoding": "gzip, deflate, br",
+}
+
+# Default per-stage timeout (in seconds) for the concurrent data fetches
+STAGE_TIMEOUT = float(os.getenv("STAGE_TIMEOUT", 30))
+# Run the independent data fetches concurrently, set to 0 to run them one after another
+CONCURRENT_FETCH = os.getenv("CONCURRENT_FETCH", "1") != "0"
+
+
+def fetch_nse_archive(url: str) -> requests.Response:
+    """Download a file from the NSE archives, a 429 / 5xx is raised so it can be retried."""
+    response = requests.get(url, headers=NSE_HEADERS, timeout=30)
+    response.raise_for_status()
+    return response
+
+
+class NSEMasterList:
+    """
+    The NSE equity master list (EQUITY_L.csv), cached in memory and on disk.
+
+    The list is downloaded at most once per `ttl` seconds. Once a copy exists, a stale
+    list is still served while a background thread fetches the new one, so a request
+    never waits on the NSE archives unless there is no copy at all.
+
+    Example:
+        >>> master_list = NSEMasterList()
+        >>> "RELIANCE" in master_list.symbols
+        True
+        >>> master_list.companies["RELIANCE"]
+        'Reliance Industries Limited'
+    """
+
+    def __init__(
+        self,
+        url: str = NSE_EQUITY_LIST_URL,
+        path: str = os.path.join(CACHE_DIR, "nse", "EQUITY_L.csv"),
+        ttl: float = NSE_MASTER_TTL,
+    ):
+        self.url = url
+        self.path = path
+        self.ttl = ttl
+        self._df: Optional[pd.DataFrame] = None
+        self._symbols: frozenset = frozenset()
+        self._companies: Dict[str, str] = {}
+        self._fetched_at = 0.0
+        self._lock = threading.Lock()
+        self._refreshing = threading.Event()
+
+    @property
+    def is_stale(self) -> bool:
+        return time() - self._fetched_at > self.ttl
+
+    @property
+    def df(self) -> Optional[pd.DataFrame]:
+        """The parsed master list, or None if it could not be fetched."""
+        if self._df is None:
+            with self._lock:
+                if self._df is None and not self._load_from_disk():
+                    # nothing cached yet, this is the only time we wait on the download
+                    self._refresh()
+        if self._df is not None and self.is_stale:
+            self.refresh(background=True)
+        return self._df
+
+    @property
+    def symbols(self) -> frozenset:
+        """The set of all the NSE symbols, for O(1) membership checks."""
+        return self._symbols if self.df is not None else frozenset()
+
+    @property
+    def companies(self) -> Dict[str, str]:
+        """A mapping of NSE symbol -> name of the company."""
+        return self._companies if self.df is not None else {}
+
+    def refresh(self, background: bool = False):
+        """Download the master list again, optionally on a background thread."""
+        if not background:
+            self._refresh()
+            return
+        if self._refreshing.is_set():
+            return
+        self._refreshing.set()
+        threading.Thread(
+            target=self._refresh, name="nse-master-list-refresh", daemon=True
+        ).start()
+
+    def _refresh(self):
+        try:
+            with metrics.time("source_fetch", source="nse", kind="equity_list"):
+                response = rate_limiter.call("nse", fetch_nse_archive, self.url)
+            data_str = response.content.decode("utf-8")
+            self._set(pd.read_csv(StringIO(data_str)), time())
+            # write to a temp file first, so readers never see a partial file
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, "w") as fp:
+                fp.write(data_str)
+            os.replace(tmp_path, self.path)
+        except Exception as e:
+            print(f"Error scraping NSE website: {e}")
+        finally:
+            self._refreshing.clear()
+
+    def _load_from_disk(self) -> bool:
+        if not os.path.exists(self.path):
+            return False
+        try:
+            self._set(pd.read_csv(self.path), os.path.getmtime(self.path))
+            return True
+        except Exception as e:
+            print(f"Error reading the cached NSE list: {e}")
+            return False
+
+    def _set(self, df: pd.DataFrame, fetched_at: float):
+        # some of the columns in EQUITY_L.csv have a leading space
+        df = df.rename(columns=str.strip)
+        df["SYMBOL"] = df["SYMBOL"].astype(str).str.strip()
+        companies = dict(zip(df["SYMBOL"], df["NAME OF COMPANY"].astype(str).str.strip()))
+        # swap everything in one go, readers see either the old or the new list
+        self._df, self._symbols, self._companies, self._fetched_at = (
+            df,
+            frozenset(companies),
+            companies,
+            fetched_at,
+        )
+
+
+nse_master_list = NSEMasterList()
+
+
+def get_nse_tickers_scraping() -> Optional[frozenset]:
+    """Get the set of NSE symbols from the cached master list, None if it is unavailable."""
+    if nse_master_list.df is None:
         return None
+    return nse_master_list.symbols
+
+
+def run_stages(
+    stages: Dict[str, Callable[[], Any]],
+    timeout: Union[float, Dict[str, float]] = STAGE_TIMEOUT,
+    concurrent: bool = CONCURRENT_FETCH,
+) -> Tuple[Dict[str, Any], Dict[str, str]]:
+    """
+    Run a set of independent stages and collect whatever finishes in time.
+
+    The stages are run on a thread pool when `concurrent` is set, so the total time
+    is bounded by the slowest stage instead of the sum of all of them. A stage that
+    raises or runs past its timeout does not fail the others.
+
+    Args:
+        stages (dict): A mapping of stage name to a zero argument callable.
+        timeout (float | dict): The timeout in seconds, either one for all the stages
+            or a mapping of stage name to its own timeout.
+        concurrent (bool): Whether to run the stages concurrently.
+
+    Returns:
+        tuple: A dict of stage name -> result for the stages that succeeded and a dict of
+            stage name -> error message for the ones that failed or timed out.
+    """
+
+    def stage_timeout(name: str) -> Optional[float]:
+        if isinstance(timeout, dict):
+            return timeout.get(name, STAGE_TIMEOUT)
+        return timeout
+
+    results, errors = {}, {}
+
+    if not concurrent:
+        for name, stage in stages.items():
+            try:
+                results[name] = stage()
+            except Exception as e:
+                errors[name] = f"{type(e).__name__}: {e}"
+        return results, errors
+
+    executor = ThreadPoolExecutor(
+        max_workers=max(len(stages), 1), thread_name_prefix="stage"
+    )
+    try:
+        start = monotonic()
+        futures = {name: executor.submit(stage) for name, stage in stages.items()}
+        for name, future in futures.items():
+            # every stage gets its own deadline, measured from the common start
+            remaining = stage_timeout(name)
+            if remaining is not None:
+                remaining = max(remaining - (monotonic() - start), 0)
+            try:
+                results[name] = future.result(timeout=remaining)
+            except FutureTimeoutError:
+                future.cancel()
+                errors[name] = f"timed out after {stage_timeout(name)}s"
+            except Exception as e:
+                errors[name] = f"{type(e).__name__}: {e}"
+    finally:
+        # don't wait on the stages that timed out, they finish in the background
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    return results, errors
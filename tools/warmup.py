@@ -0,0 +1,181 @@
+"""
+Pre-market cache warm-up for the watchlist symbols.
+
+Run it once:
+    python -m tools.warmup --watchlist nifty50 niftynext50 --once
+
+or as a daily scheduler (weekdays at 08:45 IST):
+    python -m tools.warmup --watchlist nifty50 niftynext50 --at 08:45
+"""
+import argparse
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from io import StringIO
+from time import monotonic, sleep
+from typing import Dict, Iterable, List, Optional
+import pandas as pd
+from tools.utils import CACHE_DIR, fetch_nse_archive, nse_master_list
+from tools.ticker_data import TickerData, normalise_symbol
+from tools.resolver import company_resolver
+from tools.metrics import metrics
+from tools.rate_limit import rate_limiter
+
+IST = timezone(timedelta(hours=5, minutes=30))
+
+WATCHLIST_URLS = {
+    "nifty50": "https://nsearchives.nseindia.com/content/indices/ind_nifty50list.csv",
+    "niftynext50": "https://nsearchives.nseindia.com/content/indices/ind_niftynext50list.csv",
+}
+# Default time (IST) of the daily warm-up, a little before the market opens at 09:15
+WARMUP_AT = os.getenv("WARMUP_AT", "08:45")
+# Number of symbols warmed up concurrently
+WARMUP_WORKERS = int(os.getenv("WARMUP_WORKERS", 4))
+
+# the TickerData properties analyse_company_yf reads
+TICKER_PROPERTIES = ("info", "balance_sheet", "financials", "cashflow", "recommendations")
+
+
+def load_watchlist(names: Iterable[str]) -> List[str]:
+    """Get the symbols of the index constituents, the last downloaded list is used if NSE is down."""
+    symbols = []
+    for name in names:
+        path = os.path.join(CACHE_DIR, "watchlists", f"{name}.csv")
+        try:
+            with metrics.time("source_fetch", source="nse", kind="watchlist"):
+                response = rate_limiter.call("nse", fetch_nse_archive, WATCHLIST_URLS[name])
+            df = pd.read_csv(StringIO(response.content.decode("utf-8")))
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            df.to_csv(path, index=False)
+        except Exception as e:
+            if not os.path.exists(path):
+                print(f"Could not load the watchlist {name}: {e}")
+                continue
+            print(f"Using the last downloaded {name} list: {e}")
+            df = pd.read_csv(path)
+        symbols.extend(df["Symbol"].astype(str).str.strip())
+    return list(dict.fromkeys(symbols))
+
+
+def warm_symbol(symbol: str) -> List[str]:
+    """
+    Fetch the yahoo finance data & news analyse_company_yf reads for the symbol into the
+    caches, returns the failures. The analysis itself still runs on the request, from
+    the cached data.
+    """
+    # the analysis functions are only imported once a warm-up runs
+    from tools.functions import search
+
+    errors = []
+    data = TickerData(symbol)
+    for name in TICKER_PROPERTIES:
+        try:
+            getattr(data, name)
+        except Exception as e:
+            errors.append(f"{name}: {e}")
+    try:
+        search.news(normalise_symbol(symbol), max_results=5)
+    except Exception as e:
+        errors.append(f"news: {e}")
+    return errors
+
+
+def warm_up(symbols: List[str], max_workers: int = WARMUP_WORKERS) -> Dict[str, List[str]]:
+    """
+    Warm the caches for the symbols with bounded concurrency.
+
+    Returns:
+        dict: symbol -> the errors, for the symbols that did not fully warm up.
+    """
+    start = monotonic()
+    # the master list & the resolver's search index are built once, for all the symbols
+    nse_master_list.df
+    company_resolver.search("warm up")
+
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="warmup") as executor:
+        results = dict(zip(symbols, executor.map(warm_symbol, symbols)))
+    failures = {symbol: errors for symbol, errors in results.items() if errors}
+    print(
+        f"[WARMUP]: Warmed {len(symbols) - len(failures)}/{len(symbols)} symbols in {monotonic() - start:.1f}s"
+    )
+    return failures
+
+
+def next_run(at: str, now: Optional[datetime] = None) -> datetime:
+    """The next weekday at the `HH:MM` time, in IST."""
+    now = now or datetime.now(IST)
+    hour, minute = map(int, at.split(":"))
+    run = now.replace(hour=hour, minute=minute, second=0, microsecond=0)
+    if run <= now:
+        run += timedelta(days=1)
+    while run.weekday() >= 5:
+        run += timedelta(days=1)
+    return run
+
+
+class WarmupScheduler(threading.Thread):
+    """Warm up the caches for a watchlist every weekday, on a background thread."""
+
+    def __init__(
+        self,
+        watchlists: Iterable[str] = ("nifty50", "niftynext50"),
+        symbols: Iterable[str] = (),
+        at: str = WARMUP_AT,
+        max_workers: int = WARMUP_WORKERS,
+    ):
+        super().__init__(name="warmup-scheduler", daemon=True)
+        self.watchlists = list(watchlists)
+        self.symbols = list(symbols)
+        self.at = at
+        self.max_workers = max_workers
+        self._stop_event = threading.Event()
+
+    def run_once(self):
+        symbols = list(dict.fromkeys(self.symbols + load_watchlist(self.watchlists)))
+        return warm_up(symbols, max_workers=self.max_workers)
+
+    def run(self):
+        while not self._stop_event.is_set():
+            run_at = next_run(self.at)
+            print(f"[WARMUP]: Next warm-up at {run_at:%Y-%m-%d %H:%M} IST")
+            if self._stop_event.wait((run_at - datetime.now(IST)).total_seconds()):
+                break
+            try:
+                self.run_once()
+            except Exception as e:
+                print(f"[WARMUP]: Warm-up failed: {e}")
+            # don't run twice within the same minute
+            sleep(60)
+
+    def stop(self):
+        self._stop_event.set()
+
+
+def start_warmup_scheduler(**kwargs) -> WarmupScheduler:
+    """Start the daily warm-up in this process."""
+    scheduler = WarmupScheduler(**kwargs)
+    scheduler.start()
+    return scheduler
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Warm up the caches before the market opens.")
+    parser.add_argument("--watchlist", nargs="*", default=["nifty50", "niftynext50"], choices=list(WATCHLIST_URLS))
+    parser.add_argument("--symbols", nargs="*", default=[], help="Additional NSE symbols to warm up")
+    parser.add_argument("--at", default=WARMUP_AT, help="Time (HH:MM, IST) of the daily warm-up")
+    parser.add_argument("--workers", type=int, default=WARMUP_WORKERS)
+    parser.add_argument("--once", action="store_true", help="Warm up now and exit")
+    args = parser.parse_args()
+
+    scheduler = WarmupScheduler(args.watchlist, args.symbols, at=args.at, max_workers=args.workers)
+    if args.once:
+        failures = scheduler.run_once()
+        for symbol, errors in failures.items():
+            print(f"{symbol}: {'; '.join(errors)}")
+        return
+    scheduler.run()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,5 @@
-from typing import Union, Optional, Any
+from collections import deque
+from typing import Union, Optional, Any, Callable, Deque, Iterable, Iterator, List, Tuple
 
 
 def calculate_token_count_of_message(
@@ -7,7 +8,7 @@ def calculate_token_count_of_message(
 ):
     """
     Given a list of messages in openai format, calculate the total token count of the messages.
-    The tokenizer should have .tokenize or .encode option.
+    The tokenizer should have .tokenize or .encode option, or be an encode function itself.
     """
     if not tokenizer:
         # if a tokenizer is not specified
@@ -21,11 +22,75 @@ def calculate_token_count_of_message(
         no_of_tokens_message = char_count // avg_char_per_token  # integer
         return no_of_tokens_message
 
-    try:
+    if hasattr(tokenizer, "encode"):
         encoded_message = tokenizer.encode(message)
-    except AttributeError:
+    elif hasattr(tokenizer, "tokenize"):
         encoded_message = tokenizer.tokenize(message)
+    else:
+        encoded_message = tokenizer(message)
 
     no_of_tokens_message = len(encoded_message)
 
     return no_of_tokens_message
+
+
+def chat_tokenizer() -> Callable[[str], List]:
+    """
+    The tokenizer the chat history is counted with, the tiktoken (cl100k) BPE tokenizer
+    bundled with llama-index, so it works offline for every model.
+
+    The Llama 3 & Qwen 2.5 tokenizers have larger vocabularies, so they split a text into
+    about as many or fewer tokens; the counts are close to and not below the real ones.
+    """
+    from llama_index.core.utils import get_tokenizer
+
+    return get_tokenizer()
+
+
+class TokenBudgetHistory:
+    """
+    A chat history that keeps itself within a token budget.
+
+    The token count of every message is computed once, when it is added, and a running
+    total is kept, so trimming the oldest messages is O(1) per message instead of
+    re-counting the whole history after every removal. Without a `tokenizer` the counts
+    are estimated at 4 characters a token.
+
+    Example:
+        >>> history = TokenBudgetHistory(max_tokens=4000, tokenizer=chat_tokenizer())
+        >>> history.append("Human: How is Reliance performing?")
+        >>> history.append("Assistant: ...")
+        >>> "\\n".join(history.messages)
+    """
+
+    def __init__(self, max_tokens: int, tokenizer: Optional[Any] = None, messages: Optional[Iterable[str]] = None):
+        self.max_tokens = max_tokens
+        self.tokenizer = tokenizer
+        self._messages: Deque[Tuple[str, int]] = deque()
+        self.total_tokens = 0
+        for message in messages or []:
+            self.append(message)
+
+    def append(self, message: str):
+        """Add a message and drop the oldest ones until the history fits the budget."""
+        tokens = calculate_token_count_of_message(message, tokenizer=self.tokenizer)
+        self._messages.append((message, tokens))
+        self.total_tokens += tokens
+        self.trim()
+
+    def trim(self, max_tokens: Optional[int] = None):
+        """Drop the oldest messages until the history fits the budget."""
+        max_tokens = self.max_tokens if max_tokens is None else max_tokens
+        while self._messages and self.total_tokens > max_tokens:
+            _, tokens = self._messages.popleft()
+            self.total_tokens -= tokens
+
+    @property
+    def messages(self) -> List[str]:
+        return [message for message, _ in self._messages]
+
+    def __iter__(self) -> Iterator[str]:
+        return (message for message, _ in self._messages)
+
+    def __len__(self) -> int:
+        return len(self._messages)